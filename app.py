@@ -1,14 +1,31 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import re
-import numpy as np
-from datetime import datetime, timedelta
+import json
+import os
+import tracemalloc
 import warnings
+
+from engine import (
+    SERVER_DATA_DIR,
+    DiskDatasetCache,
+    IngestionCache,
+    QueryResultCache,
+    StreamingCsvDataset,
+    TypedDataset,
+    build_dataset_profiles,
+    list_excel_sheets,
+    load_server_csv,
+    load_uploaded_dataset,
+    parse_natural_language_query,
+    profile_call,
+    resolve_server_csv_path,
+    run_batch,
+    run_cached_query,
+    start_warmup,
+    trace_stage,
+    traced,
+)
+
 warnings.filterwarnings('ignore')
 
 # Setting up the main page configuration
@@ -18,461 +35,66 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Helper function to clean up messy column names - you know how Excel files can be
-def sanitize_column_headers(dataframe):
-    """Clean up those pesky column names that come from Excel"""
-    cleaned_headers = []
-    for header in dataframe.columns:
-        # Remove weird characters and normalize spacing
-        clean_header = re.sub(r'[^\w\s]', '_', str(header).strip())
-        clean_header = re.sub(r'\s+', '_', clean_header.lower())
-        # Handle duplicate names by adding numbers
-        counter = 1
-        original_header = clean_header
-        while clean_header in cleaned_headers:
-            clean_header = f"{original_header}_{counter}"
-            counter += 1
-        cleaned_headers.append(clean_header)
-    
-    dataframe.columns = cleaned_headers
-    return dataframe
+# The caches live for the whole server process and are shared by every session
+@st.cache_resource
+def get_ingestion_cache():
+    return IngestionCache()
 
-def process_uploaded_data(raw_dataframe):
-    """Do some basic cleanup on the data - convert objects to strings, handle nulls"""
-    processed_df = raw_dataframe.copy()
-    
-    # Convert object columns to strings for consistency
-    for column_name in processed_df.columns:
-        if processed_df[column_name].dtype == 'object':
-            processed_df[column_name] = processed_df[column_name].astype(str)
-            # Clean up those annoying 'nan' strings
-            processed_df[column_name] = processed_df[column_name].replace('nan', np.nan)
-    
-    return processed_df
+@st.cache_resource
+def get_query_cache():
+    return QueryResultCache()
 
-def figure_out_column_types(dataframe):
-    """Smart detection of what kind of data we're dealing with"""
-    column_categories = {}
-    
-    for col in dataframe.columns:
-        # Try to see if it's numeric first
-        numeric_attempt = pd.to_numeric(dataframe[col], errors='coerce')
-        non_null_count = numeric_attempt.dropna().shape[0]
-        
-        if non_null_count > 0 and non_null_count / len(dataframe) > 0.5:
-            # Looks like numbers to me
-            if dataframe[col].dtype in ['int64', 'float64'] or numeric_attempt.dtype in ['int64', 'float64']:
-                column_categories[col] = 'numerical'
-            else:
-                column_categories[col] = 'numerical'
-        else:
-            # Check if it might be dates
-            try:
-                date_attempt = pd.to_datetime(dataframe[col], errors='coerce')
-                if date_attempt.dropna().shape[0] > len(dataframe) * 0.3:
-                    column_categories[col] = 'datetime'
-                    continue
-            except:
-                pass
-            
-            # Count unique values to decide if it's categorical
-            unique_vals = dataframe[col].nunique(dropna=True)
-            total_rows = len(dataframe)
-            
-            if unique_vals == 2:
-                column_categories[col] = 'binary'
-            elif unique_vals <= 20 or unique_vals / total_rows < 0.1:
-                column_categories[col] = 'categorical'
-            else:
-                column_categories[col] = 'text'
-    
-    return column_categories
+@st.cache_resource
+def get_disk_cache():
+    return DiskDatasetCache()
 
-def smart_column_finder(search_term, available_columns):
-    """Find the best matching column for a user's query"""
-    search_normalized = search_term.lower().replace(" ", "").replace("_", "")
-    
-    # First try exact matches
-    for col in available_columns:
-        col_normalized = col.lower().replace("_", "").replace(" ", "")
-        if search_normalized == col_normalized:
-            return col
-    
-    # Then try partial matches
-    for col in available_columns:
-        col_normalized = col.lower().replace("_", "").replace(" ", "")
-        if search_normalized in col_normalized or col_normalized in search_normalized:
-            return col
-    
-    # Finally try word-by-word matching
-    search_words = search_term.lower().split()
-    for word in search_words:
-        for col in available_columns:
-            if word in col.lower():
-                return col
-    
-    return None
-
-def hunt_for_categorical_values(query_text, dataframe, col_types):
-    """Look for specific values mentioned in the query"""
-    for column_name, data_type in col_types.items():
-        if data_type in ["categorical", "binary"]:
-            unique_values = dataframe[column_name].dropna().unique()
-            for value in unique_values:
-                if str(value).lower() in query_text.lower():
-                    return column_name, str(value)
-    return None, None
-
-def add_calculated_columns(dataframe):
-    """Add some useful calculated fields if we can"""
-    # If we have birth year, calculate age
-    birth_year_cols = [col for col in dataframe.columns if 'birth' in col.lower() and 'year' in col.lower()]
-    if birth_year_cols and 'age' not in dataframe.columns:
-        birth_col = birth_year_cols[0]
-        current_year = datetime.now().year
-        dataframe['age'] = current_year - pd.to_numeric(dataframe[birth_col], errors='coerce')
-    
-    # Add more calculated fields as needed
-    return dataframe
-
-def parse_natural_language_query(user_question, dataframe, column_types):
-    """The heart of our system - figure out what the user wants"""
-    query_lower = user_question.lower()
-    
-    # Chart requests
-    if any(phrase in query_lower for phrase in ["pie chart", "pie graph"]):
-        target_col = smart_column_finder(
-            query_lower.replace("pie chart", "").replace("pie graph", "").replace("of", "").strip(), 
-            dataframe.columns
-        )
-        if not target_col:
-            # Default to first categorical column
-            categorical_cols = [c for c, t in column_types.items() if t == "categorical"]
-            target_col = categorical_cols[0] if categorical_cols else None
-        return ("create_pie_chart", target_col)
-    
-    if any(phrase in query_lower for phrase in ["bar chart", "bar graph", "show bars"]):
-        target_col = smart_column_finder(
-            query_lower.replace("bar chart", "").replace("bar graph", "").replace("show bars", "").replace("of", "").strip(),
-            dataframe.columns
-        )
-        if not target_col:
-            categorical_cols = [c for c, t in column_types.items() if t == "categorical"]
-            target_col = categorical_cols[0] if categorical_cols else None
-        return ("create_bar_chart", target_col)
-    
-    if any(phrase in query_lower for phrase in ["histogram", "distribution", "spread"]):
-        target_col = smart_column_finder(
-            query_lower.replace("histogram", "").replace("distribution", "").replace("spread", "").replace("of", "").strip(),
-            dataframe.columns
-        )
-        if not target_col:
-            numeric_cols = [c for c, t in column_types.items() if t == "numerical"]
-            target_col = numeric_cols[0] if numeric_cols else None
-        return ("create_histogram", target_col)
-    
-    if any(phrase in query_lower for phrase in ["line chart", "trend", "over time"]):
-        # Look for time-based and value columns
-        time_col = None
-        value_col = None
-        
-        for col in dataframe.columns:
-            if any(time_word in col.lower() for time_word in ["date", "year", "month", "time"]):
-                time_col = col
-                break
-        
-        remaining_query = query_lower.replace("line chart", "").replace("trend", "").replace("over time", "")
-        value_col = smart_column_finder(remaining_query.strip(), dataframe.columns)
-        
-        return ("create_line_chart", time_col, value_col)
-    
-    if any(phrase in query_lower for phrase in ["scatter", "correlation plot", "relationship"]):
-        # Look for two numeric columns
-        words = query_lower.replace("scatter", "").replace("plot", "").replace("correlation", "").split(" vs ")
-        if len(words) == 2:
-            col1 = smart_column_finder(words[0].strip(), dataframe.columns)
-            col2 = smart_column_finder(words[1].strip(), dataframe.columns)
-        else:
-            numeric_columns = [c for c, t in column_types.items() if t == "numerical"]
-            col1 = numeric_columns[0] if len(numeric_columns) > 0 else None
-            col2 = numeric_columns[1] if len(numeric_columns) > 1 else None
-        return ("create_scatter_plot", col1, col2)
-    
-    # Statistical queries
-    if any(phrase in query_lower for phrase in ["average", "mean"]):
-        target_col = smart_column_finder(
-            query_lower.replace("average", "").replace("mean", "").replace("what is", "").replace("the", "").strip(),
-            dataframe.columns
-        )
-        if not target_col:
-            numeric_cols = [c for c, t in column_types.items() if t == "numerical"]
-            target_col = numeric_cols[0] if numeric_cols else None
-        return ("calculate_statistic", target_col, "mean")
-    
-    if any(phrase in query_lower for phrase in ["total", "sum"]):
-        target_col = smart_column_finder(
-            query_lower.replace("total", "").replace("sum", "").replace("what is", "").replace("the", "").strip(),
-            dataframe.columns
+def show_warmup_progress(dataset_warmup):
+    """Sidebar progress for the background warm-up - questions work while it runs"""
+    warmup_status = dataset_warmup.status()
+    if dataset_warmup.done():
+        st.caption(f"Column summaries ready ({warmup_status['total']} built in {warmup_status['seconds']:.1f}s)")
+    else:
+        st.progress(
+            dataset_warmup.progress(),
+            text=f"Preparing column summaries: {warmup_status['completed']}/{warmup_status['total']}"
         )
-        if not target_col:
-            numeric_cols = [c for c, t in column_types.items() if t == "numerical"]
-            target_col = numeric_cols[0] if numeric_cols else None
-        return ("calculate_statistic", target_col, "sum")
-    
-    if any(phrase in query_lower for phrase in ["maximum", "max", "highest"]):
-        target_col = smart_column_finder(
-            query_lower.replace("maximum", "").replace("max", "").replace("highest", "").replace("what is", "").replace("the", "").strip(),
-            dataframe.columns
-        )
-        if not target_col:
-            numeric_cols = [c for c, t in column_types.items() if t == "numerical"]
-            target_col = numeric_cols[0] if numeric_cols else None
-        return ("calculate_statistic", target_col, "max")
-    
-    if any(phrase in query_lower for phrase in ["minimum", "min", "lowest"]):
-        target_col = smart_column_finder(
-            query_lower.replace("minimum", "").replace("min", "").replace("lowest", "").replace("what is", "").replace("the", "").strip(),
-            dataframe.columns
-        )
-        if not target_col:
-            numeric_cols = [c for c, t in column_types.items() if t == "numerical"]
-            target_col = numeric_cols[0] if numeric_cols else None
-        return ("calculate_statistic", target_col, "min")
-    
-    if "median" in query_lower:
-        target_col = smart_column_finder(
-            query_lower.replace("median", "").replace("what is", "").replace("the", "").strip(),
-            dataframe.columns
-        )
-        if not target_col:
-            numeric_cols = [c for c, t in column_types.items() if t == "numerical"]
-            target_col = numeric_cols[0] if numeric_cols else None
-        return ("calculate_statistic", target_col, "median")
-    
-    # Filtering and counting queries
-    if any(phrase in query_lower for phrase in ["how many", "count"]):
-        # Look for numeric filters first
-        under_match = re.search(r'under (\d+)', query_lower)
-        above_match = re.search(r'above (\d+)', query_lower)
-        
-        if under_match:
-            threshold = float(under_match.group(1))
-            target_col = smart_column_finder(query_lower, dataframe.columns)
-            if not target_col:
-                numeric_cols = [c for c, t in column_types.items() if t == "numerical"]
-                target_col = numeric_cols[0] if numeric_cols else None
-            return ("filter_and_count", target_col, "<", threshold)
-        
-        if above_match:
-            threshold = float(above_match.group(1))
-            target_col = smart_column_finder(query_lower, dataframe.columns)
-            if not target_col:
-                numeric_cols = [c for c, t in column_types.items() if t == "numerical"]
-                target_col = numeric_cols[0] if numeric_cols else None
-            return ("filter_and_count", target_col, ">", threshold)
-        
-        # Look for categorical filters
-        category_col, category_val = hunt_for_categorical_values(query_lower, dataframe, column_types)
-        if category_col and category_val:
-            return ("filter_count_category", category_col, category_val)
-        
-        # Just count all rows
-        return ("count_all_rows",)
-    
-    # Grouping and comparison queries
-    if any(phrase in query_lower for phrase in ["compare", "group by", "breakdown", "by category"]):
-        group_column = smart_column_finder(query_lower, dataframe.columns)
-        value_column = None
-        
-        # Look for a numeric column mentioned
-        for col, col_type in column_types.items():
-            if col_type == "numerical" and col.lower() in query_lower:
-                value_column = col
-                break
-        
-        return ("group_and_analyze", group_column, value_column)
-    
-    # Summary requests
-    if any(phrase in query_lower for phrase in ["summary", "describe", "overview", "statistics"]):
-        return ("generate_summary",)
-    
-    # Default fallback
-    return ("generate_summary",)
 
-def execute_analysis_request(action_info, dataframe):
-    """Execute the parsed query and return results"""
-    action_type = action_info[0]
-    
-    try:
-        if action_type == "calculate_statistic":
-            column_name, stat_type = action_info[1], action_info[2]
-            if not column_name:
-                return "I couldn't identify which column to analyze.", None, None
-            
-            numeric_data = pd.to_numeric(dataframe[column_name], errors='coerce')
-            
-            if stat_type == "mean":
-                result = numeric_data.mean()
-                return f"The average value in '{column_name}' is {result:.2f}", None, None
-            elif stat_type == "sum":
-                result = numeric_data.sum()
-                return f"The total sum of '{column_name}' is {result:.0f}", None, None
-            elif stat_type == "max":
-                result = numeric_data.max()
-                return f"The maximum value in '{column_name}' is {result:.2f}", None, None
-            elif stat_type == "min":
-                result = numeric_data.min()
-                return f"The minimum value in '{column_name}' is {result:.2f}", None, None
-            elif stat_type == "median":
-                result = numeric_data.median()
-                return f"The median value in '{column_name}' is {result:.2f}", None, None
-        
-        elif action_type == "filter_and_count":
-            column_name, operator, threshold = action_info[1], action_info[2], action_info[3]
-            if not column_name:
-                return "I couldn't identify which column to filter on.", None, None
-            
-            numeric_data = pd.to_numeric(dataframe[column_name], errors='coerce')
-            
-            if operator == "<":
-                filtered_count = numeric_data[numeric_data < threshold].shape[0]
-                return f"There are {filtered_count} records where '{column_name}' is under {threshold}", None, None
-            elif operator == ">":
-                filtered_count = numeric_data[numeric_data > threshold].shape[0]
-                return f"There are {filtered_count} records where '{column_name}' is above {threshold}", None, None
-        
-        elif action_type == "filter_count_category":
-            column_name, target_value = action_info[1], action_info[2]
-            matching_rows = dataframe[dataframe[column_name].str.lower() == target_value.lower()].shape[0]
-            return f"There are {matching_rows} records where '{column_name}' equals '{target_value}'", None, None
-        
-        elif action_type == "count_all_rows":
-            total_rows = dataframe.shape[0]
-            return f"Your dataset contains {total_rows} total records", None, None
-        
-        elif action_type == "group_and_analyze":
-            group_col, value_col = action_info[1], action_info[2]
-            if not group_col:
-                return "I couldn't determine which column to group by.", None, None
-            
-            if value_col:
-                # Group by category and calculate mean of numeric column
-                grouped_data = dataframe.groupby(group_col)[value_col].apply(
-                    lambda x: pd.to_numeric(x, errors='coerce').mean()
-                ).reset_index()
-                grouped_data.columns = [group_col, f"average_{value_col}"]
-                return f"Average '{value_col}' grouped by '{group_col}':", grouped_data, None
-            else:
-                # Just count occurrences
-                count_data = dataframe[group_col].value_counts().reset_index()
-                count_data.columns = [group_col, "count"]
-                return f"Count breakdown by '{group_col}':", count_data, None
-        
-        elif action_type == "create_bar_chart":
-            column_name = action_info[1]
-            if not column_name:
-                return "I couldn't determine which column to chart.", None, None
-            
-            value_counts = dataframe[column_name].value_counts()
-            
-            # Create interactive plotly chart
-            fig = px.bar(
-                x=value_counts.index, 
-                y=value_counts.values,
-                title=f"Distribution of {column_name.replace('_', ' ').title()}",
-                labels={'x': column_name.replace('_', ' ').title(), 'y': 'Count'}
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-            return f"Bar chart showing the distribution of '{column_name}'", None, fig
-        
-        elif action_type == "create_histogram":
-            column_name = action_info[1]
-            if not column_name:
-                return "I couldn't determine which column to analyze.", None, None
-            
-            numeric_data = pd.to_numeric(dataframe[column_name], errors='coerce').dropna()
-            
-            fig = px.histogram(
-                x=numeric_data, 
-                nbins=25,
-                title=f"Distribution of {column_name.replace('_', ' ').title()}"
-            )
-            fig.update_layout(
-                xaxis_title=column_name.replace('_', ' ').title(),
-                yaxis_title='Frequency'
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            return f"Histogram showing the distribution of '{column_name}'", None, fig
-        
-        elif action_type == "create_pie_chart":
-            column_name = action_info[1]
-            if not column_name:
-                return "I couldn't determine which column to chart.", None, None
-            
-            value_counts = dataframe[column_name].value_counts()
-            
-            fig = px.pie(
-                values=value_counts.values, 
-                names=value_counts.index,
-                title=f"Composition of {column_name.replace('_', ' ').title()}"
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            return f"Pie chart showing the composition of '{column_name}'", None, fig
-        
-        elif action_type == "create_line_chart":
-            time_col, value_col = action_info[1], action_info[2]
-            if not time_col or not value_col:
-                return "I need both a time column and a value column for a line chart.", None, None
-            
-            # Try to parse dates
-            try:
-                dates = pd.to_datetime(dataframe[time_col], errors='coerce')
-                values = pd.to_numeric(dataframe[value_col], errors='coerce')
-                
-                fig = px.line(
-                    x=dates, 
-                    y=values,
-                    title=f"{value_col.replace('_', ' ').title()} Over Time"
-                )
-                fig.update_layout(
-                    xaxis_title=time_col.replace('_', ' ').title(),
-                    yaxis_title=value_col.replace('_', ' ').title()
-                )
-                st.plotly_chart(fig, use_container_width=True)
-                return f"Line chart showing '{value_col}' over '{time_col}'", None, fig
-            except:
-                return "I had trouble creating the line chart with those columns.", None, None
-        
-        elif action_type == "create_scatter_plot":
-            col1, col2 = action_info[1], action_info[2]
-            if not col1 or not col2:
-                return "I need two numeric columns for a scatter plot.", None, None
-            
-            x_data = pd.to_numeric(dataframe[col1], errors='coerce')
-            y_data = pd.to_numeric(dataframe[col2], errors='coerce')
-            
-            fig = px.scatter(
-                x=x_data, 
-                y=y_data,
-                title=f"Relationship between {col1.replace('_', ' ').title()} and {col2.replace('_', ' ').title()}"
-            )
-            fig.update_layout(
-                xaxis_title=col1.replace('_', ' ').title(),
-                yaxis_title=col2.replace('_', ' ').title()
+def show_performance_panel():
+    """Where the last upload and question spent their time, plus the profiling switches"""
+    with st.expander(" Performance", expanded=True):
+        track_memory = st.checkbox(
+            "Track memory allocations",
+            value=tracemalloc.is_tracing(),
+            help="Uses tracemalloc for the whole server, which makes everything noticeably slower"
+        )
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        
+        if st.button("Profile the next question"):
+            st.session_state["profile_next_question"] = True
+        if st.session_state.get("profile_next_question"):
+            st.caption("The next question will run under cProfile (skipping the answer cache).")
+        
+        recorded_traces = []
+        for trace_key, title in [("last_upload_trace", "Last upload"), ("last_question_trace", "Last question")]:
+            trace = st.session_state.get(trace_key)
+            if trace is None:
+                continue
+            recorded_traces.append(trace)
+            st.markdown(f"**{title}** - {trace.label} ({trace.total_seconds * 1000:.0f} ms)")
+            st.dataframe(trace.stage_table(), hide_index=True, use_container_width=True)
+            if trace.profile_text:
+                st.code(trace.profile_text, language=None)
+        
+        if recorded_traces:
+            st.download_button(
+                "Download traces (JSON lines)",
+                "".join(json.dumps(trace.as_dict(), default=str) + "\n" for trace in recorded_traces),
+                file_name="traces.jsonl",
+                mime="application/json"
             )
-            st.plotly_chart(fig, use_container_width=True)
-            return f"Scatter plot showing the relationship between '{col1}' and '{col2}'", None, fig
-        
-        elif action_type == "generate_summary":
-            summary_stats = dataframe.describe(include='all')
-            return "Here's a comprehensive summary of your dataset:", summary_stats, None
-        
-        else:
-            return "I'm not sure how to handle that request yet.", None, None
-    
-    except Exception as error:
-        return f"I encountered an error while processing your request: {str(error)}", None, None
 
 # --- Main Streamlit Application ---
 
@@ -489,23 +111,83 @@ uploaded_data_file = st.file_uploader(
     help="Supports Excel (.xlsx, .xls) and CSV files"
 )
 
-if uploaded_data_file is not None:
+# Really big CSVs can be streamed straight off the server's disk instead of uploaded
+server_csv_name = None
+if SERVER_DATA_DIR:
+    server_csv_name = st.sidebar.text_input(
+        "Or analyse a large CSV from the server",
+        placeholder="transactions_2024.csv",
+        help=f"A CSV inside {SERVER_DATA_DIR}. It's read in chunks, so it can be bigger than memory."
+    )
+
+if uploaded_data_file is not None or server_csv_name:
     try:
-        # Determine file type and read accordingly
-        file_extension = uploaded_data_file.name.split('.')[-1].lower()
-        
-        if file_extension == 'csv':
-            raw_dataframe = pd.read_csv(uploaded_data_file)
+        # Workbooks: list the sheets straight away, but only read the ones that get picked
+        selected_sheets = None
+        if uploaded_data_file is not None and not uploaded_data_file.name.lower().endswith('.csv'):
+            listed_sheets = st.session_state.get("listed_sheets")
+            if listed_sheets is None or listed_sheets[0] != uploaded_data_file.file_id:
+                listed_sheets = (uploaded_data_file.file_id, list_excel_sheets(uploaded_data_file.getvalue()))
+                st.session_state["listed_sheets"] = listed_sheets
+            sheet_names = listed_sheets[1]
+            if len(sheet_names) > 1:
+                selected_sheets = st.multiselect(
+                    "Sheets to analyse",
+                    sheet_names,
+                    default=sheet_names[:1],
+                    help="Only these sheets are read. Pick several with the same layout (monthly tabs, say) "
+                         "and they're stacked into one table with a 'sheet' column."
+                ) or sheet_names[:1]
+        
+        # The dataset itself lives in the process-wide store - this session only keeps a handle
+        # on it, and the same upload on a rerun skips even the hashing
+        if uploaded_data_file is not None:
+            source_id = f"upload:{uploaded_data_file.file_id}"
+            if selected_sheets:
+                source_id += ":" + "|".join(selected_sheets)
         else:
-            raw_dataframe = pd.read_excel(uploaded_data_file)
-        
-        # Process the data
-        clean_dataframe = sanitize_column_headers(raw_dataframe)
-        clean_dataframe = add_calculated_columns(clean_dataframe)
-        processed_dataframe = process_uploaded_data(clean_dataframe)
-        detected_column_types = figure_out_column_types(processed_dataframe)
+            server_csv_path = resolve_server_csv_path(server_csv_name)
+            source_id = f"server:{server_csv_path}:{os.stat(server_csv_path).st_mtime_ns}"
+        dataset_handle = st.session_state.get("dataset_handle")
+        if dataset_handle is None or dataset_handle.source_id != source_id:
+            # Read and process the file - identical uploads (from any session) come straight from the store
+            source_name = uploaded_data_file.name if uploaded_data_file is not None else server_csv_name
+            with traced("upload", source_name) as upload_trace:
+                if uploaded_data_file is not None:
+                    loaded_dataset = load_uploaded_dataset(
+                        uploaded_data_file, cache=get_ingestion_cache(), disk_cache=get_disk_cache(),
+                        sheet_names=selected_sheets
+                    )
+                else:
+                    loaded_dataset = load_server_csv(server_csv_path, cache=get_ingestion_cache())
+                upload_trace.dataset_id = loaded_dataset.fingerprint
+            st.session_state["last_upload_trace"] = upload_trace
+            if dataset_handle is None or dataset_handle.content_hash != loaded_dataset.fingerprint:
+                if dataset_handle is not None:
+                    dataset_handle.release()
+                dataset_handle = get_ingestion_cache().acquire(
+                    loaded_dataset.fingerprint, loaded_dataset, source_id=source_id
+                )
+                st.session_state["dataset_handle"] = dataset_handle
+            else:
+                # Same content under a new upload - remember it so the next rerun skips the hashing
+                dataset_handle.source_id = source_id
+        active_dataset = dataset_handle.dataset
+        detected_column_types = active_dataset.column_types
+        
+        # Already running if the load started it - this just hands back the same job
+        dataset_warmup = start_warmup(active_dataset)
+        with st.sidebar:
+            if hasattr(st, "fragment"):
+                # Redraws itself every second until the warm-up is done, without rerunning the page
+                st.fragment(run_every=None if dataset_warmup.done() else 1.0)(show_warmup_progress)(dataset_warmup)
+            else:
+                # Streamlit before 1.37 has no fragments - show where it's at now, the next rerun updates it
+                show_warmup_progress(dataset_warmup)
         
-        st.success(f"Successfully loaded your file! Found {len(processed_dataframe)} rows and {len(processed_dataframe.columns)} columns.")
+        st.success(f"Successfully loaded your file! Found {len(active_dataset)} rows and {len(active_dataset.columns)} columns.")
+        if isinstance(active_dataset, StreamingCsvDataset):
+            st.info("This file is large, so I'm answering from running totals and reading it in chunks when needed.")
         
         # Create two columns for layout
         col1, col2 = st.columns([2, 1])
@@ -518,39 +200,129 @@ if uploaded_data_file is not None:
             )
             
             if user_question:
-                with st.spinner("Analyzing your question..."):
+                with st.spinner("Analyzing your question..."), \
+                        traced("question", user_question, active_dataset.fingerprint) as question_trace:
                     # Parse and execute the query
-                    parsed_action = parse_natural_language_query(user_question, processed_dataframe, detected_column_types)
-                    response_text, result_table, chart_figure = execute_analysis_request(parsed_action, processed_dataframe)
+                    parsed_action = parse_natural_language_query(user_question, active_dataset, detected_column_types)
+                    if st.session_state.pop("profile_next_question", False):
+                        # Straight to the executor so the profile shows the real work, not a cache hit
+                        (response_text, result_table, chart_figure), _ = profile_call(
+                            run_cached_query, parsed_action, active_dataset
+                        )
+                    else:
+                        response_text, result_table, chart_figure = run_cached_query(
+                            parsed_action, active_dataset, cache=get_query_cache()
+                        )
                     
                     # Display the response
+                    if chart_figure is not None:
+                        with trace_stage("render chart"):
+                            st.plotly_chart(chart_figure, use_container_width=True)
                     st.markdown(f"** Analysis Result:** {response_text}")
                     
                     if result_table is not None:
-                        st.dataframe(result_table, use_container_width=True)
+                        with trace_stage("render table", rows=len(result_table)):
+                            st.dataframe(result_table, use_container_width=True)
+                # Only keep new questions, so a rerun answered from the cache doesn't hide the real timings
+                previous_trace = st.session_state.get("last_question_trace")
+                asked_before = previous_trace is not None and \
+                    (previous_trace.label, previous_trace.dataset_id) == (user_question, active_dataset.fingerprint)
+                if not asked_before or question_trace.profile_text:
+                    st.session_state["last_question_trace"] = question_trace
         
         with col2:
             st.subheader(" Dataset Overview")
-            st.metric("Total Rows", len(processed_dataframe))
-            st.metric("Total Columns", len(processed_dataframe.columns))
+            st.metric("Total Rows", len(active_dataset))
+            st.metric("Total Columns", len(active_dataset.columns))
+            memory_report = active_dataset.memory_report()
+            st.metric(
+                "Memory Used",
+                f"{memory_report['typed_bytes'] / 1024 / 1024:.1f} MB",
+                delta=f"-{max(memory_report['saved_bytes'], 0) / 1024 / 1024:.1f} MB vs. all-text",
+                delta_color="inverse"
+            )
+            
+            query_cache_stats = get_query_cache().stats()
+            st.caption(
+                f"Answer cache: {query_cache_stats['hits']} hits, {query_cache_stats['misses']} misses "
+                f"({query_cache_stats['entries']} answers, {query_cache_stats['size_bytes'] / 1024 / 1024:.1f} MB)"
+            )
+            
+            store_stats = get_ingestion_cache().stats()
+            st.caption(
+                f"Shared datasets: {store_stats['datasets']} in memory, {store_stats['in_use']} in use "
+                f"by {store_stats['references']} sessions ({store_stats['size_bytes'] / 1024 / 1024:.0f} of "
+                f"{store_stats['budget_bytes'] / 1024 / 1024:.0f} MB)"
+            )
             
             # Show column types
             with st.expander("Column Information"):
                 for col, col_type in detected_column_types.items():
                     st.write(f"**{col}**: {col_type}")
+            
+            # Only the profiles the warm-up has finished - the rest show up on a later rerun
+            if isinstance(active_dataset, TypedDataset):
+                numeric_profiles = build_dataset_profiles(active_dataset, ready_only=True)
+                numeric_total = sum(1 for col_type in detected_column_types.values() if col_type == "numerical")
+                if numeric_profiles:
+                    with st.expander("Numeric Column Profiles"):
+                        if len(numeric_profiles) < numeric_total:
+                            st.caption(f"{len(numeric_profiles)} of {numeric_total} profiles ready, the rest are still being built")
+                        profile_table = pd.DataFrame(numeric_profiles).T[
+                            ["count", "null_count", "mean", "min", "median", "max"]
+                        ]
+                        st.dataframe(profile_table, use_container_width=True)
+        
+        # Lots of questions at once - shared scans run once for the whole list
+        with st.expander(" Batch Questions"):
+            batch_text = st.text_area(
+                "One question per line",
+                placeholder="average sales by region\nhistogram of profit\nhow many orders are over 500"
+            )
+            batch_file = st.file_uploader("...or a text file of questions", type=["txt"], key="batch_questions_file")
+            batch_questions = batch_text.splitlines()
+            if batch_file is not None:
+                batch_questions += batch_file.getvalue().decode("utf-8", errors="replace").splitlines()
+            
+            if st.button(" Run Batch") and any(question.strip() for question in batch_questions):
+                with st.spinner("Answering your questions..."):
+                    batch_report, batch_results = run_batch(batch_questions, active_dataset, cache=get_query_cache())
+                
+                st.caption(
+                    f"{len(batch_report)} questions in {batch_report['ms'].sum() + batch_report.attrs['prefetch_ms']:.0f} ms "
+                    f"({batch_report.attrs['prefetch_ms']:.0f} ms of that in shared scans)"
+                )
+                st.dataframe(batch_report, use_container_width=True)
+                st.download_button(
+                    "Download report (CSV)",
+                    batch_report.to_csv(index=False).encode("utf-8"),
+                    file_name="batch_report.csv",
+                    mime="text/csv"
+                )
+                for question, _, response_text, result_table, chart_figure in batch_results:
+                    if result_table is None and chart_figure is None:
+                        continue
+                    st.markdown(f"**{question}** - {response_text}")
+                    if chart_figure is not None:
+                        st.plotly_chart(chart_figure, use_container_width=True)
+                    if result_table is not None:
+                        st.dataframe(result_table, use_container_width=True)
         
         # Data preview section
         with st.expander(" Preview Your Data"):
-            st.dataframe(processed_dataframe.head(10), use_container_width=True)
+            st.dataframe(active_dataset.preview(10), use_container_width=True)
         
         # Quick insights section
         st.subheader(" Quick Insights")
         insight_cols = st.columns(3)
         
         with insight_cols[0]:
+            exact_summary = st.checkbox("Exact summary (slower)", value=False)
             if st.button(" Show Summary Statistics"):
-                summary_action = ("generate_summary",)
-                summary_response, summary_table, _ = execute_analysis_request(summary_action, processed_dataframe)
+                summary_action = ("generate_summary", exact_summary)
+                summary_response, summary_table, _ = run_cached_query(
+                    summary_action, active_dataset, cache=get_query_cache()
+                )
                 st.write(summary_response)
                 if summary_table is not None:
                     st.dataframe(summary_table)
@@ -561,7 +333,9 @@ if uploaded_data_file is not None:
                 categorical_cols = [col for col, col_type in detected_column_types.items() if col_type == "categorical"]
                 if categorical_cols:
                     chart_action = ("create_bar_chart", categorical_cols[0])
-                    execute_analysis_request(chart_action, processed_dataframe)
+                    _, _, chart_figure = run_cached_query(chart_action, active_dataset, cache=get_query_cache())
+                    if chart_figure is not None:
+                        st.plotly_chart(chart_figure, use_container_width=True)
         
         with insight_cols[2]:
             if st.button(" Data Types Overview"):
@@ -578,6 +352,10 @@ if uploaded_data_file is not None:
         st.info("Please make sure your file is a valid Excel or CSV file with proper formatting.")
 
 else:
+    # Nothing loaded any more, so let the store know this session is done with its dataset
+    previous_handle = st.session_state.pop("dataset_handle", None)
+    if previous_handle is not None:
+        previous_handle.release()
     st.info(" Please upload an Excel (.xlsx) or CSV file to get started!")
     
     # Show some example queries
@@ -595,6 +373,11 @@ else:
     for question in example_questions:
         st.write(f"• {question}")
 
+# Optional - last in the script so it shows this run's timings
+if st.sidebar.toggle("Performance panel", value=False):
+    with st.sidebar:
+        show_performance_panel()
+
 # Footer
 st.markdown("---")
 st.markdown(
@@ -605,4 +388,4 @@ st.markdown(
     </div>
     """, 
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
@@ -0,0 +1,117 @@
+"""How many questions per second the parser gets through.
+
+Run from the repo root:
+
+    python benchmarks/parser_throughput.py --repeat 5
+
+Three numbers come out: the intent matcher on its own, full parses with the
+memo cleared (what a brand-new question costs) and memoized parses (what a
+Streamlit rerun of the same question costs).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.dataset import build_typed_dataset
+from engine.inference import infer_column_types
+from engine.loading import prepare_lookup_indexes
+from engine.parser import classify_intent, parse_natural_language_query
+
+# {num}, {cat} and {value} get filled in with columns and values from the sample data
+QUESTION_TEMPLATES = [
+    "what is the average {num}",
+    "total {num}",
+    "show me the maximum {num}",
+    "what's the lowest {num}",
+    "median {num}",
+    "how many rows have {num} over 50",
+    "count records where {num} is between 10 and 20",
+    "how many are in {value}",
+    "how many records are there",
+    "pie chart of {cat}",
+    "bar chart of {cat}",
+    "histogram of {num}",
+    "distribution of {num} with 40 bins",
+    "{num} trend over time",
+    "scatter plot {num} vs {num2}",
+    "compare {num} by {cat}",
+    "breakdown of {num} by {cat}",
+    "average {num} by {cat}",
+    "top 5 {cat} by total {num}",
+    "group by {cat} and {cat2}",
+    "give me a summary",
+    "describe the data",
+    "hello there",
+]
+
+def build_sample_dataset(row_count=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    raw_frame = pd.DataFrame({
+        "sales_amount": rng.normal(100, 20, row_count).round(2).astype(str),
+        "profit": rng.normal(10, 3, row_count).round(2).astype(str),
+        "age": rng.integers(18, 70, row_count).astype(str),
+        "region": rng.choice(["North", "South", "East", "West"], row_count),
+        "department": rng.choice(["Sales", "Marketing", "Finance", "IT", "HR"], row_count),
+        "order_date": pd.date_range("2021-01-01", periods=row_count, freq="h").astype(str),
+    })
+    column_types, coerced_columns = infer_column_types(raw_frame)
+    dataset = build_typed_dataset(raw_frame, column_types, coerced_columns, fingerprint="parser-benchmark")
+    return prepare_lookup_indexes(dataset)
+
+def build_question_corpus(dataset):
+    numeric_columns = [c for c, t in dataset.column_types.items() if t == "numerical"]
+    label_columns = [c for c, t in dataset.column_types.items() if t == "categorical"]
+    questions = []
+    for position, template in enumerate(QUESTION_TEMPLATES):
+        for offset in range(len(numeric_columns)):
+            num = numeric_columns[(position + offset) % len(numeric_columns)]
+            num2 = numeric_columns[(position + offset + 1) % len(numeric_columns)]
+            cat = label_columns[offset % len(label_columns)]
+            cat2 = label_columns[(offset + 1) % len(label_columns)]
+            value = dataset.distinct_values(cat)[0]
+            questions.append(template.format(
+                num=num.replace("_", " "), num2=num2.replace("_", " "), cat=cat, cat2=cat2, value=value
+            ))
+    return questions
+
+def time_per_question(run_once, questions, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for question in questions:
+            run_once(question)
+    return (time.perf_counter() - started) / (repeat * len(questions))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the question corpus")
+    parser.add_argument("--rows", type=int, default=5000, help="rows in the sample dataset")
+    arguments = parser.parse_args()
+
+    dataset = build_sample_dataset(arguments.rows)
+    questions = build_question_corpus(dataset)
+    column_types = dataset.column_types
+
+    def parse_cold(question):
+        dataset.derived.pop("parse_memo", None)
+        parse_natural_language_query(question, dataset, column_types)
+
+    results = {
+        "intent matcher": time_per_question(lambda q: classify_intent(q.lower()), questions, arguments.repeat),
+        "full parse (cold)": time_per_question(parse_cold, questions, arguments.repeat),
+        "full parse (memoized)": time_per_question(
+            lambda q: parse_natural_language_query(q, dataset, column_types), questions, arguments.repeat
+        ),
+    }
+
+    print(f"{len(questions)} questions x {arguments.repeat} passes")
+    for label, seconds in results.items():
+        print(f"{label:<24} {seconds * 1e6:>10.1f} us/question {1 / seconds:>12,.0f} questions/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Timing and peak memory for every pipeline stage and every kind of question.
+
+Run from the repo root:
+
+    python benchmarks/pipeline_benchmark.py --tiers 10k,100k --output bench.json
+    python benchmarks/pipeline_benchmark.py --tiers 10k,100k --compare bench.json
+
+Each tier is a synthetic orders table (see synthetic.py) with dirty Excel-style
+headers. For each one we time the ingest (read_csv, plus read_excel and the
+engine's own streaming sheet reader on the smaller tiers), the clean-up steps,
+type inference, the typed build, question parsing and then every action type,
+both cold (nothing derived yet) and warm.
+Times are the median of --repeat runs; peak memory comes from a separate
+tracemalloc run so it doesn't slow the timings down.
+
+Results go to JSON. --compare prints anything that got slower than a baseline
+file by more than --tolerance and exits with status 1 if something did.
+"""
+
+import argparse
+import copy
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.charts import figure_spec_json
+from engine.cleaning import add_calculated_columns, process_uploaded_data, sanitize_column_headers
+from engine.dataset import TypedDataset, build_typed_dataset
+from engine.excel import read_excel_sheet
+from engine.executor import execute_analysis_request
+from engine.inference import infer_column_types
+from engine.loading import prepare_lookup_indexes
+from engine.parser import parse_natural_language_query
+from engine.streaming import StreamingCsvDataset
+
+from synthetic import generate_business_table, table_to_bytes
+
+SIZE_TIERS = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+
+# One question per action type the executor knows, worded the way people ask
+BENCHMARK_QUESTIONS = [
+    "what is the average sales amount",
+    "total profit",
+    "median unit price",
+    "how many orders have sales amount over 500",
+    "count orders with qty between 5 and 10",
+    "how many are in North",
+    "how many records",
+    "pie chart of region",
+    "bar chart of product name",
+    "histogram of sales amount",
+    "sales amount trend over time",
+    "scatter plot unit price vs sales amount",
+    "average sales amount by region",
+    "top 5 product name by total profit",
+    "group by region and department",
+    "give me a summary",
+    "exact summary",
+]
+
+def time_call(run, setup=None, repeat=3):
+    """Median and best wall time of run(setup()) - setup isn't timed"""
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        started = time.perf_counter()
+        run(argument)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)), float(min(timings))
+
+def peak_memory(run, setup=None):
+    """Peak bytes allocated while run(setup()) was going, on top of what setup left behind"""
+    tracemalloc.start()
+    try:
+        argument = setup() if setup is not None else None
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        run(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return max(peak - baseline, 0)
+
+def benchmark(results, tier, rows, stage, name, run, setup=None, repeat=3, **details):
+    median_seconds, best_seconds = time_call(run, setup, repeat)
+    peak_bytes = peak_memory(run, setup)
+    results.append({
+        "tier": tier,
+        "rows": rows,
+        "stage": stage,
+        "name": name,
+        "median_seconds": median_seconds,
+        "best_seconds": best_seconds,
+        "rows_per_second": rows / median_seconds if median_seconds > 0 else None,
+        "peak_mb": peak_bytes / 1024 / 1024,
+        **details,
+    })
+    print(f"  {stage:<8} {name:<64} {median_seconds * 1000:>10.1f} ms {peak_bytes / 1024 / 1024:>9.1f} MB", flush=True)
+
+def cold_dataset(typed_dataset):
+    """The same columns with nothing derived yet, like a dataset fresh off the load"""
+    return TypedDataset(
+        typed_dataset.frame,
+        typed_dataset.column_types,
+        fingerprint=typed_dataset.fingerprint,
+        string_memory_bytes=typed_dataset.string_memory_bytes,
+    )
+
+def cold_streaming_dataset(streaming_dataset):
+    """Keeps the load pass's running totals but forgets every rescan"""
+    dataset = copy.copy(streaming_dataset)
+    dataset.derived = {}
+    dataset.derived_bytes = 0
+    dataset.building = {}
+    dataset.derived_lock = threading.RLock()
+    dataset.failed_scans = {}
+    return dataset
+
+def run_tier(tier, rows, arguments, results):
+    print(f"\n{tier}: generating {rows:,} rows", flush=True)
+    frame = generate_business_table(rows, seed=arguments.seed, extra_numeric=arguments.extra_numeric)
+    csv_bytes = table_to_bytes(frame, "csv")
+    print(f"  csv is {len(csv_bytes) / 1024 / 1024:.1f} MB", flush=True)
+    
+    # Ingest
+    benchmark(results, tier, rows, "ingest", "read_csv", lambda _: pd.read_csv(io.BytesIO(csv_bytes)),
+              repeat=arguments.repeat, input_bytes=len(csv_bytes))
+    if rows <= arguments.excel_max_rows:
+        xlsx_bytes = table_to_bytes(frame, "xlsx")
+        benchmark(results, tier, rows, "ingest", "read_excel", lambda _: pd.read_excel(io.BytesIO(xlsx_bytes)),
+                  repeat=max(1, arguments.repeat // 2), input_bytes=len(xlsx_bytes))
+        benchmark(results, tier, rows, "ingest", "read_excel_sheet", lambda _: read_excel_sheet(xlsx_bytes),
+                  repeat=max(1, arguments.repeat // 2), input_bytes=len(xlsx_bytes))
+    raw_frame = pd.read_csv(io.BytesIO(csv_bytes))
+    
+    # Clean-up, inference and the typed build, each fed the previous stage's output
+    benchmark(results, tier, rows, "clean", "sanitize_column_headers", sanitize_column_headers,
+              setup=lambda: raw_frame.copy(), repeat=arguments.repeat)
+    clean_frame = add_calculated_columns(sanitize_column_headers(raw_frame.copy()))
+    benchmark(results, tier, rows, "clean", "add_calculated_columns", add_calculated_columns,
+              setup=lambda: clean_frame.copy(), repeat=arguments.repeat)
+    benchmark(results, tier, rows, "clean", "process_uploaded_data", lambda df: process_uploaded_data(df, copy=False),
+              setup=lambda: clean_frame.copy(), repeat=arguments.repeat)
+    processed_frame = process_uploaded_data(clean_frame)
+    benchmark(results, tier, rows, "infer", "infer_column_types", infer_column_types,
+              setup=lambda: processed_frame, repeat=arguments.repeat)
+    # A per-element dateutil fallback is what made inference slow, so it fails the run
+    # rather than hiding in the timings
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", UserWarning)
+        column_types, coerced_columns = infer_column_types(processed_frame)
+    benchmark(results, tier, rows, "build", "build_typed_dataset",
+              lambda df: build_typed_dataset(df, column_types, coerced_columns, fingerprint=tier),
+              setup=lambda: processed_frame.copy(), repeat=arguments.repeat)
+    typed_dataset = build_typed_dataset(processed_frame.copy(), column_types, coerced_columns, fingerprint=tier)
+    
+    # Parsing - the lookup indexes are built (the warm-up does that) but nothing is memoized yet
+    def parse_all(dataset):
+        for question in BENCHMARK_QUESTIONS:
+            parse_natural_language_query(question, dataset, column_types)
+    benchmark(results, tier, rows, "parse", "parse_natural_language_query (all questions)", parse_all,
+              setup=lambda: prepare_lookup_indexes(cold_dataset(typed_dataset)), repeat=arguments.repeat,
+              questions=len(BENCHMARK_QUESTIONS))
+    
+    # Every action, cold and warm, plus turning its chart into JSON
+    for question in BENCHMARK_QUESTIONS:
+        action_info = parse_natural_language_query(question, typed_dataset, column_types)
+        label = f"{action_info[0]}: {question}"
+        benchmark(results, tier, rows, "action", f"{label} (cold)",
+                  lambda dataset: execute_analysis_request(action_info, dataset),
+                  setup=lambda: cold_dataset(typed_dataset), repeat=arguments.repeat, action=list(map(str, action_info)))
+        # Warm means everything the action derives is already cached on the dataset
+        execute_analysis_request(action_info, typed_dataset)
+        benchmark(results, tier, rows, "action", f"{label} (warm)",
+                  lambda _: execute_analysis_request(action_info, typed_dataset),
+                  repeat=arguments.repeat, action=list(map(str, action_info)))
+        _, _, figure = execute_analysis_request(action_info, typed_dataset)
+        if figure is not None:
+            benchmark(results, tier, rows, "render", f"figure_spec_json: {question}",
+                      lambda _: figure_spec_json(figure), repeat=arguments.repeat)
+    
+    if arguments.streaming:
+        # The chunked path for files too big to load, on the same bytes
+        benchmark(results, tier, rows, "stream", "StreamingCsvDataset load pass",
+                  lambda _: StreamingCsvDataset(csv_bytes), repeat=1)
+        streaming_dataset = StreamingCsvDataset(csv_bytes)
+        for question in BENCHMARK_QUESTIONS:
+            action_info = parse_natural_language_query(question, streaming_dataset, streaming_dataset.column_types)
+            benchmark(results, tier, rows, "stream", f"{action_info[0]}: {question}",
+                      lambda dataset: execute_analysis_request(action_info, dataset),
+                      setup=lambda: cold_streaming_dataset(streaming_dataset), repeat=1)
+
+def run_metadata(arguments):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": arguments.seed,
+        "repeat": arguments.repeat,
+        "extra_numeric": arguments.extra_numeric,
+    }
+
+def compare_results(baseline_path, results, tolerance):
+    """Print everything that got slower than the baseline by more than the tolerance"""
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    previous = {(entry["tier"], entry["stage"], entry["name"]): entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        before = previous.get((entry["tier"], entry["stage"], entry["name"]))
+        if before is None or before["median_seconds"] <= 0:
+            continue
+        ratio = entry["median_seconds"] / before["median_seconds"]
+        # Ignore sub-millisecond noise
+        if ratio > 1 + tolerance and entry["median_seconds"] - before["median_seconds"] > 0.001:
+            regressions.append((ratio, entry, before))
+    
+    print(f"\nCompared with {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    if not regressions:
+        print(f"  nothing slower by more than {tolerance:.0%}")
+    for ratio, entry, before in sorted(regressions, key=lambda item: -item[0]):
+        print(f"  {entry['tier']:<5} {entry['stage']:<8} {entry['name']:<64} "
+              f"{before['median_seconds'] * 1000:>9.1f} -> {entry['median_seconds'] * 1000:>9.1f} ms ({ratio:.2f}x)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiers", default="10k,100k", help=f"comma-separated, from {', '.join(SIZE_TIERS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (the median is kept)")
+    parser.add_argument("--seed", type=int, default=7, help="seed for the synthetic data")
+    parser.add_argument("--extra-numeric", type=int, default=4, help="extra metric_N columns on top of the base table")
+    parser.add_argument("--excel-max-rows", type=int, default=100_000, help="skip read_excel on bigger tiers (it's slow to write)")
+    parser.add_argument("--streaming", action="store_true", help="also benchmark the chunked path for huge CSVs")
+    parser.add_argument("--output", help="write the results here as JSON")
+    parser.add_argument("--compare", help="a previous --output file to check for regressions against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="slowdown allowed before --compare complains")
+    arguments = parser.parse_args()
+    
+    tiers = [tier.strip().lower() for tier in arguments.tiers.split(",") if tier.strip()]
+    unknown = [tier for tier in tiers if tier not in SIZE_TIERS]
+    if unknown:
+        parser.error(f"unknown tier(s): {', '.join(unknown)}")
+    
+    # The dirty date formats set off pandas' "could not infer format" warnings on every run
+    warnings.filterwarnings("ignore")
+    meta = run_metadata(arguments)
+    results = []
+    for tier in tiers:
+        run_tier(tier, SIZE_TIERS[tier], arguments, results)
+    
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            json.dump({"meta": meta, "results": results}, output_file, indent=2)
+        print(f"\nWrote {len(results)} results to {arguments.output}")
+    if arguments.compare:
+        if compare_results(arguments.compare, results, arguments.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Seeded, realistic-looking business tables for the benchmarks.
+
+    from benchmarks.synthetic import generate_business_table
+    
+    frame = generate_business_table(100_000, seed=7, extra_numeric=4, dirty_headers=True)
+
+Same arguments and seed always give the same table, so benchmark runs on
+different commits are measuring the same data.
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+REGIONS = ["North", "South", "East", "West", "Central", "Northeast", "Southwest", "International"]
+DEPARTMENTS = ["Sales", "Marketing", "Finance", "IT", "HR", "Operations", "Support", "Legal"]
+CHANNELS = ["Online", "Retail", "Partner", "Phone"]
+
+# What the columns are called when dirty_headers is on - the kind of thing Excel exports
+DIRTY_HEADERS = {
+    "order_id": "Order ID#",
+    "order_date": "Order Date",
+    "ship_date": " Ship-Date ",
+    "region": "REGION",
+    "department": "Department / Team",
+    "channel": "Sales Channel",
+    "product": "Product Name",
+    "customer_id": "Customer ID",
+    "sales_amount": "Sales Amount ($)",
+    "quantity": "Qty.",
+    "unit_price": "Unit Price ($)",
+    "discount": "Discount %",
+    "profit": "Profit",
+    "is_returned": "Return Status",
+    "notes": "Notes",
+}
+
+def generate_business_table(row_count, seed=0, extra_numeric=0, product_count=200, customer_count=None,
+                            region_count=5, date_columns=2, missing_rate=0.02, dirty_headers=True):
+    """An orders-style table: ids, dates, a few categories, money columns, sparse notes.
+    
+    Cardinalities are adjustable (product_count, customer_count, region_count),
+    date_columns picks 0-2 date columns, extra_numeric adds metric_N columns and
+    missing_rate blanks out that share of the discount and notes values.
+    """
+    rng = np.random.default_rng(seed)
+    customer_count = customer_count or max(row_count // 5, 1)
+    regions = REGIONS[:max(1, min(region_count, len(REGIONS)))]
+    
+    quantity = rng.integers(1, 20, row_count)
+    unit_price = np.round(rng.lognormal(3, 0.8, row_count), 2)
+    discount = np.round(rng.choice([0, 0, 0, 5, 10, 15, 20], row_count).astype(float), 1)
+    discount[rng.random(row_count) < missing_rate] = np.nan
+    sales_amount = np.round(quantity * unit_price * (1 - np.nan_to_num(discount) / 100), 2)
+    profit = np.round(sales_amount * rng.normal(0.15, 0.2, row_count), 2)
+    
+    columns = {
+        "order_id": np.arange(1, row_count + 1),
+    }
+    if date_columns >= 1:
+        order_dates = pd.Timestamp("2021-01-01") + pd.to_timedelta(rng.integers(0, 4 * 365, row_count), unit="D")
+        columns["order_date"] = order_dates.strftime("%Y-%m-%d")
+        if date_columns >= 2:
+            # A different format in the second date column, like a second system would export
+            ship_dates = order_dates + pd.to_timedelta(rng.integers(1, 15, row_count), unit="D")
+            columns["ship_date"] = ship_dates.strftime("%d/%m/%Y")
+    columns.update({
+        "region": rng.choice(regions, row_count),
+        "department": rng.choice(DEPARTMENTS, row_count),
+        "channel": rng.choice(CHANNELS, row_count, p=[0.5, 0.3, 0.15, 0.05]),
+        # Zipf-ish popularity so a few products dominate, as in real sales data
+        "product": np.char.add("Product ", (rng.zipf(1.3, row_count) % product_count).astype(str)),
+        "customer_id": np.char.add("C", rng.integers(0, customer_count, row_count).astype(str)),
+        "sales_amount": sales_amount,
+        "quantity": quantity,
+        "unit_price": unit_price,
+        "discount": discount,
+        "profit": profit,
+        "is_returned": rng.choice(["Returned", "Kept"], row_count, p=[0.07, 0.93]),
+    })
+    notes = np.where(rng.random(row_count) < 0.05, "call customer before shipping", None)
+    notes[rng.random(row_count) < missing_rate] = None
+    columns["notes"] = notes
+    for position in range(extra_numeric):
+        columns[f"metric_{position + 1}"] = np.round(rng.normal(100 * (position + 1), 15, row_count), 3)
+    
+    frame = pd.DataFrame(columns)
+    if dirty_headers:
+        frame = frame.rename(columns=DIRTY_HEADERS)
+    return frame
+
+def table_to_bytes(frame, file_format="csv"):
+    """The table as the bytes an upload of it would contain"""
+    buffer = io.BytesIO()
+    if file_format == "csv":
+        frame.to_csv(buffer, index=False)
+    elif file_format == "xlsx":
+        frame.to_excel(buffer, index=False)
+    else:
+        raise ValueError(f"Unknown format '{file_format}'")
+    return buffer.getvalue()
@@ -0,0 +1,39 @@
+"""The Smart BI Assistant's query engine, usable without Streamlit.
+
+    from engine import answer_question, load_dataset_file
+
+    dataset = load_dataset_file("sales.xlsx")
+    action, text, table, figure = answer_question("average revenue by region", dataset)
+
+Charts come back as plain Plotly figure dicts, so nothing here imports Plotly
+or Streamlit. `python -m engine FILE QUESTION...` does the same from a shell, and
+`run_batch` answers a list of questions with their shared scans done together.
+"""
+
+from .batch import run_batch
+from .caching import (
+    DiskDatasetCache,
+    IngestionCache,
+    QueryResultCache,
+    answer_question,
+    hash_uploaded_bytes,
+    run_cached_query,
+)
+from .charts import figure_spec_json
+from .dataset import TypedDataset, build_typed_dataset
+from .excel import list_excel_sheets, read_excel_sheets
+from .executor import execute_analysis_request
+from .inference import figure_out_column_types, infer_column_types
+from .instrumentation import Trace, profile_call, trace_stage, traced
+from .loading import (
+    SERVER_DATA_DIR,
+    load_dataset_bytes,
+    load_dataset_file,
+    load_server_csv,
+    load_uploaded_dataset,
+    resolve_server_csv_path,
+)
+from .parser import parse_natural_language_query
+from .profiles import build_dataset_profiles
+from .streaming import StreamingCsvDataset
+from .warmup import DatasetWarmup, start_warmup
@@ -0,0 +1,68 @@
+"""Ask questions about a file from the command line.
+
+    python -m engine sales.csv "average revenue by region" "pie chart of segment"
+    python -m engine big.csv --questions-file questions.txt --batch
+    python -m engine budget.xlsx --sheet Q1 --sheet Q2 "total spend by department"
+"""
+
+import argparse
+import time
+
+from . import answer_question, figure_spec_json, list_excel_sheets, load_dataset_file, run_batch
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m engine", description="Answer questions about a CSV or Excel file")
+    parser.add_argument("data_file", help="CSV or Excel file to load")
+    parser.add_argument("questions", nargs="*", help="questions in plain English")
+    parser.add_argument("--questions-file", help="text file with one more question per line")
+    parser.add_argument("--batch", action="store_true", help="answer everything together, sharing passes over the data")
+    parser.add_argument("--sheet", action="append", dest="sheets",
+                        help="workbook sheet to read (repeat for several, stacked into one table); default is the first")
+    parser.add_argument("--list-sheets", action="store_true", help="print the workbook's sheet names and stop")
+    parser.add_argument("--figure-json", action="store_true", help="print chart specs as JSON instead of a one-line note")
+    arguments = parser.parse_intermixed_args()
+    
+    if arguments.list_sheets:
+        with open(arguments.data_file, "rb") as data_file:
+            print("\n".join(list_excel_sheets(data_file.read())))
+        return
+    
+    started = time.perf_counter()
+    dataset = load_dataset_file(arguments.data_file, sheet_names=arguments.sheets)
+    print(f"Loaded {len(dataset):,} rows x {len(dataset.columns)} columns in {time.perf_counter() - started:.2f}s")
+    
+    questions = list(arguments.questions)
+    if arguments.questions_file:
+        with open(arguments.questions_file, encoding="utf-8") as question_file:
+            questions += [line.strip() for line in question_file if line.strip()]
+    if not questions:
+        parser.error("ask at least one question, or pass --questions-file")
+    
+    if arguments.batch:
+        started = time.perf_counter()
+        report, results = run_batch(questions, dataset)
+        batch_seconds = time.perf_counter() - started
+        answers = [result + (elapsed_ms,) for result, elapsed_ms in zip(results, report["ms"])]
+    else:
+        answers = []
+        for question in questions:
+            started = time.perf_counter()
+            answers.append((question,) + answer_question(question, dataset) + ((time.perf_counter() - started) * 1000,))
+    
+    for question, action, response_text, result_table, figure, elapsed_ms in answers:
+        print(f"\n> {question}\n  {action}\n{response_text}  ({elapsed_ms:.1f} ms)")
+        if result_table is not None:
+            print(result_table.to_string())
+        if figure is not None:
+            if arguments.figure_json:
+                print(figure_spec_json(figure))
+            else:
+                print(f"[chart: {figure['layout']['title']['text']}]")
+    
+    if arguments.batch:
+        print(f"\nBatch of {len(questions)} questions in {batch_seconds:.2f}s "
+              f"(shared scans {report.attrs['prefetch_ms']:.0f} ms)")
+        print(report[["action", "columns", "ms"]].to_string())
+
+if __name__ == "__main__":
+    main()
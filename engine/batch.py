@@ -0,0 +1,156 @@
+"""Answering a whole list of questions with as few passes over the data as we can get away with"""
+
+import time
+
+import pandas as pd
+
+from .caching import run_cached_query
+from .dataset import DEFAULT_HISTOGRAM_BINS
+from .parser import parse_natural_language_query
+from .streaming import StreamingCsvDataset
+from .timeseries import get_time_index
+
+def columns_touched(action_info, dataset):
+    """Every column an action reads, in the order it reads them"""
+    action_type = action_info[0]
+    if action_type == "generate_summary":
+        return list(dataset.columns)
+    if action_type == "group_and_analyze":
+        group_col, value_col = action_info[1], action_info[2]
+        key_columns = list(group_col) if isinstance(group_col, tuple) else [group_col]
+        return [col for col in key_columns + [value_col] if col]
+    if action_type in ["create_line_chart", "create_scatter_plot"]:
+        return [col for col in action_info[1:3] if col]
+    if action_type in ["count_all_rows", "unknown"] or len(action_info) < 2:
+        return []
+    return [action_info[1]] if action_info[1] else []
+
+def typed_warmups(action_info, dataset):
+    """(column, key, builder) for the derived data an in-memory action will ask for"""
+    action_type = action_info[0]
+    columns = columns_touched(action_info, dataset)
+    if not columns or action_type == "generate_summary":
+        return []
+    
+    first = columns[0]
+    if action_type == "calculate_statistic":
+        return [(first, ("profile", first), lambda: dataset.profile(first))]
+    if action_type in ["filter_and_count", "filter_count_range"]:
+        return [(first, ("sorted_values", first), lambda: dataset.sorted_values(first))]
+    if action_type == "filter_count_category":
+        return [(first, ("encoded", first), lambda: dataset.encoded(first))]
+    if action_type in ["create_bar_chart", "create_pie_chart"]:
+        return [(first, ("category_counts", first), lambda: dataset.category_counts(first))]
+    if action_type == "create_histogram":
+        bins = action_info[2] if len(action_info) > 2 else DEFAULT_HISTOGRAM_BINS
+        return [(first, ("histogram", first, bins), lambda: dataset.histogram(first, bins))]
+    if action_type == "create_line_chart" and action_info[1]:
+        warmups = [(first, ("time_index", first), lambda: get_time_index(dataset, first))]
+        if len(columns) == 2:
+            warmups.append((columns[1], ("numeric", columns[1]), lambda: dataset.numeric(columns[1])))
+        return warmups
+    if action_type == "create_scatter_plot":
+        return [(col, ("numeric", col), lambda col=col: dataset.numeric(col)) for col in columns]
+    if action_type == "group_and_analyze":
+        group_col, value_col = action_info[1], action_info[2]
+        key_columns = list(group_col) if isinstance(group_col, tuple) else [group_col]
+        warmups = [(key_columns[0], ("group_codes", tuple(key_columns)), lambda: dataset.group_codes(key_columns))]
+        if value_col:
+            warmups.append((value_col, ("numeric", value_col), lambda: dataset.numeric(value_col)))
+        return warmups
+    return []
+
+def streaming_scans(action_info, dataset):
+    """The chunk scans a streaming action would otherwise run one by one"""
+    action_type = action_info[0]
+    column_name = action_info[1] if len(action_info) > 1 else None
+    if action_type == "filter_and_count" and column_name:
+        return [dataset.count_matching_scan(column_name, action_info[2], action_info[3])]
+    if action_type == "filter_count_range" and column_name:
+        return [dataset.count_matching_scan(column_name, "between", (action_info[2], action_info[3]))]
+    if action_type in ["filter_count_category", "create_bar_chart", "create_pie_chart"] and column_name:
+        if dataset.value_counts.get(column_name) is not None:
+            return []
+        return [dataset.category_counts_scan(column_name)]
+    if action_type == "create_histogram" and column_name in dataset.numeric_stats:
+        bins = action_info[2] if len(action_info) > 2 else DEFAULT_HISTOGRAM_BINS
+        if isinstance(bins, str):
+            # Named rules may need their own passes (quantiles, spread) before the bins are known
+            return []
+        return [dataset.histogram_scan(column_name, bins)]
+    if action_type == "create_line_chart" and column_name:
+        if dataset.column_types.get(column_name) != 'datetime':
+            return []
+        return [dataset.daily_totals_scan(column_name, action_info[2])]
+    if action_type == "create_scatter_plot" and column_name and action_info[2]:
+        return [dataset.scatter_sample_scan(column_name, action_info[2])]
+    if action_type == "group_and_analyze" and column_name:
+        value_col = action_info[2]
+        key_columns = list(column_name) if isinstance(column_name, tuple) else [column_name]
+        if value_col:
+            if len(key_columns) == 1 and dataset.group_partials.get(key_columns[0]) is not None:
+                return []
+            return [dataset.group_sums_scan(key_columns, value_col)]
+        if len(key_columns) == 1:
+            if dataset.value_counts.get(key_columns[0]) is not None:
+                return []
+            return [dataset.category_counts_scan(key_columns[0])]
+        return [dataset.group_counts_scan(key_columns)]
+    # Medians and summaries have their own multi-pass algorithms
+    return []
+
+def prefetch_for_actions(actions, dataset):
+    """Build everything the actions need up front, reading each column as few times as possible"""
+    if isinstance(dataset, StreamingCsvDataset):
+        scans = [scan for action_info in actions for scan in streaming_scans(action_info, dataset)]
+        # One pass over the file no matter how many questions asked for rescans
+        return dataset.prefetch(scans)
+    
+    # In memory there's nothing to fuse across columns, but working column by column
+    # builds each one's numbers, codes and counts back to back and only once
+    warmups = {}
+    for action_info in actions:
+        for column_name, key, builder in typed_warmups(action_info, dataset):
+            warmups.setdefault(key, (column_name, builder))
+    column_order = {col: position for position, col in enumerate(dataset.columns)}
+    ordered = sorted(warmups.values(), key=lambda item: column_order.get(item[0], len(column_order)))
+    for _, builder in ordered:
+        try:
+            builder()
+        except Exception:
+            # The real run reports the error for that question
+            pass
+    return len(ordered)
+
+def run_batch(questions, dataset, cache=None):
+    """Answer a list of questions together: (report table, [(question, action, text, table, figure)])
+    
+    Everything is parsed first, the shared scans run once, then each question is
+    answered from what's been built (or straight from the answer cache).
+    """
+    questions = [question.strip() for question in questions if question and question.strip()]
+    actions = [parse_natural_language_query(question, dataset, dataset.column_types) for question in questions]
+    
+    started = time.perf_counter()
+    prefetch_for_actions(actions, dataset)
+    prefetch_seconds = time.perf_counter() - started
+    
+    results = []
+    report_rows = []
+    for question, action_info in zip(questions, actions):
+        question_started = time.perf_counter()
+        response_text, result_table, chart_figure = run_cached_query(action_info, dataset, cache=cache)
+        results.append((question, action_info, response_text, result_table, chart_figure))
+        report_rows.append({
+            "question": question,
+            "action": action_info[0],
+            "columns": ", ".join(columns_touched(action_info, dataset)),
+            "answer": response_text,
+            "result_rows": len(result_table) if result_table is not None else 0,
+            "chart": chart_figure["layout"]["title"]["text"] if chart_figure is not None else "",
+            "ms": round((time.perf_counter() - question_started) * 1000, 1),
+        })
+    
+    report = pd.DataFrame(report_rows, columns=["question", "action", "columns", "answer", "result_rows", "chart", "ms"])
+    report.attrs["prefetch_ms"] = round(prefetch_seconds * 1000, 1)
+    return report, results
@@ -0,0 +1,401 @@
+"""In-memory and on-disk caches for processed datasets and finished answers"""
+
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .charts import figure_spec_bytes
+from .dataset import DEFAULT_HISTOGRAM_BINS, TypedDataset, estimate_derived_bytes
+from .executor import execute_analysis_request
+from .instrumentation import trace_stage
+from .parser import parse_natural_language_query
+from .profiles import build_dataset_profiles
+
+# How much processed data we keep in memory between reruns (override with an env var)
+INGESTION_CACHE_BUDGET_MB = float(os.environ.get("BI_INGESTION_CACHE_MB", 1024))
+
+def hash_uploaded_bytes(raw_bytes):
+    """Fingerprint an upload by its content so re-uploads and renamed copies are recognised"""
+    return hashlib.blake2b(raw_bytes, digest_size=16).hexdigest()
+
+class DatasetHandle:
+    """One session's reference to a shared dataset.
+    
+    Sessions keep just this; the reference is given back when the handle is
+    released or garbage-collected along with the session.
+    """
+
+    def __init__(self, store, content_hash, dataset, source_id=None):
+        self.content_hash = content_hash
+        self.dataset = dataset
+        # Whatever the caller uses to spot the same upload again without rehashing it
+        self.source_id = source_id
+        self.finalizer = weakref.finalize(self, store.release, content_hash)
+
+    def release(self):
+        self.finalizer()
+
+class IngestionCache:
+    """The process-wide store of processed datasets, shared by every session.
+    
+    Entries are keyed by content hash, so everyone who uploads the same file gets
+    the same read-only dataset. Sessions hold them through handles (reference
+    counted); once nothing refers to a dataset it's evicted least-recently-used
+    first whenever the memory budget is exceeded. Datasets still in use are never
+    evicted, even if they push the total past the budget.
+    """
+
+    def __init__(self, memory_budget_mb=INGESTION_CACHE_BUDGET_MB):
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.load_locks = {}
+
+    @contextlib.contextmanager
+    def loading(self, content_hash):
+        """Hold this while building a dataset so a second upload of the same file waits for the first"""
+        with self.lock:
+            load_lock, waiters = self.load_locks.get(content_hash, (threading.Lock(), 0))
+            self.load_locks[content_hash] = (load_lock, waiters + 1)
+        try:
+            with load_lock:
+                yield
+        finally:
+            with self.lock:
+                load_lock, waiters = self.load_locks[content_hash]
+                if waiters == 1:
+                    del self.load_locks[content_hash]
+                else:
+                    self.load_locks[content_hash] = (load_lock, waiters - 1)
+
+    def get(self, content_hash):
+        with self.lock:
+            entry = self.entries.get(content_hash)
+            if entry is None:
+                return None
+            self.entries.move_to_end(content_hash)
+            return entry["dataset"]
+
+    def put(self, content_hash, dataset):
+        entry_bytes = dataset.memory_report()["resident_bytes"]
+        with self.lock:
+            self.store_entry(content_hash, dataset, entry_bytes)
+            self.remeasure()
+            self.evict_unreferenced()
+
+    def store_entry(self, content_hash, dataset, entry_bytes):
+        # Caller holds the lock. Replacing a dataset keeps the sessions' references to it
+        references = 0
+        if content_hash in self.entries:
+            replaced = self.entries.pop(content_hash)
+            self.total_bytes -= replaced["size_bytes"]
+            references = replaced["references"]
+        self.entries[content_hash] = {
+            "dataset": dataset,
+            "size_bytes": entry_bytes,
+            "references": references,
+        }
+        self.total_bytes += entry_bytes
+        return self.entries[content_hash]
+
+    def acquire(self, content_hash, dataset=None, source_id=None):
+        """A handle on the stored dataset, adding it first if it's given and not stored yet"""
+        entry_bytes = dataset.memory_report()["resident_bytes"] if dataset is not None else 0
+        with self.lock:
+            entry = self.entries.get(content_hash)
+            if entry is None:
+                if dataset is None:
+                    return None
+                entry = self.store_entry(content_hash, dataset, entry_bytes)
+            entry["references"] += 1
+            self.entries.move_to_end(content_hash)
+            self.remeasure()
+            # Referenced now, so this can only push out datasets nobody is using
+            self.evict_unreferenced()
+            return DatasetHandle(self, content_hash, entry["dataset"], source_id)
+
+    def release(self, content_hash):
+        with self.lock:
+            entry = self.entries.get(content_hash)
+            if entry is None:
+                return
+            entry["references"] = max(entry["references"] - 1, 0)
+            self.remeasure()
+            self.evict_unreferenced()
+
+    def remeasure(self):
+        # Caller holds the lock. Datasets keep deriving sorted values, indexes and
+        # counts after they're stored, so their sizes are taken again before evicting
+        for entry in self.entries.values():
+            entry["size_bytes"] = entry["dataset"].memory_report()["resident_bytes"]
+        self.total_bytes = sum(entry["size_bytes"] for entry in self.entries.values())
+
+    def evict_unreferenced(self):
+        # Caller holds the lock. Anything a session still uses stays put
+        for content_hash in list(self.entries):
+            if self.total_bytes <= self.memory_budget_bytes:
+                break
+            entry = self.entries[content_hash]
+            if entry["references"] == 0:
+                del self.entries[content_hash]
+                self.total_bytes -= entry["size_bytes"]
+
+    def stats(self):
+        with self.lock:
+            self.remeasure()
+            return {
+                "datasets": len(self.entries),
+                "in_use": sum(1 for entry in self.entries.values() if entry["references"]),
+                "references": sum(entry["references"] for entry in self.entries.values()),
+                "size_bytes": self.total_bytes,
+                "budget_bytes": self.memory_budget_bytes,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+# Answers to questions we've already worked out, per dataset (override with an env var)
+QUERY_CACHE_BUDGET_MB = float(os.environ.get("BI_QUERY_CACHE_MB", 256))
+
+# Trailing arguments the executors fill in when a parsed action leaves them out,
+# so ("create_histogram", "age") and ("create_histogram", "age", 25) share a cache entry
+ACTION_DEFAULTS = {
+    "group_and_analyze": (None, None, "mean", None),
+    "create_histogram": (None, DEFAULT_HISTOGRAM_BINS),
+    "create_line_chart": (None, None, "mean", "auto"),
+    "generate_summary": (False,),
+}
+
+def normalize_action(action_info):
+    """Canonical, hashable form of a parsed action for use as a cache key"""
+    action_type, arguments = action_info[0], list(action_info[1:])
+    defaults = ACTION_DEFAULTS.get(action_type, ())
+    arguments += defaults[len(arguments):]
+
+    def canonical(argument):
+        if isinstance(argument, (list, tuple)):
+            return tuple(canonical(item) for item in argument)
+        if isinstance(argument, (bool, np.bool_)):
+            return bool(argument)
+        if isinstance(argument, (int, float, np.integer, np.floating)):
+            # 30 and 30.0 are the same threshold
+            return float(argument)
+        return argument
+    return (action_type,) + tuple(canonical(argument) for argument in arguments)
+
+def estimate_result_bytes(response_text, result_table, chart_figure):
+    """Rough size of a cached answer: text, table memory and the figure spec's arrays"""
+    size_bytes = len(response_text.encode()) if response_text else 0
+    if result_table is not None:
+        size_bytes += int(result_table.memory_usage(deep=True).sum())
+    if chart_figure is not None:
+        size_bytes += figure_spec_bytes(chart_figure)
+    return size_bytes
+
+class QueryResultCache:
+    """Remembers finished answers keyed by (dataset fingerprint, normalized action).
+    
+    Same LRU-by-bytes policy as the ingestion cache, plus hit/miss counters for the UI.
+    """
+
+    def __init__(self, memory_budget_mb=QUERY_CACHE_BUDGET_MB):
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, cache_key):
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(cache_key)
+            return entry["result"]
+
+    def put(self, cache_key, result):
+        entry_bytes = estimate_result_bytes(*result)
+        if entry_bytes > self.memory_budget_bytes:
+            return
+        with self.lock:
+            if cache_key in self.entries:
+                self.total_bytes -= self.entries.pop(cache_key)["size_bytes"]
+            self.entries[cache_key] = {
+                "result": result,
+                "size_bytes": entry_bytes,
+            }
+            self.total_bytes += entry_bytes
+            while self.total_bytes > self.memory_budget_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted["size_bytes"]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "size_bytes": self.total_bytes,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+def execute_with_trace(action_info, dataset):
+    # Streaming datasets count the rows they actually read; in memory every row is in play
+    row_count = None if hasattr(dataset, "iter_chunks") else len(dataset)
+    with trace_stage(f"execute {action_info[0]}", rows=row_count):
+        return execute_analysis_request(action_info, dataset)
+
+def run_cached_query(action_info, dataset, cache=None):
+    """execute_analysis_request with answers reused across reruns and rephrased questions"""
+    fingerprint = getattr(dataset, "fingerprint", None)
+    if cache is None or fingerprint is None:
+        return execute_with_trace(action_info, dataset)
+    
+    cache_key = (fingerprint, normalize_action(action_info))
+    with trace_stage("answer cache lookup") as record:
+        cached_result = cache.get(cache_key)
+        if record is not None:
+            record["hit"] = cached_result is not None
+    if cached_result is not None:
+        return cached_result
+    
+    result = execute_with_trace(action_info, dataset)
+    # Errors aren't worth keeping - the next attempt might go through
+    if not result[0].startswith("I encountered an error"):
+        cache.put(cache_key, result)
+    return result
+
+def answer_question(user_question, dataset, cache=None):
+    """Parse a question and answer it: (action, response_text, result_table, figure_spec)"""
+    parsed_action = parse_natural_language_query(user_question, dataset, dataset.column_types)
+    return (parsed_action,) + tuple(run_cached_query(parsed_action, dataset, cache=cache))
+
+# Processed datasets are also written to disk so later sessions (even after a restart)
+# can skip the Excel parsing and type inference completely
+DISK_CACHE_DIR = os.environ.get(
+    "BI_DISK_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "smart_bi_assistant")
+)
+DISK_CACHE_LIMIT_MB = float(os.environ.get("BI_DISK_CACHE_MB", 4096))
+
+@functools.lru_cache(maxsize=1)
+def load_pyarrow():
+    """pyarrow is optional and slow to import, so it's only pulled in once the disk cache is used"""
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc as pa_ipc
+    except ImportError:
+        return None, None
+    return pa, pa_ipc
+
+class DiskDatasetCache:
+    """Typed datasets saved as uncompressed Arrow IPC files, keyed by content hash.
+    
+    Loading memory-maps the file, so numeric and date columns are read with zero
+    copies. Files are touched on every hit and the least recently used ones are
+    deleted once the folder grows past its size cap.
+    """
+
+    def __init__(self, cache_dir=DISK_CACHE_DIR, size_limit_mb=DISK_CACHE_LIMIT_MB):
+        self.cache_dir = cache_dir
+        self.size_limit_bytes = int(size_limit_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.size_limit_bytes > 0 and load_pyarrow()[0] is not None
+
+    def path_for(self, content_hash):
+        return os.path.join(self.cache_dir, f"{content_hash}.arrow")
+
+    def load(self, content_hash):
+        if not self.enabled:
+            return None
+        cache_path = self.path_for(content_hash)
+        if not os.path.exists(cache_path):
+            return None
+        pa, pa_ipc = load_pyarrow()
+        try:
+            table = pa_ipc.open_file(pa.memory_map(cache_path, 'r')).read_all()
+            metadata = json.loads(table.schema.metadata[b"smart_bi_dataset"])
+            frame = table.to_pandas(split_blocks=True)
+        except Exception:
+            # A half-written or corrupt file is just a cache miss
+            return None
+        os.utime(cache_path)
+        dataset = TypedDataset(
+            frame,
+            metadata["column_types"],
+            fingerprint=content_hash,
+            string_memory_bytes=metadata.get("string_memory_bytes"),
+        )
+        for col, column_profile in metadata.get("profiles", {}).items():
+            dataset.derived[("profile", col)] = column_profile
+            dataset.derived_bytes += estimate_derived_bytes(column_profile)
+        return dataset
+
+    def save(self, content_hash, dataset):
+        if not self.enabled:
+            return
+        pa, pa_ipc = load_pyarrow()
+        arrays = []
+        for col in dataset.frame.columns:
+            column_data = dataset.frame[col]
+            if pd.api.types.is_float_dtype(column_data):
+                # Keep NaN as NaN rather than a null, so reads stay zero-copy
+                arrays.append(pa.array(column_data.to_numpy(), from_pandas=False))
+            else:
+                arrays.append(pa.array(column_data, from_pandas=True))
+        metadata = {
+            "column_types": dataset.column_types,
+            "string_memory_bytes": dataset.string_memory_bytes,
+            "profiles": build_dataset_profiles(dataset),
+        }
+        table = pa.table(arrays, names=[str(col) for col in dataset.frame.columns])
+        table = table.replace_schema_metadata({"smart_bi_dataset": json.dumps(metadata)})
+        
+        with self.lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_path = self.path_for(content_hash)
+            # Write under a temporary name so readers never see a partial file
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with pa.OSFile(temp_path, 'wb') as sink:
+                with pa_ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(temp_path, cache_path)
+            self.evict_old_files()
+
+    def evict_old_files(self):
+        cached_files = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".arrow"):
+                file_path = os.path.join(self.cache_dir, file_name)
+                file_stats = os.stat(file_path)
+                cached_files.append((file_stats.st_mtime, file_stats.st_size, file_path))
+        
+        total_bytes = sum(size for _, size, _ in cached_files)
+        for _, size, file_path in sorted(cached_files):
+            if total_bytes <= self.size_limit_bytes:
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            total_bytes -= size
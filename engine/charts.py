@@ -0,0 +1,192 @@
+"""Figure specs for every chart the assistant draws.
+
+A spec is a plain Plotly figure dict ({"data": [...], "layout": {...}}), so the
+engine never imports Plotly. Hand one to st.plotly_chart or plotly.io.show,
+or json-encode it with figure_spec_json.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+# Charts pick a rendering strategy by point count: plain SVG traces for small data,
+# WebGL traces for mid-size data and server-side reduction beyond that, so the
+# figure sent to the browser stays small whatever the row count
+RAW_POINT_LIMIT = 5_000
+WEBGL_POINT_LIMIT = 100_000
+LINE_TARGET_POINTS = 2_000
+DENSITY_GRID_BINS = 200
+
+def choose_render_strategy(point_count):
+    if point_count <= RAW_POINT_LIMIT:
+        return "raw"
+    if point_count <= WEBGL_POINT_LIMIT:
+        return "webgl"
+    return "reduce"
+
+def lttb_downsample(x_values, y_values, target_points):
+    """Largest-Triangle-Three-Buckets: keep the points that best preserve the line's shape.
+    
+    Expects x sorted ascending. Returns the positions of the points to keep.
+    """
+    point_count = len(x_values)
+    if target_points >= point_count or target_points < 3:
+        return np.arange(point_count)
+    
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+    bucket_edges = np.linspace(1, point_count - 1, target_points - 1).astype(np.int64)
+    kept = np.empty(target_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, point_count - 1
+    previous = 0
+    
+    for bucket in range(target_points - 2):
+        start, end = bucket_edges[bucket], bucket_edges[bucket + 1]
+        # The next bucket's average is the third corner of the triangle
+        next_end = bucket_edges[bucket + 2] if bucket + 2 < len(bucket_edges) else point_count
+        average_x = x_values[end:next_end].mean() if next_end > end else x_values[-1]
+        average_y = y_values[end:next_end].mean() if next_end > end else y_values[-1]
+        
+        areas = np.abs(
+            (x_values[previous] - average_x) * (y_values[start:end] - y_values[previous])
+            - (x_values[previous] - x_values[start:end]) * (average_y - y_values[previous])
+        )
+        previous = start + int(np.argmax(areas)) if len(areas) else start
+        kept[bucket + 1] = previous
+    return kept
+
+def figure_spec(traces, title, **layout):
+    """Assemble a Plotly figure dict"""
+    return {"data": traces, "layout": {"title": {"text": title}, **layout}}
+
+def axis_titles(x_label, y_label):
+    return {"xaxis": {"title": {"text": x_label}}, "yaxis": {"title": {"text": y_label}}}
+
+def build_line_figure(x_values, y_values, title, x_label, y_label):
+    """Line chart sorted by x, reduced with LTTB when there are too many points"""
+    line_data = pd.DataFrame({"x": x_values, "y": y_values}).dropna()
+    line_data = line_data.sort_values("x", kind='stable').reset_index(drop=True)
+    point_count = len(line_data)
+    strategy = choose_render_strategy(point_count)
+    
+    if strategy == "reduce":
+        x_numbers = line_data["x"].to_numpy()
+        if np.issubdtype(x_numbers.dtype, np.datetime64):
+            x_numbers = x_numbers.astype('datetime64[ns]').astype(np.int64)
+        kept = lttb_downsample(x_numbers, line_data["y"].to_numpy(), LINE_TARGET_POINTS)
+        line_data = line_data.iloc[kept]
+        title = f"{title} (downsampled from {point_count:,} to {len(line_data):,} points)"
+    
+    trace = {
+        "type": "scattergl" if strategy == "webgl" else "scatter",
+        "mode": "lines",
+        "x": line_data["x"].to_numpy(),
+        "y": line_data["y"].to_numpy(),
+    }
+    return figure_spec([trace], title, **axis_titles(x_label, y_label))
+
+def build_scatter_figure(x_values, y_values, title, x_label, y_label):
+    """Scatter plot that turns into a 2D density grid once the points get too many"""
+    scatter_data = pd.DataFrame({"x": x_values, "y": y_values}).dropna()
+    point_count = len(scatter_data)
+    strategy = choose_render_strategy(point_count)
+    
+    if strategy == "reduce":
+        counts, x_edges, y_edges = np.histogram2d(
+            scatter_data["x"].to_numpy(dtype=float),
+            scatter_data["y"].to_numpy(dtype=float),
+            bins=DENSITY_GRID_BINS
+        )
+        # Empty cells stay transparent
+        trace = {
+            "type": "heatmap",
+            "x": (x_edges[:-1] + x_edges[1:]) / 2,
+            "y": (y_edges[:-1] + y_edges[1:]) / 2,
+            "z": np.where(counts.T > 0, counts.T, np.nan),
+            "colorscale": "Blues",
+            "colorbar": {"title": {"text": "Rows"}},
+        }
+        title = f"{title} (density of {point_count:,} points)"
+    else:
+        trace = {
+            "type": "scattergl" if strategy == "webgl" else "scatter",
+            "mode": "markers",
+            "x": scatter_data["x"].to_numpy(),
+            "y": scatter_data["y"].to_numpy(),
+        }
+    return figure_spec([trace], title, **axis_titles(x_label, y_label))
+
+# Bar and pie charts show this many categories and lump the rest into "Other"
+TOP_CATEGORY_LIMIT = 20
+
+def build_histogram_figure(edges, counts, title, x_label):
+    """Histogram drawn as touching bars from precomputed bins"""
+    trace = {
+        "type": "bar",
+        "x": (edges[:-1] + edges[1:]) / 2,
+        "y": counts,
+        "width": np.diff(edges),
+        "marker": {"line": {"width": 0}},
+    }
+    return figure_spec([trace], title, bargap=0, **axis_titles(x_label, 'Frequency'))
+
+def top_categories_with_other(value_counts, limit=TOP_CATEGORY_LIMIT):
+    """Keep the most common categories and fold everything else into one 'Other' slice"""
+    if len(value_counts) <= limit:
+        return value_counts, False
+    top_counts = value_counts.iloc[:limit - 1].copy()
+    top_counts.index = top_counts.index.astype(str)
+    rest = value_counts.iloc[limit - 1:]
+    # Named after how much it folds, so it can't land on a real category called "Other"
+    other_label = f"Other ({len(rest):,} categories)"
+    while other_label in top_counts.index:
+        other_label += " "
+    other_slice = pd.Series([rest.sum()], index=[other_label], name=top_counts.name)
+    return pd.concat([top_counts, other_slice]), True
+
+def build_category_figure(value_counts, column_name, chart_type):
+    """Bar or pie chart from cached value counts"""
+    chart_counts, folded = top_categories_with_other(value_counts)
+    column_label = column_name.replace('_', ' ').title()
+    suffix = f" (top {len(chart_counts) - 1} of {len(value_counts):,} + Other)" if folded else ""
+    labels = chart_counts.index.to_numpy()
+    
+    if chart_type == "bar":
+        trace = {"type": "bar", "x": labels, "y": chart_counts.to_numpy()}
+        return figure_spec(
+            [trace], f"Distribution of {column_label}{suffix}", showlegend=False, **axis_titles(column_label, 'Count')
+        )
+    trace = {"type": "pie", "labels": labels, "values": chart_counts.to_numpy()}
+    return figure_spec([trace], f"Composition of {column_label}{suffix}")
+
+class FigureSpecEncoder(json.JSONEncoder):
+    """Lets json handle the NumPy arrays and timestamps inside a spec"""
+    
+    def default(self, value):
+        if isinstance(value, np.ndarray):
+            if np.issubdtype(value.dtype, np.datetime64):
+                return np.datetime_as_string(value).tolist()
+            if np.issubdtype(value.dtype, np.floating):
+                return [None if np.isnan(item) else item for item in value.tolist()]
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, pd.Timestamp):
+            return value.isoformat()
+        return super().default(value)
+
+def figure_spec_json(spec):
+    return json.dumps(spec, cls=FigureSpecEncoder)
+
+def figure_spec_bytes(spec):
+    """Rough in-memory size of a spec - the arrays are what count"""
+    if isinstance(spec, np.ndarray):
+        return spec.nbytes
+    if isinstance(spec, dict):
+        return sum(len(str(key)) + figure_spec_bytes(value) for key, value in spec.items())
+    if isinstance(spec, (list, tuple)):
+        return sum(figure_spec_bytes(value) for value in spec)
+    if isinstance(spec, str):
+        return len(spec)
+    return 8
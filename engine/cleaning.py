@@ -0,0 +1,51 @@
+"""Header clean-up and light preprocessing applied to every upload"""
+
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Helper function to clean up messy column names - you know how Excel files can be
+def sanitize_column_headers(dataframe):
+    """Clean up those pesky column names that come from Excel"""
+    cleaned_headers = []
+    for header in dataframe.columns:
+        # Remove weird characters and normalize spacing
+        clean_header = re.sub(r'[^\w\s]', '_', str(header).strip())
+        clean_header = re.sub(r'\s+', '_', clean_header.lower())
+        # Handle duplicate names by adding numbers
+        counter = 1
+        original_header = clean_header
+        while clean_header in cleaned_headers:
+            clean_header = f"{original_header}_{counter}"
+            counter += 1
+        cleaned_headers.append(clean_header)
+    
+    dataframe.columns = cleaned_headers
+    return dataframe
+
+def process_uploaded_data(raw_dataframe, copy=True):
+    """Do some basic cleanup on the data - convert objects to strings, handle nulls"""
+    processed_df = raw_dataframe.copy() if copy else raw_dataframe
+    
+    # Convert object columns to strings for consistency
+    for column_name in processed_df.columns:
+        if processed_df[column_name].dtype == 'object':
+            processed_df[column_name] = processed_df[column_name].astype(str)
+            # Clean up those annoying 'nan' strings
+            processed_df[column_name] = processed_df[column_name].replace('nan', np.nan)
+    
+    return processed_df
+
+def add_calculated_columns(dataframe):
+    """Add some useful calculated fields if we can"""
+    # If we have birth year, calculate age
+    birth_year_cols = [col for col in dataframe.columns if 'birth' in col.lower() and 'year' in col.lower()]
+    if birth_year_cols and 'age' not in dataframe.columns:
+        birth_col = birth_year_cols[0]
+        current_year = datetime.now().year
+        dataframe['age'] = current_year - pd.to_numeric(dataframe[birth_col], errors='coerce')
+    
+    # Add more calculated fields as needed
+    return dataframe
@@ -0,0 +1,411 @@
+"""The typed, in-memory form of an upload and the group-by machinery on top of it"""
+
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .inference import coerce_to_datetime, guess_date_format
+from .profiles import (
+    SUMMARY_CHUNK_ROWS,
+    build_column_profile,
+    build_summary_table,
+    sketch_columns,
+    summary_from_counts,
+    summary_from_profile,
+)
+
+# Histograms are binned here with NumPy, so the figure only carries edges and counts
+DEFAULT_HISTOGRAM_BINS = 25
+HISTOGRAM_BIN_RULES = ["auto", "fd", "doane", "scott", "stone", "rice", "sturges", "sqrt"]
+
+def estimate_memory_footprint(dataframe):
+    """Roughly how many bytes a dataframe takes up, including the strings inside it"""
+    return int(dataframe.memory_usage(index=True, deep=True).sum())
+
+def estimate_derived_bytes(value, owner=None, depth=0):
+    """Rough bytes held by something memoised on a dataset.
+    
+    Arrays and pandas objects report their own size, containers and the engine's
+    own index classes are walked a few levels deep, anything else counts as
+    its shallow size. The dataset itself (owner) is never counted again.
+    """
+    if value is owner:
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, pd.DataFrame):
+        return estimate_memory_footprint(value)
+    if depth >= 4:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_derived_bytes(key, owner, depth + 1) + estimate_derived_bytes(item, owner, depth + 1)
+            for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_derived_bytes(item, owner, depth + 1) for item in value)
+    if type(value).__module__.startswith(__package__ + ".") and hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + estimate_derived_bytes(vars(value), owner, depth + 1)
+    return sys.getsizeof(value)
+
+def read_only(array):
+    """A view of an array that can't be written through.
+    
+    Datasets and everything derived from them are shared between sessions, so the
+    arrays handed out from the memo are read-only rather than copied per caller.
+    """
+    view = np.asarray(array).view()
+    view.flags.writeable = False
+    return view
+
+def build_cached(dataset, key, builder):
+    """The memo behind every dataset's cached(): each key is built once, under its own lock.
+    
+    Only callers after the same key wait for a build, so a background warm-up
+    working on one column never holds up a question about another.
+    """
+    with dataset.derived_lock:
+        if key in dataset.derived:
+            return dataset.derived[key]
+        key_lock = dataset.building.setdefault(key, threading.Lock())
+    with key_lock:
+        with dataset.derived_lock:
+            if key in dataset.derived:
+                return dataset.derived[key]
+        result = builder()
+        result_bytes = estimate_derived_bytes(result, owner=dataset)
+        with dataset.derived_lock:
+            dataset.derived[key] = result
+            dataset.derived_bytes += result_bytes
+            dataset.building.pop(key, None)
+        return result
+
+class TypedDataset:
+    """The processed upload with every column stored once in its natural type.
+    
+    Numeric columns hold float/int arrays, date columns hold datetime64 and only the
+    categorical and text columns keep their strings, so queries never re-parse text.
+    Anything derived from the data later on can be memoised through cached().
+    """
+
+    def __init__(self, frame, column_types=None, fingerprint=None, string_memory_bytes=None):
+        self.frame = frame
+        self.column_types = column_types if column_types is not None else {}
+        self.fingerprint = fingerprint
+        self.string_memory_bytes = string_memory_bytes
+        self.derived = {}
+        # What everything in derived adds up to, so the shared store can budget for it
+        self.derived_bytes = 0
+        self.derived_lock = threading.RLock()
+        self.building = {}
+
+    @property
+    def columns(self):
+        return self.frame.columns
+
+    def __len__(self):
+        return len(self.frame)
+
+    def cached(self, key, builder):
+        """Compute something about the data once and hand back the same result afterwards"""
+        return build_cached(self, key, builder)
+
+    def numeric(self, column_name):
+        """The column as numbers (NaN where a value isn't one)"""
+        column_data = self.frame[column_name]
+        if pd.api.types.is_numeric_dtype(column_data):
+            return column_data
+        return self.cached(("numeric", column_name), lambda: pd.to_numeric(column_data, errors='coerce'))
+
+    def datetimes(self, column_name):
+        """The column as datetime64 (NaT where a value isn't a date)"""
+        column_data = self.frame[column_name]
+        if pd.api.types.is_datetime64_any_dtype(column_data):
+            return column_data
+        return self.cached(
+            ("datetime", column_name),
+            lambda: coerce_to_datetime(column_data, guess_date_format(column_data.dropna().values[:50]))
+        )
+
+    def preview(self, row_count=10):
+        # A copy, so whatever the caller does with it stays out of the shared frame
+        return self.frame.head(row_count).copy()
+
+    def distinct_values(self, column_name):
+        """Unique non-null values of a column, worked out once"""
+        return self.encoded(column_name).categories.values
+
+    def encoded(self, column_name):
+        """The column as integer codes plus a lower-cased dictionary, built once"""
+        return self.cached(("encoded", column_name), lambda: EncodedColumn.from_series(self.frame[column_name]))
+
+    def category_counts(self, column_name):
+        """Value counts for a column, most common first, worked out once"""
+        return self.cached(("category_counts", column_name), lambda: self.encoded(column_name).value_counts())
+
+    def histogram(self, column_name, bins=DEFAULT_HISTOGRAM_BINS):
+        """Bin edges and counts for a numeric column, cached per bin setting.
+        
+        Uses the sorted values when something already built them, otherwise bins the
+        raw values directly - sorting a column just to draw it isn't worth it.
+        """
+        def build():
+            sorted_values = self.derived.get(("sorted_values", column_name))
+            if sorted_values is not None:
+                return binned_histogram(sorted_values, bins)
+            values = np.asarray(self.numeric(column_name), dtype=float)
+            values = values[~np.isnan(values)]
+            if len(values) == 0:
+                return np.array([0.0, 1.0]), np.array([0])
+            counts, edges = np.histogram(values, bins=bins)
+            return edges, counts
+        return self.cached(("histogram", column_name, bins), build)
+
+    def group_codes(self, key_columns):
+        """Integer group code per row (-1 where a key is missing) and the key values per code.
+        
+        Single keys reuse the column's dictionary encoding; multi-column keys are
+        combined one column at a time and re-factorized so codes stay compact.
+        """
+        def build():
+            first = self.encoded(key_columns[0])
+            codes = first.codes.astype(np.int64)
+            key_frame = pd.DataFrame({key_columns[0]: first.categories})
+            for col in key_columns[1:]:
+                encoded = self.encoded(col)
+                width = max(len(encoded.categories), 1)
+                missing = (codes < 0) | (encoded.codes < 0)
+                combined = np.where(missing, -1, codes * width + encoded.codes)
+                codes, used_keys = pd.factorize(combined, use_na_sentinel=True)
+                used_keys = np.asarray(used_keys)
+                if (used_keys < 0).any():
+                    # The -1 marker got its own code - fold it back into "missing"
+                    marker_code = int(np.flatnonzero(used_keys < 0)[0])
+                    codes = np.where(codes == marker_code, -1, codes - (codes > marker_code))
+                    used_keys = used_keys[used_keys >= 0]
+                key_frame = key_frame.iloc[used_keys // width].reset_index(drop=True)
+                key_frame[col] = encoded.categories[used_keys % width]
+            return read_only(codes), key_frame
+        return self.cached(("group_codes", tuple(key_columns)), build)
+
+    def sorted_values(self, column_name):
+        """The column's non-null numbers in ascending order, built the first time it's needed"""
+        def build():
+            values = np.asarray(self.numeric(column_name), dtype=float)
+            return read_only(np.sort(values[~np.isnan(values)]))
+        return self.cached(("sorted_values", column_name), build)
+
+    def count_matching(self, column_name, operator, threshold):
+        """Count rows passing a threshold (or a (low, high) range) with a binary search"""
+        sorted_values = self.sorted_values(column_name)
+        if operator == "between":
+            low, high = threshold
+            return int(np.searchsorted(sorted_values, high, side='right') - np.searchsorted(sorted_values, low, side='left'))
+        if operator == "<":
+            return int(np.searchsorted(sorted_values, threshold, side='left'))
+        if operator == "<=":
+            return int(np.searchsorted(sorted_values, threshold, side='right'))
+        if operator == ">":
+            return int(len(sorted_values) - np.searchsorted(sorted_values, threshold, side='right'))
+        if operator == ">=":
+            return int(len(sorted_values) - np.searchsorted(sorted_values, threshold, side='left'))
+        raise ValueError(f"Unknown comparison '{operator}'")
+
+    def profile(self, column_name):
+        """Summary numbers for a numeric column, computed once per dataset"""
+        return self.cached(("profile", column_name), lambda: build_column_profile(self.numeric(column_name)))
+
+    def summary(self, exact=False):
+        """Dataset summary: exact describe() on request, otherwise profiles, counts and sketches"""
+        def compute():
+            if exact:
+                return self.frame.describe(include='all')
+            
+            column_summaries = {}
+            sketch_kinds = {}
+            for col in self.columns:
+                col_type = self.column_types.get(col)
+                column_data = self.frame[col]
+                if col_type == 'numerical':
+                    column_summaries[col] = summary_from_profile(self.profile(col))
+                elif isinstance(column_data.dtype, pd.CategoricalDtype):
+                    # Dictionary-encoded already, so exact counts are a bincount away
+                    column_summaries[col] = summary_from_counts(self.category_counts(col))
+                elif pd.api.types.is_datetime64_any_dtype(column_data):
+                    sketch_kinds[col] = 'datetime'
+                elif pd.api.types.is_numeric_dtype(column_data):
+                    sketch_kinds[col] = 'numeric'
+                else:
+                    sketch_kinds[col] = 'values'
+            
+            row_chunks = (
+                self.frame.iloc[start:start + SUMMARY_CHUNK_ROWS]
+                for start in range(0, len(self.frame), SUMMARY_CHUNK_ROWS)
+            )
+            column_summaries.update(sketch_columns(row_chunks, sketch_kinds))
+            return build_summary_table(column_summaries, self.columns)
+        return self.cached(("summary", exact), compute)
+
+    def memory_report(self):
+        """How much memory the typed columns take compared with keeping everything as strings.
+        
+        resident_bytes adds whatever has been derived so far (sorted values, indexes,
+        counts), so it keeps growing while the warm-up runs and questions come in.
+        """
+        typed_bytes = self.cached("frame_bytes", lambda: estimate_memory_footprint(self.frame))
+        string_bytes = self.string_memory_bytes if self.string_memory_bytes is not None else typed_bytes
+        return {
+            "typed_bytes": typed_bytes,
+            "string_bytes": string_bytes,
+            "saved_bytes": string_bytes - typed_bytes,
+            "derived_bytes": self.derived_bytes,
+            "resident_bytes": typed_bytes + self.derived_bytes,
+        }
+
+class EncodedColumn:
+    """A column stored as integer codes into a dictionary of its distinct values.
+    
+    Per-code counts are worked out once, so equality counts and value counts become
+    array lookups instead of string comparisons over every row.
+    """
+
+    def __init__(self, codes, categories):
+        self.codes = read_only(codes)
+        self.categories = pd.Index(categories)
+        self.code_counts = read_only(np.bincount(codes[codes >= 0], minlength=len(self.categories)))
+        # Matching is case-insensitive, so several codes can share one lower-cased key
+        self.lower_codes = {}
+        for code, lowered in enumerate(self.categories.astype(str).str.lower()):
+            self.lower_codes.setdefault(lowered, []).append(code)
+
+    @classmethod
+    def from_series(cls, column_data):
+        if isinstance(column_data.dtype, pd.CategoricalDtype):
+            return cls(column_data.cat.codes.to_numpy(), column_data.cat.categories)
+        codes, uniques = pd.factorize(column_data)
+        return cls(codes, uniques)
+
+    def count_equal(self, value):
+        return int(sum(self.code_counts[code] for code in self.lower_codes.get(str(value).lower(), [])))
+
+    def value_counts(self):
+        """Counts per value, most common first, like Series.value_counts()"""
+        counts = pd.Series(self.code_counts, index=self.categories)
+        return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+def reduce_groups(codes, group_count, values):
+    """count/sum/mean/min/max/median of values for every group code, without Python loops.
+    
+    Sums and counts come from bincount, the rest from one sort by (group, value):
+    each group is then a contiguous segment whose first, last and middle entries are
+    its min, max and median.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = (codes >= 0) & ~np.isnan(values)
+    group_codes = codes[valid]
+    group_values = values[valid]
+    
+    counts = np.bincount(group_codes, minlength=group_count)
+    sums = np.bincount(group_codes, weights=group_values, minlength=group_count)
+    sorted_values = group_values[np.lexsort((group_values, group_codes))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    has_values = counts > 0
+    
+    mins = np.full(group_count, np.nan)
+    maxs = np.full(group_count, np.nan)
+    medians = np.full(group_count, np.nan)
+    means = np.full(group_count, np.nan)
+    first = starts[has_values]
+    last = first + counts[has_values] - 1
+    mins[has_values] = sorted_values[first]
+    maxs[has_values] = sorted_values[last]
+    medians[has_values] = (sorted_values[(first + last) // 2] + sorted_values[(first + last + 1) // 2]) / 2
+    means[has_values] = sums[has_values] / counts[has_values]
+    return {"count": counts, "sum": sums, "mean": means, "min": mins, "max": maxs, "median": medians}
+
+# How each aggregate shows up in a breakdown table
+GROUP_AGGREGATE_LABELS = {
+    "mean": ("average", "Average"), "sum": ("total", "Total"), "count": ("count", "Count of"),
+    "min": ("min", "Minimum"), "max": ("max", "Maximum"), "median": ("median", "Median"),
+}
+
+def describe_group_result(key_frame, aggregates, group_col, value_col, aggregate="mean", top_n=None):
+    """Turn per-group aggregates into the response text and table the UI shows"""
+    key_columns = list(key_frame.columns)
+    group_label = " and ".join(f"'{col}'" for col in key_columns) if isinstance(group_col, tuple) else f"'{group_col}'"
+    result_table = key_frame.reset_index(drop=True).copy()
+    
+    if not value_col:
+        result_table["count"] = aggregates["count"]
+        result_table = result_table[result_table["count"] > 0]
+        result_table = result_table.sort_values("count", ascending=False, kind='stable')
+        if top_n:
+            result_table = result_table.head(top_n)
+        return f"Count breakdown by {group_label}:", result_table.reset_index(drop=True), None
+    
+    # The aggregate that was asked for goes first, the rest follow
+    aggregate = aggregate if aggregate in aggregates else "mean"
+    ordered_aggregates = [aggregate] + [name for name in GROUP_AGGREGATE_LABELS if name != aggregate and name in aggregates]
+    for name in ordered_aggregates:
+        result_table[f"{GROUP_AGGREGATE_LABELS[name][0]}_{value_col}"] = aggregates[name]
+    result_table = result_table[np.asarray(aggregates["count"]) > 0]
+    
+    sort_column = f"{GROUP_AGGREGATE_LABELS[aggregate][0]}_{value_col}"
+    heading = f"{GROUP_AGGREGATE_LABELS[aggregate][1]} '{value_col}' grouped by {group_label}:"
+    if top_n:
+        result_table = result_table.sort_values(sort_column, ascending=False, kind='stable').head(top_n)
+        heading = f"Top {top_n} groups by {GROUP_AGGREGATE_LABELS[aggregate][1].lower()} '{value_col}' (grouped by {group_label}):"
+    else:
+        result_table = result_table.sort_values(key_columns, kind='stable')
+    return heading, result_table.reset_index(drop=True), None
+
+def build_typed_dataset(processed_dataframe, column_types, coerced_columns=None, fingerprint=None):
+    """Swap string columns for real numbers and dates once, right after loading"""
+    coerced_columns = coerced_columns or {}
+    string_memory_bytes = estimate_memory_footprint(processed_dataframe)
+    typed_frame = processed_dataframe
+    
+    for col, col_type in column_types.items():
+        column_data = typed_frame[col]
+        if col_type == 'numerical':
+            if col in coerced_columns:
+                typed_frame[col] = coerced_columns[col]
+            elif not pd.api.types.is_numeric_dtype(column_data):
+                typed_frame[col] = pd.to_numeric(column_data, errors='coerce')
+        elif col_type == 'datetime':
+            if col in coerced_columns:
+                typed_frame[col] = coerced_columns[col]
+            elif not pd.api.types.is_datetime64_any_dtype(column_data):
+                typed_frame[col] = coerce_to_datetime(
+                    column_data, guess_date_format(column_data.dropna().values[:50])
+                )
+        elif col_type in ['categorical', 'binary']:
+            # Few distinct values - store small integer codes plus one copy of each label
+            typed_frame[col] = column_data.astype('category')
+    
+    return TypedDataset(
+        typed_frame,
+        column_types,
+        fingerprint=fingerprint,
+        string_memory_bytes=string_memory_bytes,
+    )
+
+def as_typed_dataset(data):
+    """Accept either a TypedDataset or a plain dataframe wherever the engine needs data"""
+    if isinstance(data, TypedDataset):
+        return data
+    return TypedDataset(data)
+
+def binned_histogram(sorted_values, bins=DEFAULT_HISTOGRAM_BINS):
+    """Bin edges and counts from already-sorted values, using binary search per edge"""
+    if len(sorted_values) == 0:
+        return np.array([0.0, 1.0]), np.array([0])
+    edges = np.histogram_bin_edges(sorted_values, bins=bins)
+    positions = np.searchsorted(sorted_values, edges, side='left')
+    # The last bin includes its right edge, same as np.histogram
+    positions[-1] = len(sorted_values)
+    return edges, np.diff(positions)
@@ -0,0 +1,223 @@
+"""Reading Excel workbooks a sheet at a time, without ever holding every cell as a Python object.
+
+    list_excel_sheets(raw_bytes)                   # instant - only reads the workbook's index
+    read_excel_sheets(raw_bytes, ["Jan", "Feb"])   # {name: dataframe}, sheets parsed side by side
+
+pd.read_excel collects the whole sheet as lists of cell values before it builds
+a frame, so a million-row tab briefly costs many times its final size. Here
+openpyxl streams the rows (read-only mode) and every few thousand rows get
+packed into typed NumPy arrays per column, so memory stays close to the final
+dataset. Only the sheets someone picks are read at all.
+"""
+
+import io
+import itertools
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import count_rows
+
+EXCEL_BATCH_ROWS = 2_000
+# Separate sheets are parsed in worker processes - openpyxl is pure Python, so threads wouldn't help
+EXCEL_WORKERS = int(os.environ.get("BI_EXCEL_WORKERS", min(4, os.cpu_count() or 1)))
+# Starting the workers costs a second or two, which only pays off on big workbooks
+EXCEL_PARALLEL_MIN_BYTES = 5 * 1024 * 1024
+# Stacked sheets get this column naming the tab each row came from
+SHEET_COLUMN = "sheet"
+
+def is_xlsx_archive(raw_bytes):
+    """.xlsx/.xlsm files are zip archives; legacy .xls files aren't"""
+    return raw_bytes[:4] == b"PK\x03\x04"
+
+def list_excel_sheets(raw_bytes):
+    """Sheet names in workbook order, read from the workbook's index without opening any sheet"""
+    if not is_xlsx_archive(raw_bytes):
+        return pd.ExcelFile(io.BytesIO(raw_bytes)).sheet_names
+    with zipfile.ZipFile(io.BytesIO(raw_bytes)) as archive:
+        workbook_root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    namespace = workbook_root.tag.split("}")[0] + "}" if workbook_root.tag.startswith("{") else ""
+    return [sheet.get("name") for sheet in workbook_root.iter(f"{namespace}sheet")]
+
+def typed_batch(values):
+    """One batch of a column's cells as the tightest array that holds them: (kind, array)"""
+    value_types = {type(value) for value in values}
+    has_missing = type(None) in value_types
+    value_types.discard(type(None))
+    if not value_types:
+        return "empty", len(values)
+    # Booleans count as numbers next to other numbers, same as with pd.read_excel
+    if value_types == {bool} and not has_missing:
+        return "bool", np.array(values, dtype=bool)
+    if value_types <= {int, bool} and not has_missing:
+        try:
+            return "int", np.array(values, dtype=np.int64)
+        except OverflowError:
+            pass
+    elif value_types <= {int, float, bool}:
+        # None turns into NaN on the way in
+        return "float", np.array(values, dtype=float)
+    elif value_types == {datetime}:
+        return "datetime", np.array(values, dtype="datetime64[ns]")
+    packed = np.empty(len(values), dtype=object)
+    packed[:] = values
+    if has_missing:
+        # Blank cells are NaN like pandas has them, never None (which later turns into the text 'None')
+        packed[pd.isna(packed)] = np.nan
+    return "object", packed
+
+class ExcelColumnBuilder:
+    """Collects one column's typed batches and joins them into a single array at the end"""
+
+    def __init__(self, header, skipped_rows=0):
+        self.header = header
+        self.batches = [("empty", skipped_rows)] if skipped_rows else []
+
+    def add(self, values):
+        self.batches.append(typed_batch(values))
+
+    def is_empty(self):
+        return all(kind == "empty" for kind, _ in self.batches)
+
+    def finish(self):
+        kinds = {kind for kind, _ in self.batches if kind != "empty"}
+        has_gaps = any(kind == "empty" for kind, _ in self.batches)
+        if kinds == {"bool"} and not has_gaps:
+            target = "bool"
+        elif kinds and kinds <= {"int", "bool"} and not has_gaps:
+            target = "int"
+        elif kinds and kinds <= {"int", "float", "bool"}:
+            target = "float"
+        elif kinds == {"datetime"}:
+            target = "datetime"
+        elif not kinds:
+            target = "float"
+        else:
+            target = "object"
+        
+        parts = []
+        for kind, data in self.batches:
+            if kind == "empty":
+                fill = {"float": np.nan, "datetime": np.datetime64("NaT"), "object": np.nan}[target]
+                data = np.full(data, fill, dtype={"float": float, "datetime": "datetime64[ns]", "object": object}[target])
+            elif target == "float":
+                data = data.astype(float)
+            elif target == "int":
+                data = data.astype(np.int64)
+            elif target == "object" and kind == "datetime":
+                data = pd.DatetimeIndex(data).astype(object).to_numpy()
+            elif target == "object":
+                data = data.astype(object)
+            parts.append(data)
+        self.batches = []
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+def unique_headers(header_row):
+    """Header cells as strings, blanks as 'Unnamed: N' and repeats as 'name.1' - same as pandas"""
+    headers = []
+    seen = {}
+    for position, value in enumerate(header_row):
+        header = f"Unnamed: {position}" if value is None else str(value)
+        if header in seen:
+            seen[header] += 1
+            header = f"{header}.{seen[header]}"
+        seen.setdefault(header, 0)
+        headers.append(header)
+    return headers
+
+def sheet_rows(worksheet):
+    """The sheet's rows from the header on. Blank rows in between stay (as empty tuples)
+    like they do with pandas, blank rows at the very end don't.
+    """
+    pending_blank_rows = 0
+    header_seen = False
+    for row in worksheet.iter_rows(values_only=True):
+        if all(value is None for value in row):
+            pending_blank_rows += header_seen
+            continue
+        if pending_blank_rows:
+            yield from itertools.repeat((), pending_blank_rows)
+            pending_blank_rows = 0
+        header_seen = True
+        yield row
+
+def read_excel_sheet(source, sheet_name=None, batch_rows=EXCEL_BATCH_ROWS):
+    """One sheet as a dataframe, first non-blank row as the header, blank rows skipped.
+    
+    source is the workbook's bytes or a path to it; no sheet_name means the first sheet.
+    """
+    # Only Excel uploads need openpyxl, same as with pandas
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(io.BytesIO(source) if isinstance(source, bytes) else source,
+                             read_only=True, data_only=True, keep_links=False)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        rows = sheet_rows(worksheet)
+        header_row = next(rows, None)
+        if header_row is None:
+            return pd.DataFrame()
+        builders = [ExcelColumnBuilder(header) for header in unique_headers(header_row)]
+        
+        row_count = 0
+        while True:
+            batch = list(itertools.islice(rows, batch_rows))
+            if not batch:
+                break
+            # Rows can be ragged - cells past the header become 'Unnamed: N' columns
+            columns = list(itertools.zip_longest(*batch))
+            for position in range(len(builders), len(columns)):
+                builders.append(ExcelColumnBuilder(f"Unnamed: {position}", skipped_rows=row_count))
+            for position, builder in enumerate(builders):
+                builder.add(columns[position] if position < len(columns) else (None,) * len(batch))
+            row_count += len(batch)
+            count_rows(len(batch))
+    finally:
+        workbook.close()
+    
+    # Formatted-but-empty columns at the edge of a sheet aren't data
+    while builders and builders[-1].header.startswith("Unnamed: ") and builders[-1].is_empty():
+        builders.pop()
+    if row_count == 0:
+        return pd.DataFrame(columns=[builder.header for builder in builders])
+    return pd.DataFrame({builder.header: builder.finish() for builder in builders}, copy=False)
+
+def read_excel_sheets(raw_bytes, sheet_names=None, workers=EXCEL_WORKERS):
+    """The picked sheets (default: the first) as {name: dataframe}.
+    
+    One sheet (or a small workbook) is read right here. Several sheets of a big
+    workbook go to worker processes, each opening the workbook from a temporary file.
+    """
+    sheet_names = list(sheet_names or list_excel_sheets(raw_bytes)[:1])
+    if not is_xlsx_archive(raw_bytes):
+        # Legacy .xls - openpyxl can't read it, so pandas (xlrd) does
+        return pd.read_excel(io.BytesIO(raw_bytes), sheet_name=sheet_names)
+    if len(sheet_names) == 1 or workers <= 1 or len(raw_bytes) < EXCEL_PARALLEL_MIN_BYTES:
+        return {name: read_excel_sheet(raw_bytes, name) for name in sheet_names}
+    
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        workbook_path = os.path.join(scratch_dir, "workbook.xlsx")
+        with open(workbook_path, "wb") as workbook_file:
+            workbook_file.write(raw_bytes)
+        # Spawned, not forked: the app has warm-up and server threads running
+        with ProcessPoolExecutor(max_workers=min(workers, len(sheet_names)), mp_context=get_context("spawn")) as pool:
+            frames = pool.map(read_excel_sheet, itertools.repeat(workbook_path), sheet_names)
+            return dict(zip(sheet_names, frames))
+
+def stack_sheets(sheet_frames):
+    """Several sheets as one table, with a 'sheet' column saying where each row came from"""
+    if len(sheet_frames) == 1:
+        return next(iter(sheet_frames.values()))
+    frames = []
+    for name, frame in sheet_frames.items():
+        if SHEET_COLUMN not in frame.columns:
+            frame.insert(0, SHEET_COLUMN, name)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,156 @@
+"""Answering parsed actions against a loaded dataset"""
+
+import numpy as np
+
+from .charts import build_category_figure, build_histogram_figure, build_scatter_figure
+from .dataset import DEFAULT_HISTOGRAM_BINS, as_typed_dataset, describe_group_result, reduce_groups
+from .parser import THRESHOLD_WORDING
+from .streaming import StreamingCsvDataset, execute_streaming_request
+from .timeseries import describe_trend, time_buckets
+
+def execute_analysis_request(action_info, dataframe):
+    """Execute the parsed query and return results"""
+    if isinstance(dataframe, StreamingCsvDataset):
+        return execute_streaming_request(action_info, dataframe)
+    
+    action_type = action_info[0]
+    dataset = as_typed_dataset(dataframe)
+    dataframe = dataset.frame
+    
+    try:
+        if action_type == "calculate_statistic":
+            column_name, stat_type = action_info[1], action_info[2]
+            if not column_name:
+                return "I couldn't identify which column to analyze.", None, None
+            
+            column_profile = dataset.profile(column_name)
+            
+            if stat_type == "mean":
+                result = column_profile["mean"]
+                return f"The average value in '{column_name}' is {result:.2f}", None, None
+            elif stat_type == "sum":
+                result = column_profile["sum"]
+                return f"The total sum of '{column_name}' is {result:.0f}", None, None
+            elif stat_type == "max":
+                result = column_profile["max"]
+                return f"The maximum value in '{column_name}' is {result:.2f}", None, None
+            elif stat_type == "min":
+                result = column_profile["min"]
+                return f"The minimum value in '{column_name}' is {result:.2f}", None, None
+            elif stat_type == "median":
+                result = column_profile["median"]
+                return f"The median value in '{column_name}' is {result:.2f}", None, None
+        
+        elif action_type == "filter_and_count":
+            column_name, operator, threshold = action_info[1], action_info[2], action_info[3]
+            if not column_name:
+                return "I couldn't identify which column to filter on.", None, None
+            
+            filtered_count = dataset.count_matching(column_name, operator, threshold)
+            return f"There are {filtered_count} records where '{column_name}' is {THRESHOLD_WORDING[operator]} {threshold}", None, None
+        
+        elif action_type == "filter_count_range":
+            column_name, low, high = action_info[1], action_info[2], action_info[3]
+            if not column_name:
+                return "I couldn't identify which column to filter on.", None, None
+            
+            filtered_count = dataset.count_matching(column_name, "between", (low, high))
+            return f"There are {filtered_count} records where '{column_name}' is between {low} and {high}", None, None
+        
+        elif action_type == "filter_count_category":
+            column_name, target_value = action_info[1], action_info[2]
+            matching_rows = dataset.encoded(column_name).count_equal(target_value)
+            return f"There are {matching_rows} records where '{column_name}' equals '{target_value}'", None, None
+        
+        elif action_type == "count_all_rows":
+            total_rows = dataframe.shape[0]
+            return f"Your dataset contains {total_rows} total records", None, None
+        
+        elif action_type == "group_and_analyze":
+            group_col, value_col = action_info[1], action_info[2]
+            aggregate = action_info[3] if len(action_info) > 3 else "mean"
+            top_n = action_info[4] if len(action_info) > 4 else None
+            if not group_col:
+                return "I couldn't determine which column to group by.", None, None
+            
+            key_columns = list(group_col) if isinstance(group_col, tuple) else [group_col]
+            codes, key_frame = dataset.group_codes(key_columns)
+            if value_col:
+                # Every aggregate for every group in one vectorised pass
+                aggregates = reduce_groups(codes, len(key_frame), dataset.numeric(value_col))
+            else:
+                # Just count occurrences
+                aggregates = {"count": np.bincount(codes[codes >= 0], minlength=len(key_frame))}
+            return describe_group_result(key_frame, aggregates, group_col, value_col, aggregate, top_n)
+        
+        elif action_type == "create_bar_chart":
+            column_name = action_info[1]
+            if not column_name:
+                return "I couldn't determine which column to chart.", None, None
+            
+            # Plotly figure spec - the UI decides how to draw it
+            fig = build_category_figure(dataset.category_counts(column_name), column_name, "bar")
+            return f"Bar chart showing the distribution of '{column_name}'", None, fig
+        
+        elif action_type == "create_histogram":
+            column_name = action_info[1]
+            bins = action_info[2] if len(action_info) > 2 else DEFAULT_HISTOGRAM_BINS
+            if not column_name:
+                return "I couldn't determine which column to analyze.", None, None
+            
+            edges, counts = dataset.histogram(column_name, bins)
+            fig = build_histogram_figure(
+                edges,
+                counts,
+                f"Distribution of {column_name.replace('_', ' ').title()}",
+                column_name.replace('_', ' ').title()
+            )
+            return f"Histogram showing the distribution of '{column_name}'", None, fig
+        
+        elif action_type == "create_pie_chart":
+            column_name = action_info[1]
+            if not column_name:
+                return "I couldn't determine which column to chart.", None, None
+            
+            fig = build_category_figure(dataset.category_counts(column_name), column_name, "pie")
+            return f"Pie chart showing the composition of '{column_name}'", None, fig
+        
+        elif action_type == "create_line_chart":
+            time_col, value_col = action_info[1], action_info[2]
+            aggregate = action_info[3] if len(action_info) > 3 else "mean"
+            granularity = action_info[4] if len(action_info) > 4 else "auto"
+            if not time_col:
+                return "I need a date column to draw a line chart.", None, None
+            
+            # One value per day/week/month/quarter from the sorted time index, never the raw rows
+            granularity, bucket_starts, aggregates = time_buckets(dataset, time_col, value_col, granularity)
+            return describe_trend(granularity, bucket_starts, aggregates, time_col, value_col, aggregate)
+        
+        elif action_type == "create_scatter_plot":
+            col1, col2 = action_info[1], action_info[2]
+            if not col1 or not col2:
+                return "I need two numeric columns for a scatter plot.", None, None
+            
+            x_data = dataset.numeric(col1)
+            y_data = dataset.numeric(col2)
+            
+            fig = build_scatter_figure(
+                x_data,
+                y_data,
+                f"Relationship between {col1.replace('_', ' ').title()} and {col2.replace('_', ' ').title()}",
+                col1.replace('_', ' ').title(),
+                col2.replace('_', ' ').title()
+            )
+            return f"Scatter plot showing the relationship between '{col1}' and '{col2}'", None, fig
+        
+        elif action_type == "generate_summary":
+            exact = action_info[1] if len(action_info) > 1 else False
+            if exact:
+                return "Here's an exact summary of your dataset:", dataset.summary(exact=True), None
+            return "Here's a summary of your dataset (quartiles and distinct counts may be approximate):", dataset.summary(), None
+        
+        else:
+            return "I'm not sure how to handle that request yet.", None, None
+    
+    except Exception as error:
+        return f"I encountered an error while processing your request: {str(error)}", None, None
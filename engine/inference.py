@@ -0,0 +1,184 @@
+"""Working out what kind of data each column holds"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    # Only public from pandas 2.2 on; older versions keep it here
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+# Type inference looks at a sample first and only scans the whole column when the
+# sample lands too close to one of the decision thresholds
+TYPE_INFERENCE_SAMPLE_SIZE = 2000
+TYPE_INFERENCE_CONFIDENCE_MARGIN = 0.1
+TYPE_INFERENCE_STRATA = 10
+# How many leading values a date format is guessed from
+DATE_FORMAT_GUESS_VALUES = 5
+
+def draw_stratified_sample(total_rows, sample_size=TYPE_INFERENCE_SAMPLE_SIZE, strata=TYPE_INFERENCE_STRATA):
+    """Pick row positions spread evenly over the file so sorted exports don't fool us"""
+    if total_rows <= sample_size:
+        return np.arange(total_rows)
+    
+    rng = np.random.default_rng(0)
+    boundaries = np.linspace(0, total_rows, strata + 1).astype(np.int64)
+    per_stratum = max(1, sample_size // strata)
+    positions = []
+    for block_start, block_end in zip(boundaries[:-1], boundaries[1:]):
+        block_size = block_end - block_start
+        take = min(per_stratum, block_size)
+        positions.append(block_start + rng.choice(block_size, size=take, replace=False))
+    return np.sort(np.concatenate(positions))
+
+def guess_date_format(values):
+    """Work out one strftime format that fits the sampled values.
+    
+    A value like 07/05/2021 reads either way round, so month-first and day-first
+    guesses are taken from the first few values and whichever parses most of the
+    sample wins (month-first on a tie, same as pandas).
+    """
+    samples = [value.strip() for value in values if isinstance(value, str) and value.strip()]
+    candidates = []
+    with warnings.catch_warnings():
+        # pandas warns whenever a day-first guess comes back without dayfirst=True
+        warnings.simplefilter("ignore", UserWarning)
+        for value in samples[:DATE_FORMAT_GUESS_VALUES]:
+            for dayfirst in (False, True):
+                try:
+                    date_format = guess_datetime_format(value, dayfirst=dayfirst)
+                except Exception:
+                    date_format = None
+                if date_format and date_format not in candidates:
+                    candidates.append(date_format)
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else None
+    sample_series = pd.Series(samples)
+    return max(
+        candidates,
+        key=lambda date_format: pd.to_datetime(sample_series, errors='coerce', format=date_format).notna().sum()
+    )
+
+def coerce_to_datetime(column_data, date_format=None):
+    """Parse dates with one fixed format, so pandas never falls back to dateutil per element.
+    
+    Without a format, text isn't read as dates at all - only values that already are
+    dates (from a workbook, say) come through, everything else is NaT.
+    """
+    if date_format:
+        return pd.to_datetime(column_data, errors='coerce', format=date_format)
+    if pd.api.types.infer_dtype(column_data, skipna=True) in ("datetime64", "datetime", "date"):
+        return pd.to_datetime(column_data, errors='coerce')
+    return pd.Series(pd.NaT, index=column_data.index, dtype="datetime64[ns]", name=column_data.name)
+
+def is_clear_decision(ratio, threshold, margin):
+    """True when a sampled ratio is far enough from the threshold to trust it"""
+    return abs(ratio - threshold) > margin
+
+def estimate_distinct_count(sample_counts, total_rows):
+    """Chao1 estimate of how many distinct values the full column has, from sample counts"""
+    singletons = int((sample_counts == 1).sum())
+    doubletons = int((sample_counts == 2).sum())
+    if doubletons > 0:
+        estimate = len(sample_counts) + singletons * singletons / (2 * doubletons)
+    else:
+        estimate = len(sample_counts) + singletons * (singletons - 1) / 2
+    return min(estimate, total_rows)
+
+def infer_column_types(dataframe, sample_size=TYPE_INFERENCE_SAMPLE_SIZE,
+                       confidence_margin=TYPE_INFERENCE_CONFIDENCE_MARGIN):
+    """Detect column types from a sample, escalating to the full column only when unsure.
+    
+    Returns the type map plus any numeric/datetime versions of columns we ended up
+    coercing in full along the way, so later stages don't have to parse them again.
+    """
+    column_categories = {}
+    coerced_columns = {}
+    total_rows = len(dataframe)
+    sample_positions = draw_stratified_sample(total_rows, sample_size)
+    sample_is_everything = len(sample_positions) == total_rows
+    
+    for col in dataframe.columns:
+        column_data = dataframe[col]
+        
+        if total_rows == 0:
+            column_categories[col] = 'categorical'
+            continue
+        
+        # Columns pandas already parsed don't need any guessing
+        if pd.api.types.is_datetime64_any_dtype(column_data):
+            column_categories[col] = 'datetime'
+            coerced_columns[col] = column_data
+            continue
+        if pd.api.types.is_numeric_dtype(column_data):
+            if column_data.notna().sum() / total_rows > 0.5:
+                column_categories[col] = 'numerical'
+                coerced_columns[col] = column_data
+                continue
+            sample_data = column_data.iloc[sample_positions]
+        else:
+            sample_data = column_data.iloc[sample_positions]
+            
+            # Try to see if it's numeric first
+            numeric_sample = pd.to_numeric(sample_data, errors='coerce')
+            numeric_ratio = numeric_sample.notna().sum() / len(sample_data)
+            if not sample_is_everything and not is_clear_decision(numeric_ratio, 0.5, confidence_margin):
+                numeric_attempt = pd.to_numeric(column_data, errors='coerce')
+                numeric_ratio = numeric_attempt.notna().sum() / total_rows
+            else:
+                numeric_attempt = None
+            
+            if numeric_ratio > 0.5:
+                # Looks like numbers to me
+                column_categories[col] = 'numerical'
+                if numeric_attempt is not None:
+                    coerced_columns[col] = numeric_attempt
+                continue
+            
+            # Check if it might be dates
+            try:
+                date_format = guess_date_format(sample_data.dropna().values[:50])
+                date_sample = coerce_to_datetime(sample_data, date_format)
+                date_ratio = date_sample.notna().sum() / len(sample_data)
+                date_attempt = None
+                if not sample_is_everything and not is_clear_decision(date_ratio, 0.3, confidence_margin):
+                    date_attempt = coerce_to_datetime(column_data, date_format)
+                    date_ratio = date_attempt.notna().sum() / total_rows
+                if date_ratio > 0.3:
+                    column_categories[col] = 'datetime'
+                    if date_attempt is not None:
+                        coerced_columns[col] = date_attempt
+                    continue
+            except Exception:
+                pass
+        
+        # Count unique values to decide if it's categorical - a handful of values in a
+        # decent-sized sample is convincing, so is a sample that almost never repeats
+        unique_vals = None
+        if not sample_is_everything and len(sample_positions) >= 1000:
+            sample_counts = sample_data.value_counts(dropna=True)
+            if len(sample_counts) <= 20:
+                unique_vals = len(sample_counts)
+            else:
+                estimated_ratio = estimate_distinct_count(sample_counts, total_rows) / total_rows
+                if estimated_ratio > 0.1 + confidence_margin:
+                    unique_vals = int(estimated_ratio * total_rows)
+        if unique_vals is None:
+            unique_vals = column_data.nunique(dropna=True)
+        
+        if unique_vals == 2:
+            column_categories[col] = 'binary'
+        elif unique_vals <= 20 or unique_vals / total_rows < 0.1:
+            column_categories[col] = 'categorical'
+        else:
+            column_categories[col] = 'text'
+    
+    return column_categories, coerced_columns
+
+def figure_out_column_types(dataframe):
+    """Smart detection of what kind of data we're dealing with"""
+    column_categories, _ = infer_column_types(dataframe)
+    return column_categories
@@ -0,0 +1,145 @@
+"""Where the time goes: per-stage timings for uploads and questions.
+
+    with traced("question", "average sales by region") as trace:
+        ...                      # engine code calls trace_stage() as it goes
+    trace.stage_table()
+
+Stages anywhere in the engine record into whichever trace is active in the
+current thread/session, and cost next to nothing when there isn't one. Each
+stage gets its wall time, the rows it went through and - only while
+tracemalloc is running, because that slows everything down - the memory it
+allocated. Finished traces are appended to a JSON-lines file if BI_TRACE_LOG
+is set.
+"""
+
+import contextlib
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+TRACE_LOG_PATH = os.environ.get("BI_TRACE_LOG", "")
+TRACE_LOG_LOCK = threading.Lock()
+PROFILE_TOP_FUNCTIONS = 25
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+class Trace:
+    """Stage-by-stage timings for one upload or one question"""
+
+    def __init__(self, kind, label, dataset_id=None):
+        self.kind = kind
+        self.label = label
+        self.dataset_id = dataset_id
+        self.stages = []
+        self.open_stages = []
+        self.profile_text = None
+        self.started_at = time.time()
+        self.started_counter = time.perf_counter()
+        self.total_seconds = None
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None, **details):
+        record = {"stage": name, "depth": len(self.open_stages), "seconds": None, "rows": rows,
+                  "allocated_bytes": None, **details}
+        tracing_memory = tracemalloc.is_tracing()
+        memory_before = tracemalloc.get_traced_memory()[0] if tracing_memory else 0
+        self.stages.append(record)
+        self.open_stages.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - started
+            if tracing_memory and tracemalloc.is_tracing():
+                record["allocated_bytes"] = tracemalloc.get_traced_memory()[0] - memory_before
+            self.open_stages.pop()
+
+    def add_rows(self, row_count):
+        """Count rows against the innermost stage that's running"""
+        if self.open_stages:
+            record = self.open_stages[-1]
+            record["rows"] = (record["rows"] or 0) + row_count
+
+    def finish(self):
+        self.total_seconds = time.perf_counter() - self.started_counter
+        if TRACE_LOG_PATH:
+            write_trace_log(self.as_dict())
+
+    def as_dict(self):
+        trace_record = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "kind": self.kind,
+            "label": self.label,
+            "dataset": self.dataset_id,
+            "total_seconds": self.total_seconds,
+            "stages": self.stages,
+        }
+        if self.profile_text:
+            trace_record["profile"] = self.profile_text
+        return trace_record
+
+    def stage_table(self):
+        """The stages as a small table for the UI, nested stages indented"""
+        return pd.DataFrame({
+            "stage": ["  " * record["depth"] + record["stage"] for record in self.stages],
+            "ms": [round((record["seconds"] or 0) * 1000, 1) for record in self.stages],
+            "rows": pd.array([record["rows"] for record in self.stages], dtype="Int64"),
+            "allocated_mb": [
+                round(record["allocated_bytes"] / 1024 / 1024, 2) if record["allocated_bytes"] is not None else None
+                for record in self.stages
+            ],
+        })
+
+def write_trace_log(trace_record):
+    try:
+        with TRACE_LOG_LOCK:
+            with open(TRACE_LOG_PATH, "a", encoding="utf-8") as log_file:
+                log_file.write(json.dumps(trace_record, default=str) + "\n")
+    except OSError:
+        # A full disk or a bad path shouldn't break answering questions
+        pass
+
+@contextlib.contextmanager
+def traced(kind, label, dataset_id=None):
+    """Make a new trace the active one for everything run inside the block"""
+    trace = Trace(kind, label, dataset_id)
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+        trace.finish()
+
+@contextlib.contextmanager
+def trace_stage(name, rows=None, **details):
+    """Time a stage into the active trace, if there is one"""
+    trace = current_trace.get()
+    if trace is None:
+        yield None
+        return
+    with trace.stage(name, rows, **details) as record:
+        yield record
+
+def count_rows(row_count):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_rows(row_count)
+
+def profile_call(function, *args, **kwargs):
+    """Run one call under cProfile; the top functions by cumulative time go on the active trace"""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args, **kwargs)
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.profile_text = report.getvalue()
+    return result, report.getvalue()
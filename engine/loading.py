@@ -0,0 +1,151 @@
+"""Getting an upload (or a server-side CSV) from bytes to a ready-to-query dataset"""
+
+import io
+import os
+
+import pandas as pd
+
+from .caching import hash_uploaded_bytes
+from .cleaning import add_calculated_columns, process_uploaded_data, sanitize_column_headers
+from .dataset import build_typed_dataset
+from .excel import SHEET_COLUMN, list_excel_sheets, read_excel_sheets, stack_sheets
+from .inference import infer_column_types
+from .instrumentation import trace_stage
+from .lookup import get_column_index, get_value_index
+from .streaming import STREAMING_THRESHOLD_MB, StreamingCsvDataset, remove_spill_file, spill_to_disk
+from .warmup import start_warmup
+
+# Folder on the server that large CSVs can be streamed from - unset means uploads only
+SERVER_DATA_DIR = os.environ.get("BI_SERVER_DATA_DIR", "")
+
+def resolve_server_csv_path(file_name):
+    """Map a file name onto the server data folder, refusing anything that escapes it"""
+    data_dir = os.path.realpath(SERVER_DATA_DIR)
+    csv_path = os.path.realpath(os.path.join(data_dir, file_name.strip()))
+    if os.path.commonpath([data_dir, csv_path]) != data_dir or not csv_path.lower().endswith('.csv'):
+        raise ValueError("Please pick a CSV file inside the server data folder.")
+    return csv_path
+
+def load_server_csv(csv_path, cache=None):
+    """Stream a CSV that already sits on the server, without ever loading it whole"""
+    file_stats = os.stat(csv_path)
+    fingerprint = hash_uploaded_bytes(f"{os.path.abspath(csv_path)}:{file_stats.st_size}:{file_stats.st_mtime_ns}".encode())
+
+    def build():
+        with trace_stage("streaming load pass", input_bytes=file_stats.st_size):
+            dataset = StreamingCsvDataset(csv_path, fingerprint=fingerprint)
+        start_warmup(dataset)
+        return dataset
+    return load_through_cache(fingerprint, build, cache)
+
+def load_through_cache(content_hash, build, cache=None):
+    """The stored dataset for this hash, building it (once, however many sessions ask) if needed"""
+    if cache is None:
+        return build()
+    cached_dataset = cache.get(content_hash)
+    if cached_dataset is not None:
+        return cached_dataset
+    with cache.loading(content_hash):
+        # Someone else may have finished building it while we waited
+        cached_dataset = cache.get(content_hash)
+        if cached_dataset is not None:
+            return cached_dataset
+        dataset = build()
+        cache.put(content_hash, dataset)
+        return dataset
+
+def read_uploaded_file(raw_bytes, file_name, sheet_names=None):
+    """Turn the raw upload into a dataframe based on its extension.
+    
+    For workbooks only the picked sheets are read (the first one by default);
+    several sheets are stacked into one table.
+    """
+    file_extension = file_name.split('.')[-1].lower()
+    if file_extension == 'csv':
+        return pd.read_csv(io.BytesIO(raw_bytes))
+    return stack_sheets(read_excel_sheets(raw_bytes, sheet_names))
+
+def sheet_selection_hash(content_hash, raw_bytes, file_name, sheet_names):
+    """Cache key for a workbook read with particular sheets - the first sheet alone keeps the plain hash"""
+    if not sheet_names or file_name.split('.')[-1].lower() == 'csv':
+        return content_hash
+    if list(sheet_names) == list_excel_sheets(raw_bytes)[:1]:
+        return content_hash
+    return hash_uploaded_bytes(f"{content_hash}:sheets:{'|'.join(sheet_names)}".encode())
+
+def prepare_lookup_indexes(dataset):
+    """Build the column-name and value lookups up front so the first question is quick too"""
+    get_column_index(dataset.columns)
+    get_value_index(dataset, dataset.column_types)
+    return dataset
+
+def load_uploaded_dataset(uploaded_data_file, cache=None, disk_cache=None, sheet_names=None):
+    """Load a Streamlit upload (anything with .getvalue() and .name)"""
+    return load_dataset_bytes(uploaded_data_file.getvalue(), uploaded_data_file.name, cache, disk_cache, sheet_names)
+
+def load_dataset_file(file_path, cache=None, disk_cache=None, sheet_names=None):
+    """Load a CSV or Excel file from disk - the entry point when there's no UI"""
+    with open(file_path, 'rb') as data_file:
+        return load_dataset_bytes(data_file.read(), os.path.basename(file_path), cache, disk_cache, sheet_names)
+
+def load_dataset_bytes(raw_bytes, file_name, cache=None, disk_cache=None, sheet_names=None):
+    """Run the whole ingestion pipeline into a TypedDataset, reusing it for identical bytes (and sheets)"""
+    content_hash = sheet_selection_hash(hash_uploaded_bytes(raw_bytes), raw_bytes, file_name, sheet_names)
+    return load_through_cache(
+        content_hash,
+        lambda: build_dataset_from_bytes(raw_bytes, file_name, content_hash, disk_cache, sheet_names),
+        cache
+    )
+
+def build_dataset_from_bytes(raw_bytes, file_name, content_hash, disk_cache=None, sheet_names=None):
+    file_extension = file_name.split('.')[-1].lower()
+    if file_extension == 'csv' and len(raw_bytes) > STREAMING_THRESHOLD_MB * 1024 * 1024:
+        # Too big to hold as a dataframe - summarise it chunk by chunk instead. The
+        # rescans read a temp copy, so the dataset doesn't keep the upload's bytes alive
+        with trace_stage("streaming load pass", input_bytes=len(raw_bytes)):
+            spill_path = spill_to_disk(raw_bytes)
+            try:
+                dataset = StreamingCsvDataset(spill_path, fingerprint=content_hash, delete_source=True)
+            except Exception:
+                remove_spill_file(spill_path)
+                raise
+        start_warmup(dataset)
+        return dataset
+    
+    if disk_cache is not None:
+        with trace_stage("disk cache lookup") as record:
+            dataset = disk_cache.load(content_hash)
+            if record is not None:
+                record["hit"] = dataset is not None
+        if dataset is not None:
+            start_warmup(dataset)
+            return dataset
+    
+    with trace_stage("read file", input_bytes=len(raw_bytes)) as record:
+        raw_dataframe = read_uploaded_file(raw_bytes, file_name, sheet_names)
+        if record is not None:
+            record["rows"] = len(raw_dataframe)
+    row_count = len(raw_dataframe)
+    with trace_stage("clean headers", rows=row_count):
+        clean_dataframe = sanitize_column_headers(raw_dataframe)
+        clean_dataframe = add_calculated_columns(clean_dataframe)
+    with trace_stage("process values", rows=row_count):
+        # The frame is ours alone at this point, so there's no need for a defensive copy
+        processed_dataframe = process_uploaded_data(clean_dataframe, copy=False)
+    with trace_stage("infer column types", rows=row_count):
+        detected_column_types, coerced_columns = infer_column_types(processed_dataframe)
+        if file_extension != 'csv' and len(sheet_names or []) > 1 and SHEET_COLUMN in detected_column_types:
+            # Tab names are labels, even when they read like dates ("Jan", "2024")
+            detected_column_types[SHEET_COLUMN] = 'categorical'
+            coerced_columns.pop(SHEET_COLUMN, None)
+    with trace_stage("build typed columns", rows=row_count):
+        dataset = build_typed_dataset(
+            processed_dataframe, detected_column_types, coerced_columns, fingerprint=content_hash
+        )
+    # Profiles, counts and lookups get built in the background from here on. The
+    # disk copy waits for them so it can carry the profiles along
+    follow_ups = []
+    if disk_cache is not None:
+        follow_ups.append(lambda: disk_cache.save(content_hash, dataset))
+    start_warmup(dataset, after=follow_ups)
+    return dataset
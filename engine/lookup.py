@@ -0,0 +1,224 @@
+"""Matching words in a question to column names and category values"""
+
+import functools
+import re
+
+import pandas as pd
+
+def normalize_column_text(text):
+    """Lower-case and drop spaces/underscores so 'Sales Amount' and 'sales_amount' agree"""
+    return str(text).lower().replace(" ", "").replace("_", "")
+
+def character_ngrams(text, size=3):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+class ColumnIndex:
+    """Lookup tables for finding columns by name, built once per set of columns.
+    
+    Holds a normalized-name hash map for exact hits, a token inverted index for
+    whole words and a trigram index for partial and fuzzy matches, so a lookup only
+    touches the columns that share something with the search term.
+    """
+
+    def __init__(self, columns, ngram_size=3):
+        self.columns = list(columns)
+        self.ngram_size = ngram_size
+        self.normalized_names = [normalize_column_text(col) for col in self.columns]
+        self.exact_lookup = {}
+        self.token_index = {}
+        self.ngram_index = {}
+        self.ngram_counts = []
+        
+        for position, (col, normalized) in enumerate(zip(self.columns, self.normalized_names)):
+            self.exact_lookup.setdefault(normalized, []).append(position)
+            for token in re.split(r'[\s_]+', str(col).lower()):
+                if token:
+                    self.token_index.setdefault(token, []).append(position)
+            ngrams = character_ngrams(normalized, ngram_size)
+            self.ngram_counts.append(len(ngrams))
+            for ngram in ngrams:
+                self.ngram_index.setdefault(ngram, []).append(position)
+
+    def positions_containing(self, fragment):
+        """Columns whose normalized name contains the fragment, via n-gram intersection"""
+        fragment_ngrams = character_ngrams(fragment, self.ngram_size)
+        if not fragment_ngrams:
+            return [p for p, name in enumerate(self.normalized_names) if fragment in name]
+        postings = sorted((self.ngram_index.get(ngram, []) for ngram in fragment_ngrams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        return [p for p in candidates if fragment in self.normalized_names[p]]
+
+    def shared_ngram_counts(self, search_ngrams):
+        shared = {}
+        for ngram in search_ngrams:
+            for position in self.ngram_index.get(ngram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        return shared
+
+    def positions_inside(self, text):
+        """Columns whose whole normalized name appears somewhere in the text.
+        
+        Every substring of the text is probed in the hash map, so the cost depends on
+        the length of the question rather than the number of columns.
+        """
+        found = []
+        for start in range(len(text)):
+            for end in range(start + 1, len(text) + 1):
+                for position in self.exact_lookup.get(text[start:end], ()):
+                    found.append(position)
+        return found
+
+    def lookup(self, search_term, limit=5):
+        """Ranked (column, score) candidates - exact beats partial beats word beats fuzzy.
+        
+        Later (weaker) tiers are only searched while we still need more candidates.
+        """
+        search_normalized = normalize_column_text(search_term)
+        if not search_normalized:
+            return []
+        
+        scores = {}
+        def offer(position, score):
+            if score > scores.get(position, 0):
+                scores[position] = score
+        
+        # Exact matches
+        for position in self.exact_lookup.get(search_normalized, ()):
+            offer(position, 1.0)
+        
+        # Partial matches in either direction, closer lengths rank higher
+        if len(scores) < limit:
+            for position in self.positions_containing(search_normalized):
+                offer(position, 0.5 + 0.4 * len(search_normalized) / len(self.normalized_names[position]))
+            for position in self.positions_inside(search_normalized):
+                offer(position, 0.5 + 0.4 * len(self.normalized_names[position]) / len(search_normalized))
+        
+        # Word-by-word matches - whole tokens first, then words inside a column name
+        if len(scores) < limit:
+            for word in set(str(search_term).lower().split()):
+                for position in self.token_index.get(word, ()):
+                    offer(position, 0.25 + 0.2 * len(word) / max(len(self.normalized_names[position]), 1))
+                for position in self.positions_containing(word):
+                    offer(position, 0.2 + 0.2 * len(word) / max(len(self.normalized_names[position]), 1))
+        
+        # Fuzzy matches for typos, only when the names are clearly alike
+        if len(scores) < limit:
+            search_ngrams = character_ngrams(search_normalized, self.ngram_size)
+            for position, shared_count in self.shared_ngram_counts(search_ngrams).items():
+                similarity = shared_count / (len(search_ngrams) + self.ngram_counts[position] - shared_count)
+                if similarity >= 0.5:
+                    offer(position, 0.2 * similarity)
+        
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.columns[position], round(score, 3)) for position, score in ranked[:limit]]
+
+@functools.lru_cache(maxsize=32)
+def build_column_index(column_names):
+    return ColumnIndex(column_names)
+
+def get_column_index(available_columns):
+    """The shared index for this set of columns, built the first time it's asked for"""
+    return build_column_index(tuple(available_columns))
+
+def find_column_candidates(search_term, available_columns, limit=5):
+    """All plausible columns for a search term, best first, with their match scores"""
+    return get_column_index(available_columns).lookup(search_term, limit=limit)
+
+def smart_column_finder(search_term, available_columns):
+    """Find the best matching column for a user's query"""
+    candidates = find_column_candidates(search_term, available_columns, limit=1)
+    return candidates[0][0] if candidates else None
+
+class CategoricalValueIndex:
+    """Every distinct categorical/binary value, lower-cased, mapped back to its column.
+    
+    Matching works like a multi-pattern matcher keyed by value length: the question is
+    scanned once and at each position we only probe the lengths that actually occur
+    in the dictionary, so the cost doesn't grow with the number of distinct values.
+    """
+
+    def __init__(self, value_sources):
+        # normalized value -> first column that has it, plus any other columns sharing it
+        self.value_lookup = {}
+        self.shared_values = {}
+        # column -> {normalized value: value as it appears in the data}
+        self.canonical_values = {}
+        self.column_order = {}
+        for column_name, values in value_sources:
+            self.column_order.setdefault(column_name, len(self.column_order))
+            canonical = pd.Series(values, dtype=object).astype(str)
+            column_lookup = dict(zip(canonical.str.lower(), canonical))
+            column_lookup.pop("", None)
+            self.canonical_values[column_name] = column_lookup
+            # Plain dict/set operations keep this fast with hundreds of thousands of values
+            for normalized in column_lookup.keys() & self.value_lookup.keys():
+                self.shared_values.setdefault(normalized, []).append(column_name)
+            self.value_lookup.update(dict.fromkeys(column_lookup.keys() - self.value_lookup.keys(), column_name))
+        self.value_lengths = sorted(set(map(len, self.value_lookup)))
+
+    def sources_for(self, normalized):
+        first_column = self.value_lookup.get(normalized)
+        if first_column is None:
+            return []
+        columns = [first_column] + self.shared_values.get(normalized, [])
+        return [(column_name, self.canonical_values[column_name][normalized]) for column_name in columns]
+
+    def find_matches(self, query_text):
+        """All (column, value) pairs mentioned in the query, most specific first.
+        
+        Longer values beat shorter ones, whole-word mentions beat ones buried inside
+        another word, and a value that only one column has beats an ambiguous one.
+        """
+        query_lower = query_text.lower()
+        query_length = len(query_lower)
+        ranked_matches = {}
+        
+        for start in range(query_length):
+            for value_length in self.value_lengths:
+                end = start + value_length
+                if end > query_length:
+                    break
+                sources = self.sources_for(query_lower[start:end])
+                if not sources:
+                    continue
+                whole_word = (start == 0 or not query_lower[start - 1].isalnum()) and \
+                             (end == query_length or not query_lower[end].isalnum())
+                rank = (-value_length, not whole_word, len(sources))
+                for column_name, value in sources:
+                    key = (column_name, value)
+                    if key not in ranked_matches or rank < ranked_matches[key]:
+                        ranked_matches[key] = rank
+        
+        ordered = sorted(ranked_matches.items(), key=lambda item: (item[1], self.column_order[item[0][0]]))
+        return [match for match, _ in ordered]
+
+def get_value_index(dataframe, col_types):
+    """The value dictionary for a dataset, built once and kept with it"""
+    def build():
+        value_sources = []
+        for column_name, data_type in col_types.items():
+            if data_type in ["categorical", "binary"]:
+                if hasattr(dataframe, "distinct_values"):
+                    value_sources.append((column_name, dataframe.distinct_values(column_name)))
+                else:
+                    value_sources.append((column_name, dataframe[column_name].dropna().unique()))
+        return CategoricalValueIndex(value_sources)
+    
+    if hasattr(dataframe, "cached"):
+        return dataframe.cached("value_index", build)
+    return build()
+
+def find_categorical_matches(query_text, dataframe, col_types):
+    """Every categorical value the query mentions, ranked by how specific the match is"""
+    return get_value_index(dataframe, col_types).find_matches(query_text)
+
+def hunt_for_categorical_values(query_text, dataframe, col_types):
+    """Look for specific values mentioned in the query"""
+    matches = find_categorical_matches(query_text, dataframe, col_types)
+    if matches:
+        return matches[0]
+    return None, None
@@ -0,0 +1,356 @@
+"""Turning a plain-English question into an action tuple for the executor"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from .dataset import DEFAULT_HISTOGRAM_BINS, HISTOGRAM_BIN_RULES
+from .instrumentation import trace_stage
+from .lookup import find_column_candidates, hunt_for_categorical_values, smart_column_finder
+
+# Threshold phrases for counting questions, checked in order so that
+# "no more than 5" isn't mistaken for "more than 5"
+NUMBER_PATTERN = r'(-?\d+(?:\.\d+)?)'
+THRESHOLD_PATTERNS = [
+    (rf'(?:at most|no more than|up to|<=)\s*{NUMBER_PATTERN}', "<="),
+    (rf'(?:at least|no less than|>=)\s*{NUMBER_PATTERN}', ">="),
+    (rf'(?:under|below|less than|fewer than|<)\s*{NUMBER_PATTERN}', "<"),
+    (rf'(?:above|over|more than|greater than|>)\s*{NUMBER_PATTERN}', ">"),
+]
+THRESHOLD_WORDING = {"<": "under", ">": "above", "<=": "at most", ">=": "at least"}
+
+# How many distinct questions per dataset keep their parse around
+PARSE_MEMO_ENTRIES = 2048
+
+# Words that pick which aggregate a breakdown is ranked by
+GROUP_AGGREGATE_WORDS = [
+    ("average", "mean"), ("mean", "mean"), ("total", "sum"), ("sum", "sum"),
+    ("highest", "max"), ("maximum", "max"), ("max", "max"),
+    ("lowest", "min"), ("minimum", "min"), ("min", "min"),
+    ("median", "median"), ("number of", "count"),
+]
+# Whole words only (plurals too), so "summit" isn't a sum and "admin" isn't a min
+GROUP_AGGREGATE_PATTERN = re.compile(r'\b(' + '|'.join(re.escape(phrase) for phrase, _ in GROUP_AGGREGATE_WORDS) + r')s?\b')
+GROUP_AGGREGATE_PRIORITY = {phrase: position for position, (phrase, _) in enumerate(GROUP_AGGREGATE_WORDS)}
+
+def find_group_aggregate(query_lower, default=None):
+    """The aggregate a question asks for - the earliest entry of GROUP_AGGREGATE_WORDS wins"""
+    phrases = [match.group(1) for match in GROUP_AGGREGATE_PATTERN.finditer(query_lower)]
+    if not phrases:
+        return default
+    return GROUP_AGGREGATE_WORDS[min(GROUP_AGGREGATE_PRIORITY[phrase] for phrase in phrases)][1]
+
+def parse_aggregate_breakdown(query_lower, dataframe, column_types):
+    """'average income by department' is a breakdown of income, not one number"""
+    by_matches = list(re.finditer(r'\bby\s+', query_lower))
+    if not by_matches:
+        return None
+    aggregate = find_group_aggregate(query_lower)
+    if aggregate is None:
+        return None
+    
+    # "top 5 customers by total sales" ranks the groups named before "by"
+    ranked_match = re.search(r'\btop (\d+)\s+(.+?)\s+by\s+(.+)$', query_lower)
+    if ranked_match:
+        value_text = ranked_match.group(3)
+    else:
+        value_text = query_lower[:by_matches[-1].start()]
+    value_text = GROUP_AGGREGATE_PATTERN.sub(" ", value_text)
+    numeric_columns = [c for c, t in column_types.items() if t == "numerical"]
+    value_column = next(
+        (col for col, _ in find_column_candidates(value_text, numeric_columns, limit=1)), None
+    ) if numeric_columns else None
+    
+    if ranked_match:
+        group_column = smart_column_finder(ranked_match.group(2), dataframe.columns)
+    else:
+        group_column = pick_group_columns(query_lower, dataframe, column_types, value_column)
+    if not value_column or not group_column or group_column == value_column:
+        return None
+    
+    top_match = re.search(r'\btop (\d+)', query_lower)
+    top_n = int(top_match.group(1)) if top_match else None
+    return ("group_and_analyze", group_column, value_column, aggregate, top_n)
+
+def pick_group_columns(query_lower, dataframe, column_types, value_column=None):
+    """Work out what to group by - 'by region and department' gives two keys"""
+    by_matches = list(re.finditer(r'\bby\s+', query_lower))
+    if by_matches:
+        key_text = query_lower[by_matches[-1].end():]
+        key_columns = []
+        for part in re.split(r'\s+and\s+|\s*,\s*', key_text):
+            col = smart_column_finder(part.strip(), dataframe.columns) if part.strip() else None
+            if col and col != value_column and col not in key_columns:
+                key_columns.append(col)
+        if len(key_columns) == 1:
+            return key_columns[0]
+        if key_columns:
+            return tuple(key_columns)
+    
+    # Otherwise take the best-matching column, preferring labels over numbers
+    candidates = [col for col, _ in find_column_candidates(query_lower, dataframe.columns, limit=10) if col != value_column]
+    label_candidates = [col for col in candidates if column_types.get(col) != "numerical"]
+    if label_candidates:
+        return label_candidates[0]
+    return candidates[0] if candidates else None
+
+def pick_histogram_bins(query_lower):
+    """'with 50 bins' or a named rule like 'sturges'; otherwise the usual 25 bins"""
+    bins_match = re.search(r'(\d+)\s+bins', query_lower)
+    if bins_match:
+        return max(1, min(int(bins_match.group(1)), 1000))
+    if "freedman" in query_lower:
+        return "fd"
+    for rule in HISTOGRAM_BIN_RULES:
+        if re.search(rf'\b{rule}\b', query_lower) and rule != "auto":
+            return rule
+    if "auto bins" in query_lower or "automatic bins" in query_lower:
+        return "auto"
+    return DEFAULT_HISTOGRAM_BINS
+
+# 'monthly' or 'per month' fixes the trend's bucket size; otherwise it follows the date range
+TREND_GRANULARITY_PATTERN = re.compile(
+    r'\b(?:(daily|weekly|monthly|quarterly)|(?:per|by|each|every|a)\s+(day|week|month|quarter))\b'
+)
+TREND_GRANULARITY_WORDS = {"daily": "day", "weekly": "week", "monthly": "month", "quarterly": "quarter"}
+
+def parse_trend_question(query_lower, remaining_query, column_types):
+    """'monthly total sales over time' -> ("create_line_chart", time col, value col, aggregate, granularity)"""
+    granularity_match = TREND_GRANULARITY_PATTERN.search(query_lower)
+    granularity = "auto"
+    if granularity_match:
+        granularity = TREND_GRANULARITY_WORDS.get(granularity_match.group(1)) or granularity_match.group(2)
+    aggregate = find_group_aggregate(query_lower, "mean")
+    
+    # Column names are looked for in what's left once the bucket and aggregate words are gone
+    column_text = GROUP_AGGREGATE_PATTERN.sub(" ", TREND_GRANULARITY_PATTERN.sub(" ", remaining_query))
+    
+    # Dates were typed at load time, so go by the column's type rather than its name
+    datetime_columns = [c for c, t in column_types.items() if t == "datetime"]
+    time_col = next(
+        (col for col, _ in find_column_candidates(column_text, datetime_columns, limit=1)), None
+    ) if datetime_columns and column_text.strip() else None
+    time_col = time_col or first_column_of_type(column_types, "datetime")
+    
+    # 'number of orders over time' counts rows, anything else needs a numeric column
+    value_col = None
+    numeric_columns = [c for c, t in column_types.items() if t == "numerical"]
+    if aggregate != "count" and numeric_columns and column_text.strip():
+        value_col = next((col for col, _ in find_column_candidates(column_text, numeric_columns, limit=1)), None)
+    return ("create_line_chart", time_col, value_col, aggregate, granularity)
+
+# Trigger phrases for each intent, highest priority first: when a question holds
+# triggers for several intents the earliest one here wins
+INTENT_TRIGGERS = [
+    ("pie_chart", ["pie chart", "pie graph"]),
+    ("bar_chart", ["bar chart", "bar graph", "show bars"]),
+    ("histogram", ["histogram", "distribution", "spread"]),
+    ("line_chart", ["line chart", "trend", "over time"]),
+    ("scatter_plot", ["scatter", "correlation plot", "relationship"]),
+    ("mean", ["average", "mean"]),
+    ("sum", ["total", "sum"]),
+    ("max", ["maximum", "max", "highest"]),
+    ("min", ["minimum", "min", "lowest"]),
+    ("median", ["median"]),
+    ("count", ["how many", "count"]),
+    ("group", ["compare", "group by", "breakdown", "by category"]),
+    ("summary", ["summary", "describe", "overview", "statistics"]),
+]
+# Extra words dropped along with the trigger before we go looking for a column name
+INTENT_FILLERS = {
+    "pie_chart": ["of"],
+    "bar_chart": ["of"],
+    "histogram": ["of"],
+    "scatter_plot": ["plot", "correlation"],
+    "mean": ["what is", "the"],
+    "sum": ["what is", "the"],
+    "max": ["what is", "the"],
+    "min": ["what is", "the"],
+    "median": ["what is", "the"],
+}
+CHART_INTENTS = {"pie_chart", "bar_chart", "histogram", "line_chart", "scatter_plot"}
+STATISTIC_INTENTS = {"mean", "sum", "max", "min", "median"}
+
+def build_intent_matcher():
+    """One regex over every trigger and filler phrase, plus what each phrase means"""
+    phrase_roles = {}
+    for priority, (intent, phrases) in enumerate(INTENT_TRIGGERS):
+        for phrase in phrases:
+            phrase_roles.setdefault(phrase, []).append(("trigger", intent, priority))
+    for intent, phrases in INTENT_FILLERS.items():
+        for phrase in phrases:
+            phrase_roles.setdefault(phrase, []).append(("filler", intent, None))
+    
+    # Longest phrases first so 'correlation plot' wins over 'correlation'; phrases only
+    # match whole words (underscores count as separators) with an optional plural 's'
+    alternatives = "|".join(re.escape(phrase) for phrase in sorted(phrase_roles, key=len, reverse=True))
+    pattern = re.compile(rf'(?<![a-z0-9])({alternatives})s?(?![a-z0-9])')
+    return pattern, phrase_roles
+
+INTENT_PATTERN, INTENT_PHRASE_ROLES = build_intent_matcher()
+
+def classify_intent(query_lower):
+    """Find the intent and the question with its trigger words cut out, in one scan.
+    
+    Returns (intent, remaining_text); intent is None when nothing matched.
+    """
+    matches = [(match.span(), INTENT_PHRASE_ROLES[match.group(1)]) for match in INTENT_PATTERN.finditer(query_lower)]
+    trigger_priorities = [
+        (priority, intent)
+        for _, roles in matches
+        for role, intent, priority in roles
+        if role == "trigger"
+    ]
+    if not trigger_priorities:
+        return None, query_lower
+    _, intent = min(trigger_priorities)
+    
+    # Stitch the question back together without this intent's triggers and fillers
+    pieces = []
+    position = 0
+    for (match_start, match_end), roles in matches:
+        if any(role_intent == intent for _, role_intent, _ in roles):
+            pieces.append(query_lower[position:match_start])
+            position = match_end
+    pieces.append(query_lower[position:])
+    return intent, re.sub(r'\s+', ' ', " ".join(pieces)).strip()
+
+def first_column_of_type(column_types, wanted_type):
+    matching_columns = [c for c, t in column_types.items() if t == wanted_type]
+    return matching_columns[0] if matching_columns else None
+
+class ParseMemo:
+    """The most recently asked questions for one dataset and what they parsed to.
+    
+    Questions are free text and the dataset may be shared by every session, so
+    only the last max_entries are kept, least recently asked dropped first.
+    """
+
+    def __init__(self, max_entries=PARSE_MEMO_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_or_parse(self, memo_key, parse):
+        with self.lock:
+            if memo_key in self.entries:
+                self.entries.move_to_end(memo_key)
+                return self.entries[memo_key]
+        action = parse()
+        with self.lock:
+            self.entries[memo_key] = action
+            self.entries.move_to_end(memo_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return action
+
+def parse_natural_language_query(user_question, dataframe, column_types):
+    """The heart of our system - figure out what the user wants"""
+    query_lower = user_question.lower().strip()
+    with trace_stage("parse question"):
+        # Same question against the same data always parses the same way
+        cached = getattr(dataframe, "cached", None)
+        if cached is None:
+            return parse_question_text(query_lower, dataframe, column_types)
+        return cached("parse_memo", ParseMemo).get_or_parse(
+            (query_lower, tuple(column_types.items())),
+            lambda: parse_question_text(query_lower, dataframe, column_types)
+        )
+
+def parse_question_text(query_lower, dataframe, column_types):
+    intent, remaining_query = classify_intent(query_lower)
+    
+    # Chart requests
+    if intent == "pie_chart":
+        # Default to first categorical column
+        target_col = smart_column_finder(remaining_query, dataframe.columns) or first_column_of_type(column_types, "categorical")
+        return ("create_pie_chart", target_col)
+    
+    if intent == "bar_chart":
+        target_col = smart_column_finder(remaining_query, dataframe.columns) or first_column_of_type(column_types, "categorical")
+        return ("create_bar_chart", target_col)
+    
+    if intent == "histogram":
+        target_col = smart_column_finder(remaining_query, dataframe.columns) or first_column_of_type(column_types, "numerical")
+        return ("create_histogram", target_col, pick_histogram_bins(query_lower))
+    
+    if intent == "line_chart":
+        return parse_trend_question(query_lower, remaining_query, column_types)
+    
+    if intent == "scatter_plot":
+        # Look for two numeric columns
+        words = remaining_query.split(" vs ")
+        if len(words) == 2:
+            col1 = smart_column_finder(words[0].strip(), dataframe.columns)
+            col2 = smart_column_finder(words[1].strip(), dataframe.columns)
+        else:
+            numeric_columns = [c for c, t in column_types.items() if t == "numerical"]
+            col1 = numeric_columns[0] if len(numeric_columns) > 0 else None
+            col2 = numeric_columns[1] if len(numeric_columns) > 1 else None
+        return ("create_scatter_plot", col1, col2)
+    
+    # Aggregates broken down by a column
+    breakdown_action = parse_aggregate_breakdown(query_lower, dataframe, column_types)
+    if breakdown_action:
+        return breakdown_action
+    
+    # Statistical queries
+    if intent in STATISTIC_INTENTS:
+        target_col = smart_column_finder(remaining_query, dataframe.columns) or first_column_of_type(column_types, "numerical")
+        return ("calculate_statistic", target_col, intent)
+    
+    # Filtering and counting queries
+    if intent == "count":
+        # Look for numeric filters first - ranges, then one-sided thresholds
+        range_match = re.search(rf'between {NUMBER_PATTERN} and {NUMBER_PATTERN}', query_lower)
+        threshold_match = None
+        for pattern, operator in THRESHOLD_PATTERNS:
+            threshold_match = re.search(pattern, query_lower)
+            if threshold_match:
+                break
+        
+        if range_match or threshold_match:
+            target_col = smart_column_finder(query_lower, dataframe.columns) or first_column_of_type(column_types, "numerical")
+            if range_match:
+                low, high = sorted([float(range_match.group(1)), float(range_match.group(2))])
+                return ("filter_count_range", target_col, low, high)
+            threshold = float(threshold_match.group(1))
+            return ("filter_and_count", target_col, operator, threshold)
+        
+        # Look for categorical filters
+        category_col, category_val = hunt_for_categorical_values(query_lower, dataframe, column_types)
+        if category_col and category_val:
+            return ("filter_count_category", category_col, category_val)
+        
+        # "count by sheet" - how many rows fall in each group
+        if re.search(r'\bby\s+', query_lower):
+            group_column = pick_group_columns(query_lower, dataframe, column_types)
+            if group_column:
+                return ("group_and_analyze", group_column, None, "count", None)
+        
+        # Just count all rows
+        return ("count_all_rows",)
+    
+    # Grouping and comparison queries
+    if intent == "group":
+        value_column = None
+        
+        # Look for a numeric column mentioned
+        for col, col_type in column_types.items():
+            if col_type == "numerical" and col.lower() in query_lower:
+                value_column = col
+                break
+        
+        group_column = pick_group_columns(query_lower, dataframe, column_types, value_column)
+        top_match = re.search(r'\btop (\d+)', query_lower)
+        top_n = int(top_match.group(1)) if top_match else None
+        aggregate = find_group_aggregate(query_lower, "mean")
+        
+        return ("group_and_analyze", group_column, value_column, aggregate, top_n)
+    
+    # Summary requests
+    if intent == "summary":
+        return ("generate_summary", bool(re.search(r'\b(exact|exactly|precise)\b', query_lower)))
+    
+    # Default fallback
+    return ("generate_summary",)
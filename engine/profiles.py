@@ -0,0 +1,312 @@
+"""Column profiles and the sketches behind the dataset summary"""
+
+import numpy as np
+import pandas as pd
+
+# Quantiles kept in every column profile (0%, 1%, ..., 100%) - enough to answer
+# percentile questions approximately without touching the data again
+PROFILE_QUANTILE_GRID = np.linspace(0, 1, 101)
+
+def build_column_profile(column_data):
+    """Count, nulls, sum, mean, min, max, exact median and a quantile sketch in one go"""
+    values = np.asarray(column_data, dtype=float)
+    valid_values = values[~np.isnan(values)]
+    valid_count = len(valid_values)
+    profile = {
+        "count": valid_count,
+        "null_count": len(values) - valid_count,
+        "sum": float(valid_values.sum()),
+        "mean": np.nan,
+        "min": np.nan,
+        "max": np.nan,
+        "median": np.nan,
+        "std": np.nan,
+        "quantiles": [],
+    }
+    if valid_count:
+        # One partition-based call gives min, median and max along with the sketch
+        quantiles = np.quantile(valid_values, PROFILE_QUANTILE_GRID)
+        profile.update({
+            "mean": profile["sum"] / valid_count,
+            "min": float(quantiles[0]),
+            "max": float(quantiles[-1]),
+            "median": float(quantiles[50]),
+            "std": float(valid_values.std(ddof=1)) if valid_count > 1 else np.nan,
+            "quantiles": quantiles.tolist(),
+        })
+    return profile
+
+def profile_quantile(profile, q):
+    """Approximate any quantile from the sketch in a column profile"""
+    if not profile["quantiles"]:
+        return np.nan
+    return float(np.interp(q, PROFILE_QUANTILE_GRID, profile["quantiles"]))
+
+def build_dataset_profiles(dataset, ready_only=False):
+    """Profile every numeric column so stat questions and the sidebar never scan the data.
+    
+    With ready_only, nothing is computed - only the profiles already built (by the
+    warm-up or an earlier question) come back, so a page render never waits on them.
+    """
+    numeric_columns = [col for col, col_type in dataset.column_types.items() if col_type == 'numerical']
+    if ready_only:
+        with dataset.derived_lock:
+            return {
+                col: dataset.derived[("profile", col)]
+                for col in numeric_columns
+                if ("profile", col) in dataset.derived
+            }
+    return {col: dataset.profile(col) for col in numeric_columns}
+
+# Summary sketches - small mergeable structures so a dataset summary is one pass
+# over the rows with bounded memory, however many distinct values a column has
+SUMMARY_QUANTILE_POINTS = 1001
+SUMMARY_HLL_PRECISION = 12
+SUMMARY_HEAVY_HITTERS = 50
+SUMMARY_CHUNK_ROWS = 200_000
+# Same row order as describe(include='all')
+SUMMARY_ROW_ORDER = ["count", "unique", "top", "freq", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+class QuantileSketch:
+    """Weighted points standing in for a column's distribution.
+    
+    Merging two sketches and squeezing the result back to a fixed number of
+    points keeps the size bounded no matter how many chunks go in.
+    """
+    
+    def __init__(self, points=None, weights=None, size=SUMMARY_QUANTILE_POINTS):
+        self.points = np.empty(0) if points is None else np.asarray(points, dtype=float)
+        self.weights = np.empty(0) if weights is None else np.asarray(weights, dtype=float)
+        self.size = size
+
+    @classmethod
+    def from_values(cls, values, size=SUMMARY_QUANTILE_POINTS):
+        values = np.sort(np.asarray(values, dtype=float))
+        if len(values) <= size:
+            # Small enough to keep every value, so quantiles stay exact
+            return cls(values, np.ones(len(values)), size)
+        return cls(np.quantile(values, np.linspace(0, 1, size)), np.full(size, len(values) / size), size)
+
+    def merge(self, other):
+        points = np.concatenate([self.points, other.points])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(points, kind='stable')
+        merged = QuantileSketch(points[order], weights[order], self.size)
+        return merged.compressed() if len(points) > 2 * self.size else merged
+
+    def compressed(self):
+        grid = np.linspace(0, 1, self.size)
+        return QuantileSketch(self.quantile(grid), np.full(self.size, self.weights.sum() / self.size), self.size)
+
+    def quantile(self, q):
+        if not len(self.points):
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        if self.weights.min() == self.weights.max() == 1:
+            return np.quantile(self.points, q)
+        cumulative = np.cumsum(self.weights)
+        ranks = (cumulative - self.weights / 2) / cumulative[-1]
+        return np.interp(q, ranks, self.points)
+
+class HyperLogLog:
+    """Distinct-value estimate from 2**precision one-byte registers, merged by taking the max"""
+    
+    def __init__(self, precision=SUMMARY_HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        """Feed 64-bit hashes (pd.util.hash_array) of the values seen"""
+        if len(hashes) == 0:
+            return
+        remaining_bits = 64 - self.precision
+        buckets = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << remaining_bits) - 1)
+        # Register value = position of the first 1 bit in what's left of the hash
+        bit_lengths = np.zeros(len(remainder), dtype=np.int64)
+        nonzero = remainder > 0
+        bit_lengths[nonzero] = np.floor(np.log2(remainder[nonzero].astype(float))).astype(np.int64) + 1
+        np.maximum.at(self.registers, buckets, (remaining_bits - bit_lengths + 1).astype(np.uint8))
+
+    def merge(self, other):
+        merged = HyperLogLog(self.precision)
+        merged.registers = np.maximum(self.registers, other.registers)
+        return merged
+
+    def estimate(self):
+        register_count = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / register_count)
+        raw_estimate = alpha * register_count ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        empty_registers = int((self.registers == 0).sum())
+        if raw_estimate <= 2.5 * register_count and empty_registers:
+            # Linear counting is much better for small cardinalities
+            return register_count * np.log(register_count / empty_registers)
+        return raw_estimate
+
+class HeavyHitters:
+    """Misra-Gries counters for the most frequent values.
+    
+    Counts are never overstated; each can be short by at most `undercount`,
+    which stays 0 while the column has no more distinct values than counters.
+    """
+    
+    def __init__(self, capacity=SUMMARY_HEAVY_HITTERS):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=float)
+        self.undercount = 0
+
+    def reduced(self, value_counts):
+        """Keep the top counters, less the first count that didn't make it"""
+        if len(value_counts) <= self.capacity:
+            return value_counts
+        kept = value_counts.nlargest(self.capacity + 1)
+        cutoff = kept.iloc[-1]
+        self.undercount += cutoff
+        kept = kept.iloc[:-1] - cutoff
+        return kept[kept > 0]
+
+    def absorb_counts(self, value_counts):
+        # Shrinking the chunk's counts first keeps the merge down to two small series
+        value_counts = self.reduced(value_counts)
+        merged = self.counts.add(value_counts, fill_value=0) if len(self.counts) else value_counts
+        self.counts = self.reduced(merged)
+
+    def merge(self, other):
+        merged = HeavyHitters(self.capacity)
+        merged.absorb_counts(self.counts)
+        merged.absorb_counts(other.counts)
+        merged.undercount += self.undercount + other.undercount
+        return merged
+
+class ColumnSummarySketch:
+    """Everything the summary needs for one column, filled chunk by chunk.
+    
+    kind is 'numeric', 'datetime' (handled as int64 nanoseconds) or 'values'
+    for text-like columns.
+    """
+    
+    def __init__(self, kind):
+        self.kind = kind
+        self.count = 0
+        self.mean = 0.0
+        self.squared_deviations = 0.0
+        self.minimum = np.nan
+        self.maximum = np.nan
+        self.quantiles = QuantileSketch()
+        self.distinct = HyperLogLog()
+        self.heavy_hitters = HeavyHitters()
+        self.labels = {}
+
+    def absorb(self, column_data):
+        if self.kind == 'values':
+            # Counting 64-bit hashes is several times quicker than counting the strings,
+            # and only the handful of values behind the top counters need their text back
+            values = column_data.dropna().to_numpy(dtype=object)
+            hashes = pd.util.hash_array(values, categorize=False)
+            hash_counts = pd.Series(hashes).value_counts(sort=False)
+            self.count += len(values)
+            self.distinct.add_hashes(hash_counts.index.values)
+            self.heavy_hitters.absorb_counts(hash_counts)
+            
+            kept_hashes = self.heavy_hitters.counts.index.values
+            unlabelled = [h for h in kept_hashes if h not in self.labels]
+            if unlabelled:
+                positions = np.flatnonzero(np.isin(hashes, unlabelled))
+                first_positions = pd.Series(positions, index=hashes[positions]).groupby(level=0).first()
+                self.labels.update(zip(first_positions.index, values[first_positions.values]))
+            self.labels = {h: self.labels[h] for h in kept_hashes}
+            return
+        
+        if self.kind == 'datetime':
+            valid = column_data.dropna()
+            values = valid.to_numpy(dtype='datetime64[ns]').view('int64').astype(float)
+        else:
+            values = np.asarray(column_data, dtype=float)
+            values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        
+        # Chan's parallel update keeps mean and variance stable across chunks
+        chunk_count, chunk_mean = len(values), float(values.mean())
+        chunk_deviations = float(np.square(values - chunk_mean).sum())
+        total_count = self.count + chunk_count
+        delta = chunk_mean - self.mean
+        self.mean += delta * chunk_count / total_count
+        self.squared_deviations += chunk_deviations + delta ** 2 * self.count * chunk_count / total_count
+        self.count = total_count
+        self.minimum = np.nanmin([self.minimum, values.min()])
+        self.maximum = np.nanmax([self.maximum, values.max()])
+        self.quantiles = self.quantiles.merge(QuantileSketch.from_values(values))
+
+    def summary(self):
+        if self.kind == 'values':
+            top_counts = self.heavy_hitters.counts.sort_values(ascending=False, kind='stable')
+            undercount = self.heavy_hitters.undercount
+            # While no counter was ever dropped the counts (and so the distinct count) are exact
+            unique = len(top_counts) if undercount == 0 else int(round(self.distinct.estimate()))
+            # A top value is only worth reporting if it clearly stands out from the rest
+            has_top = len(top_counts) > 0 and top_counts.iloc[0] > undercount
+            return {
+                "count": self.count,
+                "unique": min(unique, self.count),
+                "top": self.labels[top_counts.index[0]] if has_top else None,
+                "freq": int(top_counts.iloc[0] + undercount) if has_top else None,
+            }
+        
+        quartiles = self.quantiles.quantile([0.25, 0.5, 0.75])
+        column_summary = {
+            "count": self.count,
+            "mean": self.mean if self.count else np.nan,
+            "min": self.minimum,
+            "25%": quartiles[0],
+            "50%": quartiles[1],
+            "75%": quartiles[2],
+            "max": self.maximum,
+        }
+        if self.kind == 'datetime':
+            return {
+                name: pd.Timestamp(int(round(value))) if name != "count" and pd.notna(value) else value
+                for name, value in column_summary.items()
+            }
+        column_summary["std"] = np.sqrt(self.squared_deviations / (self.count - 1)) if self.count > 1 else np.nan
+        return column_summary
+
+def summary_from_profile(profile):
+    """describe()-style numbers straight out of a load-time column profile"""
+    return {
+        "count": profile["count"],
+        "mean": profile["mean"],
+        "std": profile.get("std", np.nan),
+        "min": profile["min"],
+        "25%": profile_quantile(profile, 0.25),
+        "50%": profile["median"],
+        "75%": profile_quantile(profile, 0.75),
+        "max": profile["max"],
+    }
+
+def summary_from_counts(value_counts):
+    """describe()-style numbers from exact value counts"""
+    return {
+        "count": int(value_counts.sum()),
+        "unique": len(value_counts),
+        "top": value_counts.index[0] if len(value_counts) else None,
+        "freq": int(value_counts.iloc[0]) if len(value_counts) else None,
+    }
+
+def sketch_columns(chunks, column_kinds):
+    """One pass over the chunks, feeding every column's sketch"""
+    sketches = {col: ColumnSummarySketch(kind) for col, kind in column_kinds.items()}
+    if not sketches:
+        return {}
+    for chunk in chunks:
+        for col, sketch in sketches.items():
+            sketch.absorb(chunk[col])
+    return {col: sketch.summary() for col, sketch in sketches.items()}
+
+def build_summary_table(column_summaries, column_order):
+    """Put per-column summaries together in describe(include='all') layout"""
+    # Text columns stay object dtype so their counts don't print as floats
+    table = pd.DataFrame({
+        col: pd.Series(column_summaries.get(col, {}), dtype=object if "unique" in column_summaries.get(col, {}) else None)
+        for col in column_order
+    })
+    return table.reindex([row for row in SUMMARY_ROW_ORDER if row in table.index])
@@ -0,0 +1,725 @@
+"""Answering questions about CSVs too big to load, one chunk at a time"""
+
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from .charts import build_category_figure, build_histogram_figure, build_scatter_figure
+from .cleaning import add_calculated_columns, process_uploaded_data, sanitize_column_headers
+from .dataset import (
+    DEFAULT_HISTOGRAM_BINS,
+    build_cached,
+    describe_group_result,
+    estimate_derived_bytes,
+    estimate_memory_footprint,
+)
+from .inference import coerce_to_datetime, figure_out_column_types, guess_date_format
+from .instrumentation import count_rows
+from .parser import THRESHOLD_WORDING
+from .profiles import build_summary_table, sketch_columns, summary_from_counts
+from .timeseries import describe_trend, roll_up_daily_totals
+
+# Files bigger than this are analysed chunk by chunk instead of being loaded whole
+STREAMING_THRESHOLD_MB = float(os.environ.get("BI_STREAMING_THRESHOLD_MB", 500))
+STREAMING_CHUNK_ROWS = int(os.environ.get("BI_STREAMING_CHUNK_ROWS", 200_000))
+# Big uploads are written here so rescans read from disk (empty means the system temp folder)
+STREAMING_SPILL_DIR = os.environ.get("BI_STREAMING_SPILL_DIR") or None
+# Past this many distinct values we stop keeping exact counts for a column during the scan
+STREAMING_MAX_TRACKED_VALUES = 10_000
+STREAMING_SCATTER_POINTS = 5000
+STREAMING_QUANTILE_BINS = 4096
+STREAMING_QUANTILE_COLLECT_LIMIT = 1_000_000
+# numpy's bin-width rules that can be worked out from the load-pass stats plus a rescan or two.
+# doane and stone need every value at once, so a streamed file can't use them
+STREAMING_HISTOGRAM_RULES = ["auto", "fd", "scott", "sturges", "sqrt", "rice"]
+
+def spill_to_disk(raw_bytes):
+    """Write an upload to a temp file and return its path, so nothing has to keep the bytes"""
+    with tempfile.NamedTemporaryFile(prefix="bi-upload-", suffix=".csv", dir=STREAMING_SPILL_DIR, delete=False) as spill_file:
+        spill_file.write(raw_bytes)
+    return spill_file.name
+
+def remove_spill_file(path):
+    with contextlib.suppress(OSError):
+        os.remove(path)
+
+def compare_to_threshold(values, operator, threshold):
+    """Boolean mask for a threshold comparison, or an inclusive (low, high) range"""
+    if operator == "between":
+        low, high = threshold
+        return (values >= low) & (values <= high)
+    if operator == "<":
+        return values < threshold
+    if operator == "<=":
+        return values <= threshold
+    if operator == ">":
+        return values > threshold
+    if operator == ">=":
+        return values >= threshold
+    raise ValueError(f"Unknown comparison '{operator}'")
+
+def combine_daily_totals(partials):
+    """Merge per-chunk daily count/sum/min/max frames into one row per day"""
+    combined = pd.concat(partials)
+    combine = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+    return combined.groupby(level=0).agg({name: combine[name] for name in combined.columns})
+
+def merge_group_partials(totals, partial):
+    """Fold one chunk's per-group sum/count/min/max into the running totals"""
+    if totals is None:
+        return partial
+    combined = pd.concat([totals, partial])
+    combine = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+    return combined.groupby(level=list(range(combined.index.nlevels))).agg(
+        {column: combine[column[1]] for column in combined.columns}
+    )
+
+class ChunkScan:
+    """One cacheable rescan: fold every chunk into a running state, then finish it off.
+    
+    Scans are plain data so several of them can share a single pass over the file,
+    which is what batch mode does.
+    """
+
+    def __init__(self, cache_key, columns, start, absorb, finish=None):
+        self.cache_key = cache_key
+        self.columns = list(columns)
+        # start builds a fresh state, absorb(state, chunk) returns the updated one
+        self.start = start
+        self.absorb = absorb
+        self.finish = finish or (lambda state: state)
+
+class StreamingCsvDataset:
+    """A CSV that's too big for memory, summarised one chunk at a time.
+    
+    A single pass at load time builds per-column aggregates (counts, sums, min/max,
+    value counts for categoricals and group-by partials). Anything those can't answer
+    is worked out by a chunked rescan, so peak memory depends on the chunk size and
+    never on the file size.
+    """
+
+    def __init__(self, source, chunk_rows=STREAMING_CHUNK_ROWS, fingerprint=None, delete_source=False):
+        # source is either a path on disk or the raw bytes of an upload
+        self.source = source
+        if delete_source:
+            # A spilled upload goes away along with the dataset
+            weakref.finalize(self, remove_spill_file, source)
+        self.chunk_rows = chunk_rows
+        self.fingerprint = fingerprint
+        self.column_types = {}
+        self.column_names = []
+        self.raw_positions = {}
+        self.date_formats = {}
+        self.row_count = 0
+        self.numeric_stats = {}
+        self.value_counts = {}
+        self.group_partials = {}
+        self.failed_scans = {}
+        self.preview_frame = None
+        self.derived = {}
+        self.derived_bytes = 0
+        self.derived_lock = threading.RLock()
+        self.building = {}
+        self.build_aggregates()
+
+    @property
+    def columns(self):
+        return pd.Index(self.column_names)
+
+    def __len__(self):
+        return self.row_count
+
+    def cached(self, key, builder):
+        """Same memoisation hook as TypedDataset - rescans are expensive, so only do each once"""
+        return build_cached(self, key, builder)
+
+    def preview(self, row_count=10):
+        return self.preview_frame.head(row_count).copy()
+
+    def distinct_values(self, column_name):
+        counts = self.value_counts.get(column_name)
+        if counts is None:
+            return self.preview_frame[column_name].dropna().unique()
+        return counts.index.values
+
+    def memory_report(self):
+        """Load-pass aggregates against the file's size, plus whatever rescans have cached since"""
+        def measure():
+            aggregate_bytes = estimate_memory_footprint(self.preview_frame)
+            aggregate_bytes += sum(int(counts.memory_usage(deep=True)) for counts in self.value_counts.values() if counts is not None)
+            aggregate_bytes += sum(estimate_memory_footprint(partial) for partial in self.group_partials.values())
+            file_bytes = os.path.getsize(self.source) if isinstance(self.source, str) else len(self.source)
+            return aggregate_bytes, file_bytes
+        aggregate_bytes, file_bytes = self.cached("aggregate_bytes", measure)
+        # An upload's bytes stay in memory for the rescans, a server file stays on disk
+        source_bytes = 0 if isinstance(self.source, str) else file_bytes
+        return {
+            "typed_bytes": aggregate_bytes,
+            "string_bytes": file_bytes,
+            "saved_bytes": file_bytes - aggregate_bytes,
+            "derived_bytes": self.derived_bytes,
+            "resident_bytes": aggregate_bytes + source_bytes + self.derived_bytes,
+        }
+
+    def read_raw_chunks(self, usecols=None):
+        handle = self.source if isinstance(self.source, str) else io.BytesIO(self.source)
+        return pd.read_csv(handle, chunksize=self.chunk_rows, usecols=usecols)
+
+    def prepare_chunk(self, raw_chunk, column_names):
+        """Give a raw chunk the same clean names and types as the first one had"""
+        raw_chunk.columns = column_names
+        chunk = process_uploaded_data(add_calculated_columns(raw_chunk), copy=False)
+        for col in chunk.columns:
+            col_type = self.column_types.get(col)
+            if col_type == 'numerical' and not pd.api.types.is_numeric_dtype(chunk[col]):
+                chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+            elif col_type == 'datetime' and not pd.api.types.is_datetime64_any_dtype(chunk[col]):
+                chunk[col] = coerce_to_datetime(chunk[col], self.date_formats.get(col))
+            elif col_type in ['categorical', 'binary', 'text'] and chunk[col].dtype != 'object':
+                # pandas guesses dtypes per chunk, so keep labels as strings everywhere
+                chunk[col] = chunk[col].astype(str).where(chunk[col].notna())
+        return chunk
+
+    def iter_chunks(self, needed_columns=None):
+        """Rescan the file, reading only the raw columns we need when we can get away with it"""
+        raw_names = list(self.raw_positions)
+        usecols = None
+        if needed_columns is not None and all(col in self.raw_positions for col in needed_columns):
+            raw_names = [col for col in self.raw_positions if col in set(needed_columns)]
+            usecols = [self.raw_positions[col] for col in raw_names]
+        for raw_chunk in self.read_raw_chunks(usecols):
+            count_rows(len(raw_chunk))
+            chunk = self.prepare_chunk(raw_chunk, raw_names)
+            yield chunk if needed_columns is None else chunk[list(needed_columns)]
+
+    def build_aggregates(self):
+        """One pass over the file to collect everything the common questions need"""
+        for raw_chunk in self.read_raw_chunks():
+            count_rows(len(raw_chunk))
+            if self.preview_frame is None:
+                raw_names = list(sanitize_column_headers(raw_chunk.head(0)).columns)
+                self.raw_positions = {col: position for position, col in enumerate(raw_names)}
+                first_chunk = process_uploaded_data(add_calculated_columns(raw_chunk.set_axis(raw_names, axis=1)), copy=False)
+                self.column_types = figure_out_column_types(first_chunk)
+                self.column_names = list(first_chunk.columns)
+                for col, col_type in self.column_types.items():
+                    if col_type == 'datetime' and not pd.api.types.is_datetime64_any_dtype(first_chunk[col]):
+                        self.date_formats[col] = guess_date_format(first_chunk[col].dropna().values[:50])
+            chunk = self.prepare_chunk(raw_chunk, list(self.raw_positions))
+            if self.preview_frame is None:
+                self.preview_frame = chunk.head(100).copy()
+            self.absorb_chunk(chunk)
+
+    def absorb_chunk(self, chunk):
+        self.row_count += len(chunk)
+        numeric_columns = [c for c, t in self.column_types.items() if t == 'numerical']
+        
+        for col in numeric_columns:
+            values = chunk[col]
+            stats = self.numeric_stats.setdefault(
+                col, {"count": 0, "null_count": 0, "sum": 0.0, "min": np.nan, "max": np.nan}
+            )
+            valid_count = int(values.notna().sum())
+            stats["count"] += valid_count
+            stats["null_count"] += len(values) - valid_count
+            if valid_count:
+                stats["sum"] += float(values.sum())
+                stats["min"] = np.nanmin([stats["min"], values.min()])
+                stats["max"] = np.nanmax([stats["max"], values.max()])
+        
+        for col, col_type in self.column_types.items():
+            if col_type not in ["categorical", "binary"]:
+                continue
+            if col in self.value_counts and self.value_counts[col] is None:
+                continue
+            chunk_counts = chunk[col].value_counts()
+            merged_counts = self.value_counts[col].add(chunk_counts, fill_value=0) if col in self.value_counts else chunk_counts
+            if len(merged_counts) > STREAMING_MAX_TRACKED_VALUES:
+                # Too many distinct values to track exactly - rescans will handle this one
+                self.value_counts[col] = None
+                self.group_partials.pop(col, None)
+                continue
+            self.value_counts[col] = merged_counts
+            
+            if numeric_columns:
+                chunk_partial = chunk.groupby(col)[numeric_columns].agg(['sum', 'count', 'min', 'max'])
+                self.group_partials[col] = merge_group_partials(self.group_partials.get(col), chunk_partial)
+
+    def run_scan(self, scan):
+        def build():
+            # A fused pass may already have found that this scan can't work
+            if scan.cache_key in self.failed_scans:
+                raise self.failed_scans[scan.cache_key]
+            results, errors = self.run_scans_together([scan])
+            if errors:
+                raise errors[scan.cache_key]
+            return results[scan.cache_key]
+        return self.cached(scan.cache_key, build)
+
+    def run_scans_together(self, scans):
+        """Several rescans in one pass over the file, reading each needed column once.
+        
+        Returns (results, errors) keyed by scan. A scan that raises is dropped from
+        the rest of the pass with its error kept, so the others still finish.
+        """
+        needed_columns = list(dict.fromkeys(col for scan in scans for col in scan.columns))
+        states = {}
+        errors = {}
+
+        def attempt(scan, step):
+            try:
+                states[scan.cache_key] = step()
+            except Exception as error:
+                errors[scan.cache_key] = error
+        
+        for scan in scans:
+            attempt(scan, scan.start)
+        for chunk in self.iter_chunks(needed_columns):
+            for scan in scans:
+                if scan.cache_key not in errors:
+                    attempt(scan, lambda: scan.absorb(states[scan.cache_key], chunk))
+        for scan in scans:
+            if scan.cache_key not in errors:
+                attempt(scan, lambda: scan.finish(states[scan.cache_key]))
+        return {key: state for key, state in states.items() if key not in errors}, errors
+
+    def prefetch(self, scans):
+        """Run whichever of these scans aren't cached yet, all in a single pass"""
+        with self.derived_lock:
+            pending = {
+                scan.cache_key: scan for scan in scans
+                if scan.cache_key not in self.derived and scan.cache_key not in self.failed_scans
+            }
+        if not pending:
+            return 0
+        results, errors = self.run_scans_together(list(pending.values()))
+        with self.derived_lock:
+            for key, result in results.items():
+                if key not in self.derived:
+                    self.derived[key] = result
+                    self.derived_bytes += estimate_derived_bytes(result, owner=self)
+            # Each failure is reported by its own question when it asks for the scan
+            self.failed_scans.update(errors)
+        return len(pending)
+
+    def category_counts_scan(self, column_name):
+        def absorb(totals, chunk):
+            chunk_counts = chunk[column_name].value_counts()
+            return chunk_counts if totals is None else totals.add(chunk_counts, fill_value=0)
+        
+        def finish(totals):
+            return totals.sort_values(ascending=False) if totals is not None else pd.Series(dtype='int64')
+        return ChunkScan(("category_counts", column_name), [column_name], lambda: None, absorb, finish)
+
+    def category_counts(self, column_name):
+        """Exact value counts for a column, from the load-time pass or a rescan"""
+        counts = self.value_counts.get(column_name)
+        if counts is not None:
+            return counts.sort_values(ascending=False)
+        return self.run_scan(self.category_counts_scan(column_name))
+
+    def count_matching_scan(self, column_name, operator, threshold):
+        return ChunkScan(
+            ("count_matching", column_name, operator, threshold),
+            [column_name],
+            lambda: 0,
+            lambda matched, chunk: matched + int(compare_to_threshold(chunk[column_name], operator, threshold).sum())
+        )
+
+    def count_matching(self, column_name, operator, threshold):
+        return self.run_scan(self.count_matching_scan(column_name, operator, threshold))
+
+    def group_sums_scan(self, key_columns, value_column):
+        def absorb(totals, chunk):
+            partial = chunk.groupby(key_columns)[[value_column]].agg(['sum', 'count', 'min', 'max'])
+            return merge_group_partials(totals, partial)
+        return ChunkScan(
+            ("group_partials", tuple(key_columns), value_column), key_columns + [value_column], lambda: None, absorb
+        )
+
+    def group_sums(self, key_columns, value_column):
+        """Per-group sum, count, min and max of a value, from the load-time partials when we have them"""
+        if len(key_columns) == 1 and self.group_partials.get(key_columns[0]) is not None:
+            return self.group_partials[key_columns[0]]
+        return self.run_scan(self.group_sums_scan(key_columns, value_column))
+
+    def group_counts_scan(self, key_columns):
+        def absorb(totals, chunk):
+            partial = chunk.groupby(key_columns).size()
+            return partial if totals is None else totals.add(partial, fill_value=0)
+        return ChunkScan(("group_counts", tuple(key_columns)), key_columns, lambda: None, absorb)
+
+    def group_counts(self, key_columns):
+        return self.run_scan(self.group_counts_scan(key_columns))
+
+    def value_at_rank(self, column_name, rank):
+        """Exact k-th smallest value, by narrowing in on it with histogram passes"""
+        stats = self.numeric_stats[column_name]
+        cell_path = []
+        cell_low, cell_high = stats["min"], stats["max"]
+        rank_in_cell = rank
+        
+        def in_cell(values):
+            mask = np.ones(len(values), dtype=bool)
+            for edges, chosen_bin in cell_path:
+                bin_ids = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+                mask &= bin_ids == chosen_bin
+            return mask
+        
+        while True:
+            if cell_low == cell_high:
+                return cell_low
+            edges = np.linspace(cell_low, cell_high, STREAMING_QUANTILE_BINS + 1)
+            bin_counts = np.zeros(STREAMING_QUANTILE_BINS, dtype=np.int64)
+            for chunk in self.iter_chunks([column_name]):
+                values = chunk[column_name].dropna().to_numpy(dtype=float)
+                values = values[in_cell(values)]
+                bin_ids = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, STREAMING_QUANTILE_BINS - 1)
+                bin_counts += np.bincount(bin_ids, minlength=STREAMING_QUANTILE_BINS)
+            
+            cumulative = np.cumsum(bin_counts)
+            chosen_bin = int(np.searchsorted(cumulative, rank_in_cell, side='right'))
+            rank_in_cell -= int(cumulative[chosen_bin - 1]) if chosen_bin > 0 else 0
+            cell_path.append((edges, chosen_bin))
+            
+            if bin_counts[chosen_bin] <= STREAMING_QUANTILE_COLLECT_LIMIT:
+                collected = []
+                for chunk in self.iter_chunks([column_name]):
+                    values = chunk[column_name].dropna().to_numpy(dtype=float)
+                    collected.append(values[in_cell(values)])
+                return float(np.sort(np.concatenate(collected))[rank_in_cell])
+            
+            # Still too many values in this bin - zoom in on it and go round again
+            cell_low, cell_high = np.inf, -np.inf
+            for chunk in self.iter_chunks([column_name]):
+                values = chunk[column_name].dropna().to_numpy(dtype=float)
+                values = values[in_cell(values)]
+                if len(values):
+                    cell_low, cell_high = min(cell_low, values.min()), max(cell_high, values.max())
+
+    def median(self, column_name):
+        return self.quantile(column_name, 0.5)
+
+    def spread_scan(self, column_name):
+        """Count, mean and sum of squared deviations, merged chunk by chunk (Chan et al.)"""
+        def absorb(state, chunk):
+            values = chunk[column_name].dropna().to_numpy(dtype=float)
+            if not len(values):
+                return state
+            count, mean, squares = state
+            chunk_mean = values.mean()
+            chunk_squares = float(((values - chunk_mean) ** 2).sum())
+            total = count + len(values)
+            delta = chunk_mean - mean
+            return (
+                total,
+                mean + delta * len(values) / total,
+                squares + chunk_squares + delta ** 2 * count * len(values) / total,
+            )
+        return ChunkScan(("spread", column_name), [column_name], lambda: (0, 0.0, 0.0), absorb)
+
+    def std(self, column_name):
+        """Population standard deviation (ddof=0, like numpy's bin rules use)"""
+        count, _, squares = self.run_scan(self.spread_scan(column_name))
+        return float(np.sqrt(squares / count)) if count else np.nan
+
+    def histogram_bin_count(self, column_name, bins):
+        """The number of equal-width bins numpy's named rule would pick, without holding the values"""
+        if not isinstance(bins, str):
+            return bins
+        if bins not in STREAMING_HISTOGRAM_RULES:
+            raise ValueError(
+                f"The '{bins}' bin rule needs the whole column in memory, which this file is too big for. "
+                f"Use a number of bins or one of: {', '.join(STREAMING_HISTOGRAM_RULES)}."
+            )
+        stats = self.numeric_stats[column_name]
+        count, value_range = stats["count"], stats["max"] - stats["min"]
+        if count == 0 or not value_range > 0:
+            return 1
+        # Same widths as np.histogram_bin_edges
+        sturges_width = value_range / (np.log2(count) + 1)
+        if bins == "sturges":
+            width = sturges_width
+        elif bins == "sqrt":
+            width = value_range / np.sqrt(count)
+        elif bins == "rice":
+            width = value_range / (2 * count ** (1 / 3))
+        elif bins == "scott":
+            width = (24 * np.pi ** 0.5 / count) ** (1 / 3) * self.std(column_name)
+        else:
+            fd_width = 2 * (self.quantile(column_name, 0.75) - self.quantile(column_name, 0.25)) * count ** (-1 / 3)
+            if bins == "fd":
+                width = fd_width
+            else:
+                # numpy 2.3's auto: fd, but never more than twice the sqrt rule's bins
+                width = min(max(fd_width, value_range / np.sqrt(count) / 2), sturges_width)
+        return int(np.ceil(value_range / width)) if width else 1
+
+    def histogram_scan(self, column_name, bins=DEFAULT_HISTOGRAM_BINS):
+        stats = self.numeric_stats[column_name]
+        bin_count = self.histogram_bin_count(column_name, bins)
+        edges = np.histogram_bin_edges([stats["min"], stats["max"]], bins=min(bin_count, 1000))
+        
+        def absorb(counts, chunk):
+            chunk_counts, _ = np.histogram(chunk[column_name].dropna(), bins=edges)
+            return counts + chunk_counts
+        return ChunkScan(
+            ("histogram", column_name, bins),
+            [column_name],
+            lambda: np.zeros(len(edges) - 1, dtype=np.int64),
+            absorb,
+            lambda counts: (edges, counts)
+        )
+
+    def histogram(self, column_name, bins=DEFAULT_HISTOGRAM_BINS):
+        return self.run_scan(self.histogram_scan(column_name, bins))
+
+    def daily_totals_scan(self, time_column, value_column=None):
+        """Per-day count (and sum/min/max of the value) - any coarser bucket is built from these"""
+        def absorb(partials, chunk):
+            days = chunk[time_column].dt.floor('D')
+            if value_column is None:
+                partials.append(days.value_counts().rename("count").to_frame())
+            else:
+                partials.append(chunk[value_column].groupby(days).agg(['sum', 'count', 'min', 'max']))
+            # Fold the partials together now and then so memory stays at one row per day
+            if len(partials) >= 16:
+                partials[:] = [combine_daily_totals(partials)]
+            return partials
+        
+        def finish(partials):
+            if not partials:
+                return pd.DataFrame(columns=["count"])
+            return combine_daily_totals(partials).sort_index()
+        columns = [time_column, value_column] if value_column else [time_column]
+        return ChunkScan(("daily_totals", time_column, value_column), columns, list, absorb, finish)
+
+    def daily_totals(self, time_column, value_column=None):
+        return self.run_scan(self.daily_totals_scan(time_column, value_column))
+
+    def scatter_sample_scan(self, x_column, y_column, point_count=STREAMING_SCATTER_POINTS):
+        """A uniform random sample of rows, kept by giving every row a random key"""
+        def absorb(state, chunk):
+            rng, kept = state
+            chunk = chunk[[x_column, y_column]].assign(sample_key=rng.random(len(chunk)))
+            kept = chunk if kept is None else pd.concat([kept, chunk])
+            return rng, kept.nsmallest(point_count, 'sample_key')
+        
+        def finish(state):
+            _, kept = state
+            return kept.drop(columns='sample_key') if kept is not None else pd.DataFrame(columns=[x_column, y_column])
+        return ChunkScan(
+            ("scatter_sample", x_column, y_column, point_count),
+            [x_column, y_column],
+            lambda: (np.random.default_rng(0), None),
+            absorb,
+            finish
+        )
+
+    def scatter_sample(self, x_column, y_column, point_count=STREAMING_SCATTER_POINTS):
+        return self.run_scan(self.scatter_sample_scan(x_column, y_column, point_count))
+
+    def quantile(self, column_name, q):
+        """Exact quantile with the same linear interpolation pandas uses"""
+        def compute():
+            valid_count = self.numeric_stats[column_name]["count"]
+            if valid_count == 0:
+                return np.nan
+            position = q * (valid_count - 1)
+            lower = self.value_at_rank(column_name, int(np.floor(position)))
+            upper = lower if position == np.floor(position) else self.value_at_rank(column_name, int(np.ceil(position)))
+            return lower + (upper - lower) * (position - np.floor(position))
+        return self.cached(("quantile", column_name, q), compute)
+
+    def summary(self, exact=False):
+        """describe()-style table: tracked counts where we have them, one sketch pass for the rest"""
+        def compute():
+            column_summaries = {}
+            sketch_kinds = {}
+            for col in self.column_names:
+                col_type = self.column_types.get(col)
+                if col_type == 'numerical':
+                    sketch_kinds[col] = 'numeric'
+                elif col_type == 'datetime':
+                    sketch_kinds[col] = 'datetime'
+                elif self.value_counts.get(col) is not None or exact:
+                    column_summaries[col] = summary_from_counts(self.category_counts(col))
+                else:
+                    sketch_kinds[col] = 'values'
+            column_summaries.update(sketch_columns(self.iter_chunks(list(sketch_kinds)), sketch_kinds))
+            
+            if exact:
+                # Swap the sketched quartiles for exact ones - several passes per column
+                for col, kind in sketch_kinds.items():
+                    if kind == 'numeric':
+                        for q in [0.25, 0.5, 0.75]:
+                            column_summaries[col][f"{int(q * 100)}%"] = self.quantile(col, q)
+            return build_summary_table(column_summaries, self.column_names)
+        return self.cached(("summary", exact), compute)
+
+def execute_streaming_request(action_info, dataset):
+    """Answer a parsed query from the streaming aggregates, rescanning the file when needed"""
+    action_type = action_info[0]
+    
+    try:
+        if action_type == "calculate_statistic":
+            column_name, stat_type = action_info[1], action_info[2]
+            if not column_name:
+                return "I couldn't identify which column to analyze.", None, None
+            if column_name not in dataset.numeric_stats:
+                return f"'{column_name}' doesn't look like a numeric column.", None, None
+            
+            stats = dataset.numeric_stats[column_name]
+            if stat_type == "mean":
+                result = stats["sum"] / stats["count"] if stats["count"] else np.nan
+                return f"The average value in '{column_name}' is {result:.2f}", None, None
+            elif stat_type == "sum":
+                return f"The total sum of '{column_name}' is {stats['sum']:.0f}", None, None
+            elif stat_type == "max":
+                return f"The maximum value in '{column_name}' is {stats['max']:.2f}", None, None
+            elif stat_type == "min":
+                return f"The minimum value in '{column_name}' is {stats['min']:.2f}", None, None
+            elif stat_type == "median":
+                result = dataset.median(column_name)
+                return f"The median value in '{column_name}' is {result:.2f}", None, None
+        
+        elif action_type == "filter_and_count":
+            column_name, operator, threshold = action_info[1], action_info[2], action_info[3]
+            if not column_name:
+                return "I couldn't identify which column to filter on.", None, None
+            
+            filtered_count = dataset.count_matching(column_name, operator, threshold)
+            return f"There are {filtered_count} records where '{column_name}' is {THRESHOLD_WORDING[operator]} {threshold}", None, None
+        
+        elif action_type == "filter_count_range":
+            column_name, low, high = action_info[1], action_info[2], action_info[3]
+            if not column_name:
+                return "I couldn't identify which column to filter on.", None, None
+            
+            filtered_count = dataset.count_matching(column_name, "between", (low, high))
+            return f"There are {filtered_count} records where '{column_name}' is between {low} and {high}", None, None
+        
+        elif action_type == "filter_count_category":
+            column_name, target_value = action_info[1], action_info[2]
+            counts = dataset.category_counts(column_name)
+            matching_rows = int(counts[counts.index.astype(str).str.lower() == target_value.lower()].sum())
+            return f"There are {matching_rows} records where '{column_name}' equals '{target_value}'", None, None
+        
+        elif action_type == "count_all_rows":
+            return f"Your dataset contains {len(dataset)} total records", None, None
+        
+        elif action_type == "group_and_analyze":
+            group_col, value_col = action_info[1], action_info[2]
+            aggregate = action_info[3] if len(action_info) > 3 else "mean"
+            top_n = action_info[4] if len(action_info) > 4 else None
+            if not group_col:
+                return "I couldn't determine which column to group by.", None, None
+            
+            key_columns = list(group_col) if isinstance(group_col, tuple) else [group_col]
+            if value_col:
+                partials = dataset.group_sums(key_columns, value_col)
+                sums = partials[(value_col, 'sum')]
+                counts = partials[(value_col, 'count')]
+                aggregates = {
+                    "count": counts.to_numpy(dtype=np.int64),
+                    "sum": sums.to_numpy(),
+                    "mean": (sums / counts.where(counts > 0)).to_numpy(),
+                    "min": partials[(value_col, 'min')].to_numpy(),
+                    "max": partials[(value_col, 'max')].to_numpy(),
+                }
+                key_frame = sums.index.to_frame(index=False)
+            elif len(key_columns) == 1:
+                counts = dataset.category_counts(group_col)
+                key_frame = pd.DataFrame({group_col: counts.index})
+                aggregates = {"count": counts.to_numpy(dtype=np.int64)}
+            else:
+                counts = dataset.group_counts(key_columns)
+                key_frame = counts.index.to_frame(index=False)
+                aggregates = {"count": counts.to_numpy(dtype=np.int64)}
+            if value_col and aggregate not in aggregates:
+                # Per-group medians need every value, and the partials only keep running totals
+                response_text, result_table, fig = describe_group_result(key_frame, aggregates, group_col, value_col, "mean", top_n)
+                return f"{response_text} (medians aren't available while streaming, so this is the average)", result_table, fig
+            return describe_group_result(key_frame, aggregates, group_col, value_col, aggregate, top_n)
+        
+        elif action_type in ["create_bar_chart", "create_pie_chart"]:
+            column_name = action_info[1]
+            if not column_name:
+                return "I couldn't determine which column to chart.", None, None
+            
+            value_counts = dataset.category_counts(column_name)
+            if action_type == "create_bar_chart":
+                fig = build_category_figure(value_counts, column_name, "bar")
+                return f"Bar chart showing the distribution of '{column_name}'", None, fig
+            
+            fig = build_category_figure(value_counts, column_name, "pie")
+            return f"Pie chart showing the composition of '{column_name}'", None, fig
+        
+        elif action_type == "create_histogram":
+            column_name = action_info[1]
+            bins = action_info[2] if len(action_info) > 2 else DEFAULT_HISTOGRAM_BINS
+            if not column_name:
+                return "I couldn't determine which column to analyze.", None, None
+            if column_name not in dataset.numeric_stats:
+                return f"'{column_name}' doesn't look like a numeric column.", None, None
+            
+            try:
+                edges, counts = dataset.histogram(column_name, bins)
+            except ValueError as error:
+                return str(error), None, None
+            fig = build_histogram_figure(
+                edges,
+                counts,
+                f"Distribution of {column_name.replace('_', ' ').title()}",
+                column_name.replace('_', ' ').title()
+            )
+            return f"Histogram showing the distribution of '{column_name}'", None, fig
+        
+        elif action_type == "create_line_chart":
+            time_col, value_col = action_info[1], action_info[2]
+            aggregate = action_info[3] if len(action_info) > 3 else "mean"
+            granularity = action_info[4] if len(action_info) > 4 else "auto"
+            if not time_col:
+                return "I need a date column to draw a line chart.", None, None
+            if dataset.column_types.get(time_col) != 'datetime':
+                return f"'{time_col}' doesn't look like a date column.", None, None
+            
+            granularity, bucket_starts, aggregates = roll_up_daily_totals(dataset.daily_totals(time_col, value_col), granularity)
+            if value_col and aggregate not in aggregates:
+                # Medians need every value, and one pass only keeps per-day totals
+                response_text, result_table, fig = describe_trend(granularity, bucket_starts, aggregates, time_col, value_col, "mean")
+                return f"{response_text} (medians aren't available while streaming, so this is the average)", result_table, fig
+            return describe_trend(granularity, bucket_starts, aggregates, time_col, value_col, aggregate)
+        
+        elif action_type == "create_scatter_plot":
+            col1, col2 = action_info[1], action_info[2]
+            if not col1 or not col2:
+                return "I need two numeric columns for a scatter plot.", None, None
+            
+            sampled_rows = dataset.scatter_sample(col1, col2)
+            fig = build_scatter_figure(
+                sampled_rows[col1],
+                sampled_rows[col2],
+                f"Relationship between {col1.replace('_', ' ').title()} and {col2.replace('_', ' ').title()} (sample of {len(sampled_rows)} rows)",
+                col1.replace('_', ' ').title(),
+                col2.replace('_', ' ').title()
+            )
+            return f"Scatter plot showing the relationship between '{col1}' and '{col2}'", None, fig
+        
+        elif action_type == "generate_summary":
+            exact = action_info[1] if len(action_info) > 1 else False
+            if exact:
+                return "Here's an exact summary of your dataset (this took a few extra passes over the file):", dataset.summary(exact=True), None
+            return "Here's a summary of your dataset (quartiles and distinct counts may be approximate):", dataset.summary(), None
+        
+        else:
+            return "I'm not sure how to handle that request yet.", None, None
+    
+    except Exception as error:
+        return f"I encountered an error while processing your request: {str(error)}", None, None
@@ -0,0 +1,141 @@
+"""Date columns sorted once per dataset, and trends as bucketed reductions on top.
+
+    granularity, bucket_starts, aggregates = time_buckets(dataset, "order_date", "sales")
+
+A line chart never plots raw rows. The rows are put in time order once, cut into
+day/week/month/quarter buckets with a binary search and every bucket is reduced
+to one number per aggregate. Unless the question names a bucket size, it's picked
+from the date range so the chart stays readable.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .charts import build_line_figure
+from .dataset import GROUP_AGGREGATE_LABELS, reduce_groups
+
+# Pandas period code and rough length in days of each bucket size, finest first
+TIME_GRANULARITIES = {"day": ("D", 1), "week": ("W", 7), "month": ("M", 30.44), "quarter": ("Q", 91.31)}
+# Automatic bucketing takes the finest size that keeps a trend under this many points
+TREND_TARGET_BUCKETS = 400
+
+def as_naive_datetimes(dates):
+    """datetime64[ns] values, with any timezone dropped (wall-clock time is what gets bucketed)"""
+    if isinstance(dates.dtype, pd.DatetimeTZDtype):
+        dates = dates.dt.tz_localize(None)
+    return np.asarray(dates, dtype='datetime64[ns]')
+
+class SortedTimeIndex:
+    """A date column's rows in time order, rows without a date left out.
+    
+    order holds row positions sorted by time and times the dates in that order,
+    so bucketing the rows is one searchsorted over bucket start times.
+    """
+
+    def __init__(self, dates):
+        values = as_naive_datetimes(dates)
+        dated_rows = np.flatnonzero(~np.isnat(values))
+        self.order = dated_rows[np.argsort(values[dated_rows], kind='stable')]
+        self.times = values[self.order]
+
+    def __len__(self):
+        return len(self.times)
+
+    def bucket_starts(self, granularity):
+        """Start time of every bucket from the first date to the last, empty ones included"""
+        freq = TIME_GRANULARITIES[granularity][0]
+        periods = pd.period_range(pd.Timestamp(self.times[0]), pd.Timestamp(self.times[-1]), freq=freq)
+        return pd.DatetimeIndex(np.asarray(periods.start_time, dtype='datetime64[ns]'))
+
+    def bucket_codes(self, bucket_starts):
+        """Bucket number of each row, in sorted order"""
+        return np.searchsorted(bucket_starts.values, self.times, side='right') - 1
+
+def get_time_index(dataset, time_column):
+    """The column's sorted time index, parsed and sorted the first time anything asks"""
+    return dataset.cached(("time_index", time_column), lambda: SortedTimeIndex(dataset.datetimes(time_column)))
+
+def choose_granularity(first_time, last_time, target_buckets=TREND_TARGET_BUCKETS):
+    """The finest bucket size that spreads the date range over at most target_buckets points"""
+    span_days = (last_time - first_time) / np.timedelta64(1, 'D')
+    for granularity, (_, bucket_days) in TIME_GRANULARITIES.items():
+        if span_days / bucket_days < target_buckets:
+            return granularity
+    return "quarter"
+
+def time_buckets(dataset, time_column, value_column=None, granularity="auto"):
+    """Every aggregate of value_column per time bucket: (granularity, bucket starts, aggregates).
+    
+    Without a value column the only aggregate is the row count per bucket.
+    """
+    time_index = get_time_index(dataset, time_column)
+    if len(time_index) == 0:
+        return ("day" if granularity == "auto" else granularity), pd.DatetimeIndex([]), {"count": np.array([], dtype=np.int64)}
+    if granularity == "auto":
+        granularity = choose_granularity(time_index.times[0], time_index.times[-1])
+
+    def build():
+        bucket_starts = time_index.bucket_starts(granularity)
+        codes = time_index.bucket_codes(bucket_starts)
+        if value_column is None:
+            return bucket_starts, {"count": np.bincount(codes, minlength=len(bucket_starts))}
+        values = np.asarray(dataset.numeric(value_column), dtype=float)[time_index.order]
+        return bucket_starts, reduce_groups(codes, len(bucket_starts), values)
+    bucket_starts, aggregates = dataset.cached(("time_buckets", time_column, value_column, granularity), build)
+    return granularity, bucket_starts, aggregates
+
+def roll_up_daily_totals(daily_totals, granularity="auto"):
+    """Same as time_buckets, but from per-day sum/count/min/max partials (no medians).
+    
+    Streaming datasets collect those partials in one pass; week, month and quarter
+    buckets are exact combinations of them.
+    """
+    if len(daily_totals) == 0:
+        return ("day" if granularity == "auto" else granularity), pd.DatetimeIndex([]), {"count": np.array([], dtype=np.int64)}
+    time_index = SortedTimeIndex(daily_totals.index.to_series())
+    if granularity == "auto":
+        granularity = choose_granularity(time_index.times[0], time_index.times[-1])
+    
+    bucket_starts = time_index.bucket_starts(granularity)
+    codes = time_index.bucket_codes(bucket_starts)
+    combine = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+    bucket_totals = daily_totals.iloc[time_index.order].groupby(codes).agg(
+        {name: combine[name] for name in daily_totals.columns}
+    ).reindex(range(len(bucket_starts)))
+    
+    counts = bucket_totals["count"].fillna(0).to_numpy(dtype=np.int64)
+    aggregates = {"count": counts}
+    if "sum" in bucket_totals:
+        sums = bucket_totals["sum"].fillna(0).to_numpy(dtype=float)
+        aggregates.update({
+            "sum": sums,
+            "mean": np.where(counts > 0, sums / np.maximum(counts, 1), np.nan),
+            "min": bucket_totals["min"].to_numpy(dtype=float),
+            "max": bucket_totals["max"].to_numpy(dtype=float),
+        })
+    return granularity, bucket_starts, aggregates
+
+def describe_trend(granularity, bucket_starts, aggregates, time_column, value_column=None, aggregate="mean"):
+    """Response text, per-bucket table and line chart for a bucketed trend"""
+    if len(bucket_starts) == 0:
+        return f"I couldn't find any dates in '{time_column}' to draw a trend.", None, None
+    
+    time_label = time_column.replace('_', ' ').title()
+    if value_column is None or aggregate == "count":
+        column_name, values = "records", aggregates["count"]
+        value_label = "Records"
+        heading = f"Line chart showing the number of records per {granularity} over '{time_column}'"
+        title = f"Records Over Time (per {granularity})"
+    else:
+        aggregate = aggregate if aggregate in aggregates else "mean"
+        short_label, long_label = GROUP_AGGREGATE_LABELS[aggregate]
+        column_name, values = f"{short_label}_{value_column}", aggregates[aggregate]
+        value_label = value_column.replace('_', ' ').title()
+        heading = f"Line chart showing the {long_label.lower()} '{value_column}' per {granularity} over '{time_column}'"
+        title = f"{value_label} Over Time ({short_label} per {granularity})"
+    
+    result_table = pd.DataFrame({time_column: bucket_starts, column_name: values, "rows": aggregates["count"]})
+    # Buckets with no rows have no average, but a total or a count of zero is still a point
+    result_table = result_table.dropna(subset=[column_name]).reset_index(drop=True)
+    fig = build_line_figure(result_table[time_column], result_table[column_name], title, time_label, value_label)
+    return heading, result_table, fig
@@ -0,0 +1,98 @@
+"""Building the per-column numbers in the background while the user types their first question"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .dataset import DEFAULT_HISTOGRAM_BINS, TypedDataset
+from .lookup import get_column_index, get_value_index
+from .timeseries import get_time_index
+
+# Threads are enough here - pandas and numpy let go of the GIL for the heavy parts,
+# and the results have to end up in the same dataset object anyway
+WARMUP_WORKERS = int(os.environ.get("BI_WARMUP_WORKERS", min(4, os.cpu_count() or 1)))
+
+def warmup_tasks(dataset):
+    """(label, callable) for everything worth having ready before the first question"""
+    tasks = [("column names", lambda: get_column_index(dataset.columns))]
+    if isinstance(dataset, TypedDataset):
+        for col, col_type in dataset.column_types.items():
+            if col_type == "numerical":
+                # Sorted values stay lazy - only threshold questions need them
+                tasks.append((f"{col} profile", lambda col=col: dataset.profile(col)))
+                tasks.append((f"{col} histogram", lambda col=col: dataset.histogram(col, DEFAULT_HISTOGRAM_BINS)))
+            elif col_type in ["categorical", "binary"]:
+                tasks.append((f"{col} value counts", lambda col=col: dataset.category_counts(col)))
+            elif col_type == "datetime":
+                # Parsed and sorted once, ready for any trend over this column
+                tasks.append((f"{col} time index", lambda col=col: get_time_index(dataset, col)))
+    # Streaming datasets got their counts during the load pass, so only the lookups are left.
+    # The value index goes last - by then the columns it reads are mostly encoded already
+    tasks.append(("value lookup", lambda: get_value_index(dataset, dataset.column_types)))
+    return tasks
+
+class DatasetWarmup:
+    """Runs the warm-up tasks for one dataset on a small thread pool.
+    
+    Each result lands in the dataset's cache as soon as it's built, so a question
+    asked in the meantime uses whatever is ready and builds the rest itself
+    (waiting only if a worker is halfway through the very thing it needs).
+    """
+
+    def __init__(self, dataset, after=None, workers=WARMUP_WORKERS):
+        tasks = warmup_tasks(dataset)
+        self.total = len(tasks)
+        self.completed = 0
+        self.failed = []
+        self.after = list(after or [])
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        
+        self.pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="bi-warmup")
+        for label, task in tasks:
+            self.pool.submit(self.run_task, label, task)
+        # Lets the threads exit once the queue is drained, without waiting here
+        self.pool.shutdown(wait=False)
+
+    def run_task(self, label, task):
+        try:
+            task()
+        except Exception:
+            # Whatever broke will be tried again (and reported) when a question needs it
+            self.failed.append(label)
+        with self.lock:
+            self.completed += 1
+            all_done = self.completed == self.total
+        if all_done:
+            for follow_up in self.after:
+                try:
+                    follow_up()
+                except Exception:
+                    pass
+            self.finished_at = time.perf_counter()
+            self.finished.set()
+
+    def done(self):
+        return self.finished.is_set()
+
+    def wait(self, timeout=None):
+        return self.finished.wait(timeout)
+
+    def progress(self):
+        return self.completed / self.total if self.total else 1.0
+
+    def status(self):
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return {
+            "completed": self.completed,
+            "total": self.total,
+            "failed": list(self.failed),
+            "seconds": end - self.started_at,
+        }
+
+def start_warmup(dataset, after=None):
+    """Kick off the background warm-up for a dataset, or hand back the one already running"""
+    return dataset.cached(("warmup",), lambda: DatasetWarmup(dataset, after))
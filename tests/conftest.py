@@ -0,0 +1,14 @@
+import pytest
+
+from benchmarks.synthetic import generate_business_table, table_to_bytes
+from engine import load_dataset_bytes
+
+@pytest.fixture(scope="session")
+def orders_frame():
+    """A small seeded orders table with clean headers - the plain pandas side of every comparison"""
+    return generate_business_table(3000, seed=7, dirty_headers=False, missing_rate=0.05)
+
+@pytest.fixture(scope="session")
+def orders_dataset(orders_frame):
+    """The same table run through the whole ingestion pipeline"""
+    return load_dataset_bytes(table_to_bytes(orders_frame), "orders.csv")
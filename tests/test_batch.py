@@ -0,0 +1,20 @@
+from benchmarks.synthetic import table_to_bytes
+from engine import StreamingCsvDataset, run_batch
+
+def test_a_failing_scan_only_fails_its_own_question(orders_frame):
+    dataset = StreamingCsvDataset(table_to_bytes(orders_frame), chunk_rows=700)
+    passes = []
+    read_chunks = dataset.iter_chunks
+    dataset.iter_chunks = lambda needed_columns=None: passes.append(needed_columns) or read_chunks(needed_columns)
+    
+    report, _ = run_batch([
+        "how many orders have region over 5",
+        "how many orders have profit over 100",
+        "histogram of profit",
+    ], dataset)
+    
+    assert report["answer"][0].startswith("I encountered an error")
+    assert report["answer"][1] == f"There are {(orders_frame['profit'] > 100).sum()} records where 'profit' is above 100.0"
+    assert report["answer"][2].startswith("Histogram")
+    # Still one shared pass, and the failed scan isn't retried on its own
+    assert len(passes) == 1
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from engine import IngestionCache, QueryResultCache, TypedDataset, parse_natural_language_query, run_cached_query
+from engine.caching import estimate_result_bytes, normalize_action
+
+def answer_of_size(label, size_bytes):
+    return (label, pd.DataFrame({"value": range(size_bytes // 8)}), None)
+
+def test_query_cache_evicts_least_recently_used_by_bytes():
+    entry_bytes = estimate_result_bytes(*answer_of_size("a", 8000))
+    cache = QueryResultCache(memory_budget_mb=2.5 * entry_bytes / 1024 / 1024)
+    cache.put("a", answer_of_size("a", 8000))
+    cache.put("b", answer_of_size("b", 8000))
+    assert cache.get("a") is not None
+    cache.put("c", answer_of_size("c", 8000))
+    
+    # "b" was used least recently, so it's the one that had to go
+    assert cache.get("b") is None
+    assert cache.get("a")[0] == "a" and cache.get("c")[0] == "c"
+    assert cache.stats()["size_bytes"] == 2 * entry_bytes <= cache.memory_budget_bytes
+
+def test_query_cache_skips_answers_bigger_than_the_budget():
+    cache = QueryResultCache(memory_budget_mb=0.001)
+    cache.put("big", answer_of_size("big", 8000))
+    assert cache.get("big") is None
+    assert cache.stats()["entries"] == 0
+
+def test_normalized_actions_share_cache_entries():
+    assert normalize_action(("create_histogram", "age")) == normalize_action(("create_histogram", "age", 25))
+    assert normalize_action(("filter_and_count", "age", ">", 30)) == normalize_action(("filter_and_count", "age", ">", 30.0))
+    assert normalize_action(("group_and_analyze", "region", "sales")) != normalize_action(("group_and_analyze", "region", "sales", "sum"))
+
+def test_cached_answers_match_fresh_ones(orders_dataset):
+    cache = QueryResultCache()
+    for question in ["average profit by region", "how many orders have profit over 100", "give me a summary"]:
+        action = parse_natural_language_query(question, orders_dataset, orders_dataset.column_types)
+        fresh_text, fresh_table, _ = run_cached_query(action, orders_dataset)
+        run_cached_query(action, orders_dataset, cache=cache)
+        cached_text, cached_table, _ = run_cached_query(action, orders_dataset, cache=cache)
+        assert cached_text == fresh_text
+        if fresh_table is not None:
+            pd.testing.assert_frame_equal(cached_table, fresh_table)
+    assert cache.stats()["hits"] == 3
+
+def small_dataset(label, rows=2000):
+    frame = pd.DataFrame({"amount": np.arange(rows, dtype="float64")[::-1].copy(), "label": label})
+    return TypedDataset(frame, {"amount": "numerical", "label": "categorical"}, fingerprint=label)
+
+def test_ingestion_cache_only_evicts_datasets_nobody_holds():
+    datasets = {label: small_dataset(label) for label in "abc"}
+    entry_bytes = datasets["a"].memory_report()["resident_bytes"]
+    store = IngestionCache(memory_budget_mb=2.5 * entry_bytes / 1024 / 1024)
+    handle_a = store.acquire("a", datasets["a"])
+    second_a = store.acquire("a")
+    store.put("b", datasets["b"])
+    store.put("c", datasets["c"])
+    
+    # "a" is held twice, so the unreferenced "b" is what makes room for "c"
+    assert second_a.dataset is handle_a.dataset is datasets["a"]
+    assert store.get("b") is None and store.get("c") is datasets["c"]
+    assert store.stats()["references"] == 2
+    
+    handle_a.release()
+    assert store.stats()["in_use"] == 1
+    second_a.release()
+    store.put("b", datasets["b"])
+    # Once both handles are gone, "a" is the least recently used and goes first
+    assert store.get("a") is None
+    assert store.stats()["references"] == 0
+
+def test_ingestion_cache_counts_what_datasets_derive_after_storing():
+    dataset = small_dataset("derived")
+    store = IngestionCache()
+    handle = store.acquire("derived", dataset)
+    stored_bytes = store.stats()["size_bytes"]
+    
+    dataset.sorted_values("amount")
+    dataset.category_counts("label")
+    report = dataset.memory_report()
+    assert report["derived_bytes"] >= dataset.sorted_values("amount").nbytes
+    assert report["resident_bytes"] == report["typed_bytes"] + report["derived_bytes"]
+    assert store.stats()["size_bytes"] >= stored_bytes + dataset.sorted_values("amount").nbytes
+    handle.release()
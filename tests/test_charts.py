@@ -0,0 +1,94 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from engine.charts import (
+    LINE_TARGET_POINTS,
+    build_category_figure,
+    build_line_figure,
+    build_scatter_figure,
+    lttb_downsample,
+    top_categories_with_other,
+)
+
+def test_folded_slice_does_not_merge_with_a_real_other_category():
+    value_counts = pd.Series([50, 40, 30, 20, 10, 5], index=["a", "Other", "b", "c", "d", "e"], name="count")
+    chart_counts, folded = top_categories_with_other(value_counts, limit=4)
+    
+    assert folded
+    assert chart_counts.index.is_unique
+    assert chart_counts["Other"] == 40
+    assert chart_counts["Other (3 categories)"] == 20 + 10 + 5
+    assert chart_counts.sum() == value_counts.sum()
+
+def test_short_value_counts_are_left_alone():
+    value_counts = pd.Series([3, 2, 1], index=["x", "y", "z"])
+    chart_counts, folded = top_categories_with_other(value_counts, limit=4)
+    assert not folded and chart_counts is value_counts
+
+def test_category_figure_labels_every_slice_once():
+    value_counts = pd.Series(range(40, 0, -1), index=["Other"] + [f"region {i}" for i in range(39)])
+    figure = build_category_figure(value_counts, "region", "pie")
+    labels = list(figure["data"][0]["labels"])
+    assert len(labels) == len(set(labels))
+    assert "Other" in labels
+
+def reference_lttb(x_values, y_values, threshold):
+    """Steinarsson's original LTTB, one point at a time"""
+    every = (len(x_values) - 2) / (threshold - 2)
+    kept, previous = [0], 0
+    for bucket in range(threshold - 2):
+        average_start = math.floor((bucket + 1) * every) + 1
+        average_end = min(math.floor((bucket + 2) * every) + 1, len(x_values))
+        average_x = sum(x_values[average_start:average_end]) / (average_end - average_start)
+        average_y = sum(y_values[average_start:average_end]) / (average_end - average_start)
+        best_area, best = -1, None
+        for position in range(math.floor(bucket * every) + 1, math.floor((bucket + 1) * every) + 1):
+            area = abs((x_values[previous] - average_x) * (y_values[position] - y_values[previous])
+                       - (x_values[previous] - x_values[position]) * (average_y - y_values[previous]))
+            if area > best_area:
+                best_area, best = area, position
+        kept.append(best)
+        previous = best
+    kept.append(len(x_values) - 1)
+    return kept
+
+def test_lttb_keeps_the_endpoints_and_exactly_the_target_count():
+    rng = np.random.default_rng(3)
+    x_values = np.arange(10_000, dtype=float)
+    y_values = np.cumsum(rng.normal(size=10_000))
+    kept = lttb_downsample(x_values, y_values, 500)
+    
+    assert len(kept) == 500
+    assert kept[0] == 0 and kept[-1] == len(x_values) - 1
+    assert (np.diff(kept) > 0).all()
+    assert kept.tolist() == reference_lttb(x_values.tolist(), y_values.tolist(), 500)
+
+def test_lttb_keeps_a_lone_spike():
+    y_values = np.zeros(5000)
+    y_values[3217] = 100.0
+    assert 3217 in lttb_downsample(np.arange(5000), y_values, 50)
+
+def test_lttb_leaves_short_series_alone():
+    assert lttb_downsample(np.arange(10), np.arange(10), 20).tolist() == list(range(10))
+    assert lttb_downsample(np.arange(10), np.arange(10), 2).tolist() == list(range(10))
+
+def test_long_lines_are_reduced_and_dates_survive():
+    dates = pd.date_range("2020-01-01", periods=200_000, freq="min")
+    values = np.sin(np.arange(200_000) / 1000)
+    figure = build_line_figure(pd.Series(dates[::-1]), pd.Series(values[::-1]), "Trend", "When", "Value")
+    trace = figure["data"][0]
+    
+    assert len(trace["x"]) == LINE_TARGET_POINTS
+    # Sorted by time first, so the kept endpoints are the first and last dates
+    assert trace["x"][0] == dates[0] and trace["x"][-1] == dates[-1]
+    assert "downsampled from 200,000" in figure["layout"]["title"]["text"]
+
+def test_huge_scatters_become_a_density_grid_that_counts_every_point():
+    rng = np.random.default_rng(5)
+    x_values, y_values = rng.normal(size=150_000), rng.normal(size=150_000)
+    figure = build_scatter_figure(x_values, y_values, "Spread", "x", "y")
+    trace = figure["data"][0]
+    assert trace["type"] == "heatmap"
+    assert np.nansum(trace["z"]) == 150_000
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from engine import answer_question
+from engine.dataset import EncodedColumn, reduce_groups
+
+def test_numeric_columns_are_stored_as_numbers(orders_frame, orders_dataset):
+    for col in ["sales_amount", "quantity", "unit_price", "discount", "profit"]:
+        assert orders_dataset.column_types[col] == "numerical"
+        assert pd.api.types.is_numeric_dtype(orders_dataset.frame[col])
+        np.testing.assert_allclose(orders_dataset.numeric(col), orders_frame[col], equal_nan=True)
+
+def test_date_columns_are_parsed_once_at_load(orders_frame, orders_dataset):
+    expected_formats = {"order_date": "%Y-%m-%d", "ship_date": "%d/%m/%Y"}
+    for col, date_format in expected_formats.items():
+        assert orders_dataset.column_types[col] == "datetime"
+        assert pd.api.types.is_datetime64_any_dtype(orders_dataset.frame[col])
+        expected = pd.to_datetime(orders_frame[col], format=date_format)
+        assert (orders_dataset.datetimes(col).to_numpy() == expected.to_numpy()).all()
+
+def test_count_matching_agrees_with_boolean_masks(orders_frame, orders_dataset):
+    for col in ["profit", "discount", "quantity"]:
+        values = orders_frame[col]
+        for threshold in [values.min(), values.median(), values.max(), 10, 10.5, -1e9]:
+            assert orders_dataset.count_matching(col, "<", threshold) == (values < threshold).sum()
+            assert orders_dataset.count_matching(col, "<=", threshold) == (values <= threshold).sum()
+            assert orders_dataset.count_matching(col, ">", threshold) == (values > threshold).sum()
+            assert orders_dataset.count_matching(col, ">=", threshold) == (values >= threshold).sum()
+        low, high = values.quantile(0.2), values.quantile(0.7)
+        assert orders_dataset.count_matching(col, "between", (low, high)) == values.between(low, high).sum()
+
+def test_dictionary_encoded_counts_match_value_counts(orders_frame, orders_dataset):
+    for col in ["region", "channel", "product", "is_returned", "notes"]:
+        assert isinstance(orders_dataset.frame[col].dtype, pd.CategoricalDtype)
+        expected = orders_frame[col].value_counts()
+        counts = orders_dataset.category_counts(col)
+        assert dict(counts) == dict(expected)
+        assert list(counts.values) == sorted(expected.values, reverse=True)
+        
+        encoded = orders_dataset.encoded(col)
+        for value in expected.index[:3]:
+            assert encoded.count_equal(value) == expected[value]
+            assert encoded.count_equal(value.upper()) == expected[value]
+        assert encoded.count_equal("no such value") == 0
+
+def test_encoding_plain_strings_skips_missing_values():
+    column_data = pd.Series(["North", None, "south", "South", "North", np.nan])
+    encoded = EncodedColumn.from_series(column_data)
+    assert encoded.count_equal("north") == 2
+    # Case-insensitive, so both spellings count
+    assert encoded.count_equal("SOUTH") == 2
+    assert dict(encoded.value_counts()) == dict(column_data.value_counts())
+    assert not encoded.codes.flags.writeable
+
+def test_reduce_groups_matches_groupby(orders_frame, orders_dataset):
+    codes, key_frame = orders_dataset.group_codes(["region", "channel"])
+    aggregates = reduce_groups(codes, len(key_frame), orders_dataset.numeric("discount"))
+    
+    expected = orders_frame.groupby(["region", "channel"])["discount"].agg(
+        ["count", "sum", "mean", "min", "max", "median"]
+    )
+    keys = pd.MultiIndex.from_frame(key_frame.astype(str))
+    for name in expected.columns:
+        np.testing.assert_allclose(pd.Series(aggregates[name], index=keys)[expected.index], expected[name])
+
+def test_group_question_matches_groupby(orders_frame, orders_dataset):
+    _, response_text, result_table, _ = answer_question("maximum profit by region", orders_dataset)
+    assert response_text.startswith("Maximum 'profit'")
+    expected = orders_frame.groupby("region")["profit"].max()
+    np.testing.assert_allclose(result_table.set_index(result_table["region"].astype(str))["max_profit"][expected.index], expected)
@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+import pytest
+
+from engine import DiskDatasetCache, answer_question
+
+pytest.importorskip("pyarrow")
+
+def test_saved_dataset_comes_back_typed_and_profiled(orders_dataset, tmp_path):
+    disk_cache = DiskDatasetCache(cache_dir=str(tmp_path))
+    disk_cache.save("orders", orders_dataset)
+    loaded = disk_cache.load("orders")
+    
+    assert loaded.column_types == orders_dataset.column_types
+    pd.testing.assert_frame_equal(loaded.frame, orders_dataset.frame, check_categorical=False)
+    numeric_columns = [col for col, col_type in loaded.column_types.items() if col_type == "numerical"]
+    # Profiles ride along in the file, so they're ready before anything is computed
+    assert all(("profile", col) in loaded.derived for col in numeric_columns)
+    assert loaded.derived_bytes > 0
+    for question in ["average profit by region", "how many orders have profit over 100"]:
+        assert answer_question(question, loaded)[1] == answer_question(question, orders_dataset)[1]
+
+def test_missing_or_corrupt_files_are_misses(orders_dataset, tmp_path):
+    disk_cache = DiskDatasetCache(cache_dir=str(tmp_path))
+    assert disk_cache.load("never-saved") is None
+    with open(disk_cache.path_for("corrupt"), "wb") as broken_file:
+        broken_file.write(b"not an arrow file")
+    assert disk_cache.load("corrupt") is None
+
+def test_oldest_files_go_once_the_folder_is_over_its_limit(orders_dataset, tmp_path):
+    disk_cache = DiskDatasetCache(cache_dir=str(tmp_path))
+    disk_cache.save("first", orders_dataset)
+    file_bytes = os.path.getsize(disk_cache.path_for("first"))
+    os.utime(disk_cache.path_for("first"), (1, 1))
+    
+    disk_cache.size_limit_bytes = int(1.5 * file_bytes)
+    disk_cache.save("second", orders_dataset)
+    assert not os.path.exists(disk_cache.path_for("first"))
+    assert disk_cache.load("second") is not None
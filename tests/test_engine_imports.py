@@ -0,0 +1,26 @@
+import json
+import subprocess
+import sys
+
+# pandas loads pyarrow by itself when it is installed, so only what the engine could pull in is checked
+HEAVY_MODULES = ["streamlit", "plotly", "openpyxl", "matplotlib"]
+
+def modules_after(statement):
+    """Which of the heavy modules a fresh interpreter has loaded after running the statement"""
+    script = f"import json, sys\n{statement}\nprint(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def test_engine_import_stays_headless():
+    assert modules_after("import engine") == []
+
+def test_answering_a_csv_question_stays_headless(tmp_path):
+    csv_path = tmp_path / "orders.csv"
+    csv_path.write_text("region,profit\nNorth,10\nSouth,20\nNorth,5\n")
+    statement = (
+        "from engine import answer_question, figure_spec_json, load_dataset_file\n"
+        f"dataset = load_dataset_file({str(csv_path)!r})\n"
+        "action, text, table, figure = answer_question('pie chart of region', dataset)\n"
+        "figure_spec_json(figure)"
+    )
+    assert modules_after(statement) == []
@@ -0,0 +1,94 @@
+import io
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from benchmarks.synthetic import generate_business_table, table_to_bytes
+from engine import answer_question, list_excel_sheets, load_dataset_bytes, read_excel_sheets
+from engine.excel import read_excel_sheet
+
+def workbook_bytes(sheet_frames):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        for name, frame in sheet_frames.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+    return buffer.getvalue()
+
+def test_stacked_sheet_column_stays_categorical():
+    sales = pd.DataFrame({"region": ["East", "West", "East"], "sales": [1.0, 2.0, 3.0]})
+    # Tab names that parse as dates, and a mix where only some would
+    for sheet_names in (["Jan", "Feb"], ["Jan", "North"], ["2023", "2024"]):
+        raw_bytes = workbook_bytes({name: sales for name in sheet_names})
+        dataset = load_dataset_bytes(raw_bytes, "months.xlsx", sheet_names=sheet_names)
+        
+        assert dataset.column_types["sheet"] == "categorical"
+        assert dataset.frame["sheet"].astype(str).tolist() == [name for name in sheet_names for _ in range(3)]
+        
+        _, _, result_table, _ = answer_question("count by sheet", dataset)
+        assert dict(zip(result_table["sheet"].astype(str), result_table["count"])) == {name: 3 for name in sheet_names}
+
+def test_reader_matches_read_excel_on_a_plain_sheet():
+    raw_bytes = table_to_bytes(generate_business_table(500, seed=4), "xlsx")
+    pd.testing.assert_frame_equal(read_excel_sheet(raw_bytes), pd.read_excel(io.BytesIO(raw_bytes)))
+
+def test_sheets_are_listed_and_read_by_name():
+    raw_bytes = workbook_bytes({
+        "Jan": pd.DataFrame({"sales": [1, 2]}),
+        "Feb": pd.DataFrame({"sales": [3.5, 4.5, 5.5]}),
+        "Mar": pd.DataFrame({"sales": [6]}),
+    })
+    assert list_excel_sheets(raw_bytes) == pd.ExcelFile(io.BytesIO(raw_bytes)).sheet_names == ["Jan", "Feb", "Mar"]
+    
+    sheets = read_excel_sheets(raw_bytes, ["Mar", "Feb"])
+    assert list(sheets) == ["Mar", "Feb"]
+    for name, frame in sheets.items():
+        pd.testing.assert_frame_equal(frame, pd.read_excel(io.BytesIO(raw_bytes), sheet_name=name))
+    # No names means just the first sheet
+    assert list(read_excel_sheets(raw_bytes)) == ["Jan"]
+
+def test_header_is_the_first_non_blank_row():
+    # Unlike pd.read_excel, leading blank rows are skipped before the header is taken
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.append([None, None, None, None])
+    worksheet.append(["id", "amount", "when", "amount"])
+    worksheet.append([1, 2.5, datetime(2024, 1, 2), 10])
+    worksheet.append([None, None, None, None])
+    worksheet.append([2, None, datetime(2024, 1, 3), 20, "stray"])
+    worksheet.append([None, None, None, None])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    
+    frame = read_excel_sheet(buffer.getvalue())
+    assert list(frame.columns) == ["id", "amount", "when", "amount.1", "Unnamed: 4"]
+    # Blank rows inside the data stay (like pandas), the trailing one doesn't
+    assert len(frame) == 3
+    assert frame["id"].dtype == float and np.isnan(frame["id"][1])
+    assert pd.api.types.is_datetime64_any_dtype(frame["when"])
+    assert frame["when"][2] == pd.Timestamp("2024-01-03")
+    assert frame["Unnamed: 4"].tolist()[2] == "stray"
+
+@pytest.mark.filterwarnings("error::FutureWarning")
+def test_blank_and_boolean_cells_match_read_excel():
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.append(["label", "flag", "with_gaps", "flag_and_count", "mixed"])
+    for row in [["a", True, True, True, 1], [None, False, None, 3, "x"], ["b", True, False, False, None]]:
+        worksheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    
+    frame = read_excel_sheet(buffer.getvalue())
+    expected = pd.read_excel(io.BytesIO(buffer.getvalue()))
+    assert frame.dtypes.to_dict() == expected.dtypes.to_dict()
+    pd.testing.assert_frame_equal(frame, expected)
+    # Blank cells are NaN, so they can't turn into a 'None' category later on
+    for col in ["label", "mixed"]:
+        assert not any(value is None for value in frame[col])
+    
+    raw_bytes = workbook_bytes({"data": frame})
+    dataset = load_dataset_bytes(raw_bytes, "flags.xlsx")
+    assert "None" not in dataset.category_counts("label").index
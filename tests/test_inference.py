@@ -0,0 +1,35 @@
+import datetime
+import warnings
+
+import pandas as pd
+
+from engine.inference import coerce_to_datetime, guess_date_format, infer_column_types
+
+def test_guess_date_format_reads_ambiguous_dates_from_the_whole_sample():
+    # The first value parses either way round - the later ones settle it
+    assert guess_date_format(["12/06/2023", "24/08/2024", "19/07/2023"]) == "%d/%m/%Y"
+    assert guess_date_format(["07/05/2021", "08/30/2021"]) == "%m/%d/%Y"
+    assert guess_date_format(["2021-01-05", "2021-02-03"]) == "%Y-%m-%d"
+    assert guess_date_format(["not a date", None]) is None
+
+def test_day_first_column_parses_completely(orders_frame):
+    column_types, _ = infer_column_types(orders_frame[["ship_date"]].copy())
+    assert column_types["ship_date"] == "datetime"
+    
+    sample = orders_frame["ship_date"].dropna().values[:50]
+    parsed = pd.to_datetime(orders_frame["ship_date"], format=guess_date_format(sample), errors='coerce')
+    assert parsed.notna().all()
+
+def test_dates_without_a_guessable_format_are_not_parsed_per_element():
+    frame = pd.DataFrame({
+        "when": ["3rd of May 2021", "May the 4th, 2021", "mid June 2021", "late July 2021"] * 50,
+        "stamp": pd.Series([datetime.datetime(2021, 5, day) for day in range(1, 5)] * 50, dtype=object),
+    })
+    with warnings.catch_warnings():
+        # pandas warns when it falls back to dateutil for each value
+        warnings.simplefilter("error", UserWarning)
+        column_types, _ = infer_column_types(frame)
+        assert coerce_to_datetime(frame["when"]).isna().all()
+    assert column_types["when"] != "datetime"
+    # Values that already are dates don't need a format
+    pd.testing.assert_series_equal(coerce_to_datetime(frame["stamp"]), pd.to_datetime(frame["stamp"]))
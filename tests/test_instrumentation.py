@@ -0,0 +1,85 @@
+import json
+import threading
+import tracemalloc
+
+import numpy as np
+
+import engine.instrumentation
+from benchmarks.synthetic import table_to_bytes
+from engine import StreamingCsvDataset, answer_question, load_dataset_bytes, profile_call, trace_stage, traced
+
+def test_stages_nest_and_do_nothing_without_a_trace():
+    with trace_stage("outside") as record:
+        assert record is None
+    
+    with traced("question", "demo", dataset_id="d1") as trace:
+        with trace_stage("outer", rows=10):
+            with trace_stage("inner", hit=True) as record:
+                record["rows"] = 3
+    assert [(stage["stage"], stage["depth"], stage["rows"]) for stage in trace.stages] == [("outer", 0, 10), ("inner", 1, 3)]
+    assert trace.stages[1]["hit"] is True
+    assert trace.total_seconds >= trace.stages[0]["seconds"] >= trace.stages[1]["seconds"]
+    table = trace.stage_table()
+    assert table["stage"].tolist() == ["outer", "  inner"]
+    assert table["allocated_mb"].isna().all()
+
+def test_upload_and_question_stages_are_recorded(orders_frame):
+    csv_bytes = table_to_bytes(orders_frame.head(400))
+    with traced("upload", "orders.csv") as upload_trace:
+        dataset = load_dataset_bytes(csv_bytes, "orders.csv")
+    stage_names = [stage["stage"] for stage in upload_trace.stages]
+    assert stage_names[:5] == ["read file", "clean headers", "process values", "infer column types", "build typed columns"]
+    assert upload_trace.stages[0]["rows"] == 400 and upload_trace.stages[0]["input_bytes"] == len(csv_bytes)
+    
+    with traced("question", "average profit by region") as question_trace:
+        answer_question("average profit by region", dataset)
+    stage_names = [stage["stage"] for stage in question_trace.stages]
+    assert stage_names[0] == "parse question"
+    assert "execute group_and_analyze" in stage_names
+
+def test_streaming_stages_count_the_rows_they_read(orders_frame):
+    dataset = StreamingCsvDataset(table_to_bytes(orders_frame), chunk_rows=700)
+    with traced("question", "histogram of profit") as trace:
+        answer_question("histogram of profit", dataset)
+    execute_stage = next(stage for stage in trace.stages if stage["stage"].startswith("execute"))
+    assert execute_stage["rows"] == len(orders_frame)
+
+def test_allocations_are_only_measured_while_tracemalloc_runs():
+    tracemalloc.start()
+    try:
+        with traced("question", "memory") as trace:
+            with trace_stage("allocate"):
+                block = np.ones(1_000_000)
+    finally:
+        tracemalloc.stop()
+    assert trace.stages[0]["allocated_bytes"] >= block.nbytes
+
+def test_traces_stay_with_their_own_thread():
+    traces = {}
+
+    def ask(label):
+        with traced("question", label) as trace:
+            with trace_stage(f"stage for {label}"):
+                pass
+        traces[label] = trace
+    workers = [threading.Thread(target=ask, args=(label,)) for label in ["a", "b"]]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert [stage["stage"] for stage in traces["a"].stages] == ["stage for a"]
+    assert [stage["stage"] for stage in traces["b"].stages] == ["stage for b"]
+
+def test_finished_traces_go_to_the_log_with_their_profile(tmp_path, monkeypatch):
+    log_path = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(engine.instrumentation, "TRACE_LOG_PATH", str(log_path))
+    with traced("question", "profiled", dataset_id="d2"):
+        with trace_stage("sort"):
+            result, report = profile_call(sorted, [3, 1, 2])
+    assert result == [1, 2, 3] and "function calls" in report
+    
+    logged = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert len(logged) == 1
+    assert logged[0]["label"] == "profiled" and logged[0]["dataset"] == "d2"
+    assert logged[0]["stages"][0]["stage"] == "sort"
+    assert logged[0]["profile"] == report
@@ -0,0 +1,49 @@
+import threading
+
+import engine.loading
+from benchmarks.synthetic import table_to_bytes
+from engine import IngestionCache, hash_uploaded_bytes, load_dataset_bytes
+
+def count_reads(monkeypatch):
+    reads = []
+    original = engine.loading.read_uploaded_file
+
+    def counting_read(*arguments, **keywords):
+        reads.append(arguments[1])
+        return original(*arguments, **keywords)
+    monkeypatch.setattr(engine.loading, "read_uploaded_file", counting_read)
+    return reads
+
+def test_same_bytes_are_parsed_once_whatever_the_file_name(orders_frame, monkeypatch):
+    reads = count_reads(monkeypatch)
+    csv_bytes = table_to_bytes(orders_frame.head(500))
+    store = IngestionCache()
+    first = load_dataset_bytes(csv_bytes, "orders.csv", cache=store)
+    again = load_dataset_bytes(csv_bytes, "orders (1).csv", cache=store)
+    
+    assert again is first
+    assert first.fingerprint == hash_uploaded_bytes(csv_bytes)
+    assert reads == ["orders.csv"]
+    
+    # Different content is a different dataset
+    edited = load_dataset_bytes(table_to_bytes(orders_frame.head(499)), "orders.csv", cache=store)
+    assert edited is not first and len(edited) == 499
+    assert len(reads) == 2
+
+def test_sessions_loading_the_same_upload_together_share_one_build(orders_frame, monkeypatch):
+    reads = count_reads(monkeypatch)
+    csv_bytes = table_to_bytes(orders_frame.head(500))
+    store = IngestionCache()
+    loaded = []
+    sessions = [
+        threading.Thread(target=lambda: loaded.append(load_dataset_bytes(csv_bytes, "orders.csv", cache=store)))
+        for _ in range(4)
+    ]
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    
+    assert len(loaded) == 4 and all(dataset is loaded[0] for dataset in loaded)
+    assert len(reads) == 1
+    assert store.stats()["datasets"] == 1
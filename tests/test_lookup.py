@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+from engine import TypedDataset
+from engine.lookup import find_categorical_matches, find_column_candidates, hunt_for_categorical_values, smart_column_finder
+
+COLUMNS = ["Order ID", "sales_amount", "sales_amount_adjusted_total", "unit_price", "profit", "customer_name", "region"]
+
+def baseline_column_finder(search_term, available_columns):
+    """The linear scan smart_column_finder used to be"""
+    search_normalized = search_term.lower().replace(" ", "").replace("_", "")
+    for col in available_columns:
+        if search_normalized == col.lower().replace("_", "").replace(" ", ""):
+            return col
+    for col in available_columns:
+        col_normalized = col.lower().replace("_", "").replace(" ", "")
+        if search_normalized in col_normalized or col_normalized in search_normalized:
+            return col
+    for word in search_term.lower().split():
+        for col in available_columns:
+            if word in col.lower():
+                return col
+    return None
+
+@pytest.mark.parametrize("search_term", ["order id", "ORDER_ID", "Sales Amount", "unit price", "profit", "customer name"])
+def test_exact_names_match_like_the_linear_scan(search_term):
+    assert smart_column_finder(search_term, COLUMNS) == baseline_column_finder(search_term, COLUMNS)
+    assert find_column_candidates(search_term, COLUMNS)[0][1] == 1.0
+
+def test_exact_match_wins_wherever_the_column_sits():
+    # The linear scan would stop at the longer column that merely contains "sales amount"
+    reordered = ["sales_amount_adjusted_total", "sales_amount"]
+    assert smart_column_finder("sales amount", reordered) == "sales_amount"
+
+def test_partial_matches_rank_closer_lengths_first():
+    candidates = find_column_candidates("sales", COLUMNS)
+    assert [col for col, _ in candidates[:2]] == ["sales_amount", "sales_amount_adjusted_total"]
+    assert candidates[0][1] > candidates[1][1]
+    # A column name inside a longer phrase counts too
+    assert smart_column_finder("total profit margin", COLUMNS) == "profit"
+
+def test_words_and_typos_still_find_a_column():
+    assert smart_column_finder("price of each unit", COLUMNS) == "unit_price"
+    assert smart_column_finder("unitprise", COLUMNS) == "unit_price"
+    assert smart_column_finder("zzzz", COLUMNS) is None
+    # An empty term leaves the choice to the parser's type-based defaults
+    assert smart_column_finder("", COLUMNS) is None
+
+CITIES = pd.DataFrame({
+    "city": ["York", "New York", "Paris", "Hull"],
+    "office": ["Paris", "Head Office", "Yorkshire", "Hull"],
+    "channel": ["Online", "Retail", "Online", "Retail"],
+})
+CITY_TYPES = {"city": "categorical", "office": "categorical", "channel": "binary"}
+
+def baseline_value_hunt(query_text, dataframe, col_types):
+    """The column-by-column scan hunt_for_categorical_values used to be"""
+    for column_name, data_type in col_types.items():
+        if data_type in ["categorical", "binary"]:
+            for value in dataframe[column_name].dropna().unique():
+                if str(value).lower() in query_text.lower():
+                    return column_name, str(value)
+    return None, None
+
+@pytest.mark.parametrize("question", ["sales in paris", "online orders", "how many RETAIL orders", "total sales"])
+def test_single_mentions_match_the_column_scan(question):
+    assert hunt_for_categorical_values(question, CITIES, CITY_TYPES) == baseline_value_hunt(question, CITIES, CITY_TYPES)
+
+def test_longer_and_whole_word_values_win():
+    # "york" sits inside "new york", and "yorkshire" isn't a whole-word mention of "york"
+    assert hunt_for_categorical_values("orders from new york", CITIES, CITY_TYPES) == ("city", "New York")
+    assert hunt_for_categorical_values("yorkshire orders", CITIES, CITY_TYPES) == ("office", "Yorkshire")
+    assert find_categorical_matches("york or yorkshire", CITIES, CITY_TYPES)[:2] == [("office", "Yorkshire"), ("city", "York")]
+
+def test_values_only_one_column_has_beat_shared_ones():
+    # Same length, but "hull" is in both columns and only city has "york"
+    matches = find_categorical_matches("hull vs york", CITIES, CITY_TYPES)
+    assert matches == [("city", "York"), ("city", "Hull"), ("office", "Hull")]
+
+def test_value_index_is_built_once_per_dataset():
+    dataset = TypedDataset(CITIES, CITY_TYPES, fingerprint="cities")
+    assert hunt_for_categorical_values("online", dataset, CITY_TYPES) == ("channel", "Online")
+    value_index = dataset.derived["value_index"]
+    hunt_for_categorical_values("paris", dataset, CITY_TYPES)
+    assert dataset.derived["value_index"] is value_index
@@ -0,0 +1,63 @@
+import itertools
+
+import pytest
+
+from engine import TypedDataset, parse_natural_language_query
+from engine.parser import INTENT_TRIGGERS, ParseMemo, classify_intent, parse_question_text
+
+def baseline_intent(query_lower):
+    """The old if/elif chain: first intent with any phrase anywhere in the question"""
+    for intent, phrases in INTENT_TRIGGERS:
+        if any(phrase in query_lower for phrase in phrases):
+            return intent
+    return None
+
+# "summary" holds "sum", which the old substring checks read as a total - that's the
+# one deliberate difference, so it's left out of the comparison
+COMPARED_PHRASES = [
+    (intent, phrase) for intent, phrases in INTENT_TRIGGERS for phrase in phrases if phrase != "summary"
+]
+
+def test_intent_priority_matches_the_old_chain():
+    for (_, first), (_, second) in itertools.permutations(COMPARED_PHRASES, 2):
+        question = f"show me the {first} and {second} for profit"
+        assert classify_intent(question)[0] == baseline_intent(question), question
+
+@pytest.mark.parametrize("question, intent", [
+    ("give me a summary", "summary"),
+    ("profit distribution", "histogram"),
+    ("how many orders", "count"),
+    ("what is the profit", None),
+])
+def test_whole_words_decide_the_intent(question, intent):
+    assert classify_intent(question)[0] == intent
+
+def test_triggers_and_fillers_are_cut_from_the_column_search():
+    assert classify_intent("what is the average of profit")[1] == "of profit"
+    assert classify_intent("histogram of profit")[1] == "profit"
+    # 'of' inside a word stays put
+    assert classify_intent("histogram of offers")[1] == "offers"
+
+def test_memoised_parses_match_fresh_ones(orders_dataset):
+    dataset = TypedDataset(orders_dataset.frame, orders_dataset.column_types, fingerprint="parse-memo")
+    questions = ["Average profit by region", "histogram of discount", "how many orders have profit over 100"]
+    for question in questions:
+        fresh = parse_question_text(question.lower(), dataset, dataset.column_types)
+        assert parse_natural_language_query(question, dataset, dataset.column_types) == fresh
+        # Case and surrounding spaces don't make it a different question
+        assert parse_natural_language_query(f"  {question.upper()} ", dataset, dataset.column_types) == fresh
+    assert len(dataset.derived["parse_memo"].entries) == len(questions)
+
+def test_parse_memo_drops_the_least_recently_asked():
+    memo = ParseMemo(max_entries=2)
+    parses = []
+
+    def parse_as(action):
+        return lambda: parses.append(action) or action
+    memo.get_or_parse("a", parse_as("A"))
+    memo.get_or_parse("b", parse_as("B"))
+    assert memo.get_or_parse("a", parse_as("again")) == "A"
+    memo.get_or_parse("c", parse_as("C"))
+    
+    assert list(memo.entries) == ["a", "c"]
+    assert parses == ["A", "B", "C"]
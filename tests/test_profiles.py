@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from engine.profiles import (
+    HeavyHitters,
+    HyperLogLog,
+    QuantileSketch,
+    build_column_profile,
+    sketch_columns,
+)
+
+def test_column_profile_matches_pandas(orders_frame):
+    for col in ["profit", "discount"]:
+        values = orders_frame[col]
+        profile = build_column_profile(values)
+        assert profile["count"] == values.count()
+        assert profile["null_count"] == values.isna().sum()
+        np.testing.assert_allclose(
+            [profile["sum"], profile["mean"], profile["min"], profile["max"], profile["median"], profile["std"]],
+            [values.sum(), values.mean(), values.min(), values.max(), values.median(), values.std()]
+        )
+
+def test_hyperloglog_estimate_is_close_and_merges_like_one_pass():
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 50_000, 200_000)
+    hashes = pd.util.hash_array(values)
+    whole, first, second = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    whole.add_hashes(hashes)
+    first.add_hashes(hashes[:80_000])
+    second.add_hashes(hashes[80_000:])
+    
+    true_distinct = len(np.unique(values))
+    assert abs(whole.estimate() - true_distinct) / true_distinct < 0.05
+    assert first.merge(second).estimate() == whole.estimate()
+    
+    # Small columns go through linear counting and come out almost exact
+    small = HyperLogLog()
+    small.add_hashes(pd.util.hash_array(np.arange(100)))
+    assert round(small.estimate()) in range(98, 103)
+
+def test_heavy_hitters_never_overstate_and_keep_the_top_value():
+    rng = np.random.default_rng(5)
+    values = pd.Series(rng.zipf(1.5, 100_000) % 1000)
+    true_counts = values.value_counts()
+    sketch = HeavyHitters(capacity=20)
+    for start in range(0, len(values), 7_000):
+        sketch.absorb_counts(values.iloc[start:start + 7_000].value_counts())
+    
+    assert sketch.counts.idxmax() == true_counts.idxmax()
+    for value, count in sketch.counts.items():
+        assert count <= true_counts[value] <= count + sketch.undercount
+
+def test_merged_quantile_sketch_stays_close_to_exact_quantiles():
+    rng = np.random.default_rng(11)
+    values = rng.lognormal(3, 1, 120_000)
+    sketch = QuantileSketch()
+    for chunk in np.array_split(values, 12):
+        sketch = sketch.merge(QuantileSketch.from_values(chunk))
+    
+    qs = [0.1, 0.25, 0.5, 0.75, 0.9]
+    expected_ranks = np.searchsorted(np.sort(values), sketch.quantile(qs)) / len(values)
+    np.testing.assert_allclose(expected_ranks, qs, atol=0.01)
+
+def test_sketched_summary_matches_describe(orders_frame, orders_dataset):
+    summary = orders_dataset.summary()
+    exact = orders_frame.describe(include='all')
+    for col in ["profit", "quantity"]:
+        for row in ["count", "mean", "std", "min", "max", "50%"]:
+            np.testing.assert_allclose(float(summary.loc[row, col]), float(exact.loc[row, col]))
+    for col in ["region", "is_returned"]:
+        for row in ["count", "unique", "top", "freq"]:
+            assert summary.loc[row, col] == exact.loc[row, col]
+    # customer_id has too many values to count exactly - the estimate should still be close
+    assert summary.loc["count", "customer_id"] == exact.loc["count", "customer_id"]
+    assert abs(summary.loc["unique", "customer_id"] - exact.loc["unique", "customer_id"]) / exact.loc["unique", "customer_id"] < 0.05
+
+def test_text_sketch_is_exact_while_few_values():
+    column_data = pd.Series(["a", "b", "a", None, "c", "a"])
+    column_summary = sketch_columns([pd.DataFrame({"label": column_data})], {"label": "values"})["label"]
+    assert column_summary == {"count": 5, "unique": 3, "top": "a", "freq": 3}
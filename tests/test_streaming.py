@@ -0,0 +1,72 @@
+import gc
+import os
+
+import numpy as np
+import pytest
+
+import engine.loading
+from benchmarks.synthetic import table_to_bytes
+from engine import StreamingCsvDataset, answer_question, execute_analysis_request, load_dataset_bytes, start_warmup
+
+@pytest.fixture(scope="module")
+def streamed_orders(orders_frame):
+    # Small chunks, so every answer has to merge partials from several of them
+    return StreamingCsvDataset(table_to_bytes(orders_frame), chunk_rows=700, fingerprint="streamed-orders")
+
+@pytest.mark.parametrize("aggregate, question", [
+    ("sum", "total profit by region"),
+    ("mean", "average profit by region"),
+    ("min", "lowest profit by region"),
+    ("max", "highest profit by region"),
+])
+def test_streamed_breakdowns_match_groupby(orders_frame, streamed_orders, aggregate, question):
+    action, response_text, result_table, _ = answer_question(question, streamed_orders)
+    assert action[3] == aggregate
+    assert "streaming" not in response_text
+    label = {"sum": "total", "mean": "average", "min": "min", "max": "max"}[aggregate]
+    expected = orders_frame.groupby("region")["profit"].agg(aggregate)
+    np.testing.assert_allclose(result_table.set_index("region")[f"{label}_profit"][expected.index], expected)
+    assert result_table["count_profit"].dtype.kind == "i"
+
+def test_streamed_median_breakdown_says_it_fell_back(streamed_orders):
+    _, response_text, result_table, _ = answer_question("median profit by region", streamed_orders)
+    assert "medians aren't available while streaming" in response_text
+    assert "average_profit" in result_table.columns
+
+def test_streamed_count_breakdown_has_integer_counts(orders_frame, streamed_orders):
+    _, _, result_table, _ = answer_question("breakdown by region and channel", streamed_orders)
+    expected = orders_frame.groupby(["region", "channel"]).size()
+    assert result_table["count"].dtype.kind == "i"
+    assert result_table.set_index(["region", "channel"])["count"][expected.index].tolist() == expected.tolist()
+
+@pytest.mark.parametrize("bins", [
+    pytest.param("auto", marks=pytest.mark.skipif(
+        np.lib.NumpyVersion(np.__version__) < "2.3.0", reason="'auto' caps the bin count from numpy 2.3 on"
+    )),
+    "fd", "scott", "sturges", "sqrt", "rice", 12,
+])
+def test_streamed_histogram_bin_rules_match_numpy(orders_frame, streamed_orders, bins):
+    edges, counts = streamed_orders.histogram("profit", bins)
+    expected_counts, expected_edges = np.histogram(orders_frame["profit"].dropna(), bins=bins)
+    np.testing.assert_allclose(edges, expected_edges)
+    np.testing.assert_array_equal(counts, expected_counts)
+
+def test_streamed_histogram_turns_down_rules_that_need_every_value(streamed_orders):
+    with pytest.raises(ValueError, match="'stone' bin rule"):
+        streamed_orders.histogram("profit", "stone")
+    response_text, _, chart_figure = execute_analysis_request(("create_histogram", "profit", "doane"), streamed_orders)
+    assert "'doane' bin rule" in response_text and chart_figure is None
+
+def test_big_uploads_stream_from_a_temp_file(orders_frame, monkeypatch):
+    monkeypatch.setattr(engine.loading, "STREAMING_THRESHOLD_MB", 0)
+    dataset = load_dataset_bytes(table_to_bytes(orders_frame), "orders.csv")
+    spill_path = dataset.source
+    # The dataset reads its rescans from disk rather than holding the upload
+    assert isinstance(spill_path, str) and os.path.exists(spill_path)
+    assert dataset.memory_report()["resident_bytes"] < os.path.getsize(spill_path)
+    assert len(dataset) == len(orders_frame)
+    assert start_warmup(dataset).wait(timeout=30)
+    
+    del dataset
+    gc.collect()
+    assert not os.path.exists(spill_path)
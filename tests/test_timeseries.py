@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from engine.timeseries import choose_granularity, roll_up_daily_totals, time_buckets
+
+def monthly_groupby(orders_frame, value_column):
+    dates = pd.to_datetime(orders_frame["order_date"])
+    return orders_frame[value_column].groupby(dates.dt.to_period("M").dt.start_time)
+
+def test_monthly_buckets_match_groupby(orders_frame, orders_dataset):
+    granularity, bucket_starts, aggregates = time_buckets(orders_dataset, "order_date", "discount", "month")
+    assert granularity == "month"
+    expected = monthly_groupby(orders_frame, "discount").agg(["count", "sum", "mean", "min", "max", "median"])
+    assert list(bucket_starts) == list(expected.index)
+    for name in expected.columns:
+        np.testing.assert_allclose(aggregates[name], expected[name])
+
+def test_row_counts_per_week_match_groupby(orders_frame, orders_dataset):
+    _, bucket_starts, aggregates = time_buckets(orders_dataset, "order_date", None, "week")
+    dates = pd.to_datetime(orders_frame["order_date"])
+    expected = dates.groupby(dates.dt.to_period("W").dt.start_time).size()
+    counts = pd.Series(aggregates["count"], index=bucket_starts)
+    # Weeks without orders still get a (zero) bucket
+    assert counts.sum() == len(orders_frame)
+    assert (counts[expected.index] == expected).all()
+
+def test_automatic_granularity_follows_the_date_range():
+    start = np.datetime64("2024-01-01")
+    assert choose_granularity(start, start + np.timedelta64(90, "D")) == "day"
+    assert choose_granularity(start, start + np.timedelta64(4 * 365, "D")) == "week"
+    assert choose_granularity(start, start + np.timedelta64(20 * 365, "D")) == "month"
+    assert choose_granularity(start, start + np.timedelta64(200 * 365, "D")) == "quarter"
+
+def test_rolled_up_daily_totals_match_direct_buckets(orders_frame, orders_dataset):
+    dates = pd.to_datetime(orders_frame["order_date"])
+    daily_totals = orders_frame["profit"].groupby(dates).agg(["sum", "count", "min", "max"])
+    _, rolled_starts, rolled = roll_up_daily_totals(daily_totals, "quarter")
+    _, bucket_starts, direct = time_buckets(orders_dataset, "order_date", "profit", "quarter")
+    assert list(rolled_starts) == list(bucket_starts)
+    for name in ["count", "sum", "mean", "min", "max"]:
+        np.testing.assert_allclose(rolled[name], direct[name])
@@ -0,0 +1,39 @@
+import numpy as np
+
+from engine import TypedDataset, build_dataset_profiles, start_warmup
+from engine.dataset import DEFAULT_HISTOGRAM_BINS
+
+def cold_dataset(dataset):
+    """The shared fixture's columns with nothing derived yet"""
+    return TypedDataset(dataset.frame, dataset.column_types, fingerprint=dataset.fingerprint)
+
+def test_warmup_builds_profiles_and_histograms_without_sorting(orders_frame, orders_dataset):
+    dataset = cold_dataset(orders_dataset)
+    assert build_dataset_profiles(dataset, ready_only=True) == {}
+    
+    dataset_warmup = start_warmup(dataset)
+    assert start_warmup(dataset) is dataset_warmup
+    assert dataset_warmup.wait(timeout=30)
+    assert dataset_warmup.status()["failed"] == []
+    
+    numeric_columns = [col for col, col_type in dataset.column_types.items() if col_type == "numerical"]
+    assert sorted(build_dataset_profiles(dataset, ready_only=True)) == sorted(numeric_columns)
+    for col in numeric_columns:
+        # Threshold questions sort on their own - the warm-up leaves that alone
+        assert ("sorted_values", col) not in dataset.derived
+        assert ("histogram", col, DEFAULT_HISTOGRAM_BINS) in dataset.derived
+        edges, counts = dataset.histogram(col)
+        expected_counts, expected_edges = np.histogram(orders_frame[col].dropna(), bins=DEFAULT_HISTOGRAM_BINS)
+        np.testing.assert_allclose(edges, expected_edges)
+        np.testing.assert_array_equal(counts, expected_counts)
+
+def test_histogram_agrees_whether_or_not_values_are_sorted(orders_dataset):
+    raw = cold_dataset(orders_dataset)
+    presorted = cold_dataset(orders_dataset)
+    presorted.sorted_values("profit")
+    for bins in [DEFAULT_HISTOGRAM_BINS, 7, "auto"]:
+        raw_edges, raw_counts = raw.histogram("profit", bins)
+        sorted_edges, sorted_counts = presorted.histogram("profit", bins)
+        np.testing.assert_allclose(raw_edges, sorted_edges)
+        np.testing.assert_array_equal(raw_counts, sorted_counts)
+    assert ("sorted_values", "profit") not in raw.derived